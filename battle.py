@@ -1,10 +1,16 @@
 from __future__ import annotations
 from enum import auto
-from typing import Optional
+from time import perf_counter_ns
+from typing import Iterator, Optional, TYPE_CHECKING
 
 from base_enum import BaseEnum
+from monster_base import MonsterBase
 from team import MonsterTeam
 
+if TYPE_CHECKING:
+    from instrumentation import Instrumentation
+    from replay import ReplayWriter
+
 
 class Battle:
     class Action(BaseEnum):
@@ -17,17 +23,87 @@ class Battle:
         TEAM2 = auto()
         DRAW = auto()
 
-    def __init__(self, verbosity=0) -> None:
+    class TurnEvent:
+        """
+        Lightweight record of a single turn, as yielded by Battle.iter_turns.
+        Fields ending in 1 describe team 1's side, fields ending in 2 describe team 2's side.
+
+        turn: number of the turn within the battle, starting from 1
+        repeat: number of identical consecutive turns this record stands for,
+                more than 1 only for exchanges of attacks resolved by fast forwarding
+        action1/action2: the Battle.Action chosen
+        damage1/damage2: damage dealt by the side's active monster in each of the turns
+        fainted1/fainted2: whether the side's active monster fainted
+        evolved1/evolved2: whether the side's active monster evolved
+        result: the Battle.Result if the battle ended on this turn, otherwise None
+        choose_ns/attack_ns: nanoseconds spent choosing actions and attacking, only measured if the battle is timed
+        """
+        __slots__ = (
+            "turn", "repeat", "action1", "action2", "damage1", "damage2",
+            "fainted1", "fainted2", "evolved1", "evolved2", "result", "choose_ns", "attack_ns",
+        )
+
+        def __init__(self, turn: int, repeat: int = 1) -> None:
+            """:complexity: O(1)"""
+            self.turn = turn
+            self.repeat = repeat
+            self.action1 = None
+            self.action2 = None
+            self.damage1 = 0
+            self.damage2 = 0
+            self.fainted1 = False
+            self.fainted2 = False
+            self.evolved1 = False
+            self.evolved2 = False
+            self.result = None
+            self.choose_ns = 0
+            self.attack_ns = 0
+
+        def __str__(self) -> str:
+            turns = f"Turns {self.turn}-{self.turn + self.repeat - 1}" if self.repeat > 1 else f"Turn {self.turn}"
+            ret = f"{turns}: {self.action1} ({self.damage1} dmg) vs. {self.action2} ({self.damage2} dmg)"
+            for fainted, evolved, side in ((self.fainted1, self.evolved1, 1), (self.fainted2, self.evolved2, 2)):
+                if fainted:
+                    ret += f", team {side} monster fainted"
+                if evolved:
+                    ret += f", team {side} monster evolved"
+            if self.result is not None:
+                ret += f", {self.result}"
+            return ret
+
+    def __init__(self, verbosity=0, fast_forward=True, replay: Optional[ReplayWriter] = None,
+                 instrumentation: Optional[Instrumentation] = None) -> None:
+        """
+        :verbosity: above 0 prints the teams, above 1 also prints every turn
+        :fast_forward: whether to resolve locked exchanges of attacks at once, see locked_turns
+        :replay: a ReplayWriter that every battle is recorded to
+        :instrumentation: an Instrumentation that every battle reports its counters to
+        """
         self.verbosity = verbosity
+        self.fast_forward = fast_forward
+        self.replay = replay
+        self.instrumentation = instrumentation
+        self.timed = instrumentation is not None and instrumentation.timers
+        self.event = None
 
     def process_turn(self) -> Optional[Battle.Result]:
         """
         Processes a turn for the battle between two teams.
+        If self.event holds a TurnEvent, what happens in the turn is recorded into it,
+        including timings if the battle is timed.
         :complexity: O(1) because all operations (like swap, attack) are constant-time operations.
         """
+        event = self.event
+        timed = event is not None and self.timed
+        if timed:
+            start = perf_counter_ns()
         # Each team chooses its action for the current turn.
         action1 = self.team1.choose_action(self.out1, self.out2)
         action2 = self.team2.choose_action(self.out2, self.out1)
+        if timed:
+            event.choose_ns = perf_counter_ns() - start
+        if self.replay is not None:
+            self.replay.record(action1, action2)
 
         # Process SWAP/SPECIAL actions first
         if action1 == Battle.Action.SWAP:
@@ -46,6 +122,13 @@ class Battle:
             self.team2.special()
             self.out2 = self.team2.retrieve_from_team()
 
+        if event is not None:
+            event.action1 = action1
+            event.action2 = action2
+            hp1, hp2 = self.out1.get_hp(), self.out2.get_hp()
+        if timed:
+            start = perf_counter_ns()
+
         # Process ATTACK actions
         if action1 == Battle.Action.ATTACK and action2 != Battle.Action.ATTACK:
             self.out1.attack(self.out2)
@@ -63,44 +146,203 @@ class Battle:
                 if self.out1.alive():
                     self.out1.attack(self.out2)
 
+        if timed:
+            event.attack_ns = perf_counter_ns() - start
+        if event is not None:
+            event.damage1 = hp2 - self.out2.get_hp()
+            event.damage2 = hp1 - self.out1.get_hp()
+
         if not self.out2.alive():
             self.out1.level_up()
             if self.out1.ready_to_evolve():
                 self.out1 = self.out1.evolve()
-            self.out2 = self.team2.retrieve_from_team()
-            if self.out2 is None:
+                if event is not None:
+                    event.evolved1 = True
+            if event is not None:
+                event.fainted2 = True
+            if len(self.team2) == 0:
                 return Battle.Result.TEAM1
+            self.out2 = self.team2.retrieve_from_team()
 
         if not self.out1.alive():
             self.out2.level_up()
             if self.out2.ready_to_evolve():
                 self.out2 = self.out2.evolve()
-            self.out1 = self.team1.retrieve_from_team()
-            if self.out1 is None:
+                if event is not None:
+                    event.evolved2 = True
+            if event is not None:
+                event.fainted1 = True
+            if len(self.team1) == 0:
                 return Battle.Result.TEAM2
+            self.out1 = self.team1.retrieve_from_team()
 
         # Subtract 1 from HP if both survive
         if self.out1.alive() and self.out2.alive():
             self.out1.set_hp(self.out1.get_hp() - 1)
             self.out2.set_hp(self.out2.get_hp() - 1)
 
-    def battle(self, team1: MonsterTeam, team2: MonsterTeam) -> Battle.Result:
+    @staticmethod
+    def _always_chooses_default(team: MonsterTeam) -> bool:
         """
-        Conducts a battle between two teams until one team wins or the battle ends in a draw.
-        :complexity: O(n) where n is the number of turns until a result is achieved. Each turn has a complexity of O(1).
+        Whether the team picks its actions with the unmodified MonsterTeam.choose_action.
+        :complexity: O(1)
+        """
+        return "choose_action" not in vars(team) and type(team).choose_action is MonsterTeam.choose_action
+
+    def locked_turns(self) -> int:
+        """
+        Computes how many of the upcoming turns are certain to be plain exchanges of attacks.
+        In such a turn both teams choose ATTACK, neither active monster faints and both lose 1 HP of attrition,
+        so no level up, evolution or swap can happen until they are over.
+
+        Only teams using the default choose_action are considered, as for those the choice can be predicted:
+        the faster monster (or both, on a speed tie) always attacks, while the slower one attacks as long as
+        its HP is not below the faster monster's HP.
+        :complexity: O(1), as the turn count is solved for directly from the per-hit damage.
+        """
+        if not (self._always_chooses_default(self.team1) and self._always_chooses_default(self.team2)):
+            return 0
+        if type(self.out1).attack is not MonsterBase.attack or type(self.out2).attack is not MonsterBase.attack:
+            return 0
+
+        hp1, hp2 = self.out1.get_hp(), self.out2.get_hp()
+        damage1 = self.out1.calculate_damage(self.out2)
+        damage2 = self.out2.calculate_damage(self.out1)
+
+        # Each turn out1 loses damage2 + 1 HP and out2 loses damage1 + 1 HP, and both must stay above 0.
+        turns = min((hp1 - 1) // (damage2 + 1), (hp2 - 1) // (damage1 + 1))
+        if turns <= 0:
+            return 0
+
+        # The gap between the slower and the faster monster's HP changes by a fixed amount every turn.
+        speed1, speed2 = self.out1.get_speed(), self.out2.get_speed()
+        if speed1 < speed2:
+            turns = self._cap_by_hp_gap(turns, hp1 - hp2, damage2 - damage1)
+        elif speed2 < speed1:
+            turns = self._cap_by_hp_gap(turns, hp2 - hp1, damage1 - damage2)
+        return turns
+
+    @staticmethod
+    def _cap_by_hp_gap(turns: int, hp_gap: int, gap_loss: int) -> int:
+        """
+        Caps the turn count to the consecutive turns, starting with the current one, in which a HP gap
+        that shrinks by gap_loss every turn is still non-negative.
+        :complexity: O(1)
+        """
+        if hp_gap < 0:
+            return 0
+        if gap_loss > 0:
+            return min(turns, hp_gap // gap_loss + 1)
+        return turns
+
+    def skip_locked_turns(self) -> int:
+        """
+        Resolves all upcoming locked turns (see locked_turns) at once, leaving both active monsters
+        in exactly the state they would be in had those turns been processed one at a time.
+        Returns the number of turns skipped.
+        :complexity: O(1)
+        """
+        turns = self.locked_turns()
+        if turns > 0:
+            damage1 = self.out1.calculate_damage(self.out2)
+            damage2 = self.out2.calculate_damage(self.out1)
+            self.out1.set_hp(self.out1.get_hp() - turns * (damage2 + 1))
+            self.out2.set_hp(self.out2.get_hp() - turns * (damage1 + 1))
+            if self.replay is not None:
+                self.replay.record(Battle.Action.ATTACK, Battle.Action.ATTACK, turns)
+        return turns
+
+    def _start(self, team1: MonsterTeam, team2: MonsterTeam) -> None:
+        """
+        Sets up the two teams and sends out their first monsters.
+        :complexity: O(n) for OPTIMISE teams, see MonsterTeam.retrieve_from_team, O(1) otherwise.
         """
         if self.verbosity > 0:
             print(f"Team 1: {team1} vs. Team 2: {team2}")
+        if self.replay is not None:
+            self.replay.start(team1, team2)
         self.team1 = team1
         self.team2 = team2
         self.out1 = team1.retrieve_from_team()
         self.out2 = team2.retrieve_from_team()
+
+    def _finish(self, result: Battle.Result) -> Battle.Result:
+        """
+        Turns the result of the last turn into the result of the battle, which is a draw if both monsters fainted,
+        and completes the replay record if there is one.
+        :complexity: O(1)
+        """
+        if not self.out1.alive() and not self.out2.alive():
+            result = Battle.Result.DRAW
+        if self.replay is not None:
+            self.replay.finish(result)
+        return result
+
+    def battle(self, team1: MonsterTeam, team2: MonsterTeam) -> Battle.Result:
+        """
+        Conducts a battle between two teams until one team wins or the battle ends in a draw.
+        With a verbosity above 1 every turn is printed as it is played.
+        Without instrumentation or per turn output, turns are processed without recording any TurnEvent.
+        :complexity: O(n) where n is the number of turns until a result is achieved. Each turn has a complexity of O(1).
+                     With fast_forward enabled, every run of locked turns costs O(1) in total, so a fight between
+                     two monsters that just trade attacks takes O(1) rather than O(hp).
+        """
+        if self.verbosity > 1 or self.instrumentation is not None:
+            for event in self.iter_turns(team1, team2):
+                if self.verbosity > 1:
+                    print(event)
+            return event.result
+
+        self._start(team1, team2)
         result = None
         while result is None:
+            if self.fast_forward:
+                self.skip_locked_turns()
             result = self.process_turn()
-        if not self.out1.alive() and not self.out2.alive():
-            return Battle.Result.DRAW
-        return result
+        return self._finish(result)
+
+    def iter_turns(self, team1: MonsterTeam, team2: MonsterTeam) -> Iterator[Battle.TurnEvent]:
+        """
+        Conducts a battle between two teams like battle, but lazily, yielding a TurnEvent after every turn.
+        Nothing is played ahead of the consumer, and no history is kept: a turn is only processed when
+        the next event is requested. The last event carries the result of the battle.
+        Turns resolved together by fast forwarding are reported as a single event with repeat > 1.
+        Every event is also reported to the instrumentation, if there is one.
+        :complexity: O(1) per event yielded, O(n) in total as for battle.
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.start_battle()
+        self._start(team1, team2)
+        turn = 1
+        result = None
+        while result is None:
+            skipped = self.locked_turns() if self.fast_forward else 0
+            if skipped > 0:
+                event = Battle.TurnEvent(turn, skipped)
+                event.action1 = event.action2 = Battle.Action.ATTACK
+                event.damage1 = self.out1.calculate_damage(self.out2)
+                event.damage2 = self.out2.calculate_damage(self.out1)
+                self.skip_locked_turns()
+                turn += skipped
+                if instrumentation is not None:
+                    instrumentation.record(event)
+                yield event
+
+            event = Battle.TurnEvent(turn)
+            self.event = event
+            try:
+                result = self.process_turn()
+            finally:
+                self.event = None
+            if result is not None:
+                event.result = self._finish(result)
+            turn += 1
+            if instrumentation is not None:
+                instrumentation.record(event)
+                if result is not None:
+                    instrumentation.finish_battle(event.result)
+            yield event
 
 
 if __name__ == "__main__":
@@ -0,0 +1,322 @@
+"""
+Lockstep simulation of many battles at once.
+
+All battles advance one turn at a time together, with the state of every battle kept in
+NumPy arrays (struct-of-arrays) rather than in monster and team objects. Each turn applies
+the same rules as Battle.process_turn to every battle that is still running.
+
+Usage:
+```
+results = battle_vectorized(teams1, teams2)   # ArrayR[Battle.Result], one per pair of teams
+```
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from battle import Battle
+from elements import EffectivenessCalculator, Element
+from monster_base import MonsterBase
+from team import MonsterTeam
+
+from data_structures.referential_array import ArrayR
+from data_structures.typed_array import ArrayF
+
+# Methods the kernel re-implements. A monster class overriding any of them is simulated by the scalar engine.
+_ENGINE_METHODS = (
+    "get_level", "level_up", "get_hp", "set_hp", "get_attack", "get_defense", "get_speed", "get_max_hp",
+    "alive", "attack", "calculate_damage", "ready_to_evolve", "evolve",
+)
+
+_NO_EVOLUTION = -1
+
+
+def _is_plain_monster(monster_class: type[MonsterBase]) -> bool:
+    """
+    Whether every monster in the evolution line of this class follows the MonsterBase rules unchanged.
+    :complexity: O(e), where e is the length of the evolution line.
+    """
+    while monster_class is not None:
+        for name in _ENGINE_METHODS:
+            if getattr(monster_class, name) is not getattr(MonsterBase, name):
+                return False
+        monster_class = monster_class.get_evolution()
+    return True
+
+
+def _can_vectorize(team: MonsterTeam) -> bool:
+    """
+    Whether a team's battles can be run by the kernel: the team must use the default choose_action,
+    be queue based (FRONT or BACK) and only contain plain, simple stat monsters.
+    :complexity: O(n*e), where n is the number of monsters in the team and e the longest evolution line.
+    """
+    if "choose_action" in vars(team) or type(team).choose_action is not MonsterTeam.choose_action:
+        return False
+    if team.team_mode not in (MonsterTeam.TeamMode.FRONT, MonsterTeam.TeamMode.BACK) or len(team) == 0:
+        return False
+    for monster in team.get_monsters():
+        if not monster.simple_mode or not _is_plain_monster(type(monster)):
+            return False
+    return True
+
+
+class _SpeciesTable:
+    """
+    Per species stat columns and the species by species damage table.
+    Species are the monster classes in the battles, plus everything they can evolve into.
+    """
+
+    def __init__(self) -> None:
+        self.index_of = {}
+        self.classes = []
+
+    def add(self, monster_class: type[MonsterBase]) -> int:
+        """
+        Registers a class and its evolution line, returning the species index of the class.
+        :complexity: O(e), where e is the length of the evolution line.
+        """
+        if monster_class not in self.index_of:
+            self.index_of[monster_class] = len(self.classes)
+            self.classes.append(monster_class)
+            evolution = monster_class.get_evolution()
+            if evolution is not None:
+                self.add(evolution)
+        return self.index_of[monster_class]
+
+    def build(self) -> None:
+        """
+        Builds the stat columns and computes the damage of every species attacking every other one.
+        The damage formula mirrors MonsterBase.calculate_damage, applied to whole columns at once.
+        :complexity: O(s^2 + n^2), where s is the number of species and n the number of elements.
+        """
+        calculator = EffectivenessCalculator.instance
+        element_names = calculator.element_names
+        n_elements = len(element_names)
+        element_column = {Element.from_string(element_names[i]).name: i for i in range(n_elements)}
+        values = calculator.effectiveness_values
+        if isinstance(values, ArrayF):
+            effectiveness = values.to_numpy()  # No copy, the table is only read
+        else:
+            effectiveness = np.array(values.to_list(), dtype=np.float64)
+        effectiveness = effectiveness.reshape(n_elements, n_elements)
+
+        samples = [monster_class() for monster_class in self.classes]
+        self.attack = np.array([m.get_attack() for m in samples], dtype=np.float64)
+        self.defense = np.array([m.get_defense() for m in samples], dtype=np.float64)
+        self.speed = np.array([m.get_speed() for m in samples], dtype=np.int64)
+        self.max_hp = np.array([m.get_max_hp() for m in samples], dtype=np.int64)
+        self.element = np.array(
+            [element_column[Element.from_string(m.get_element()).name] for m in samples], dtype=np.int64
+        )
+        self.evolution = np.array(
+            [_NO_EVOLUTION if c.get_evolution() is None else self.index_of[c.get_evolution()] for c in self.classes],
+            dtype=np.int64,
+        )
+
+        attack_stat, defense_stat = self.attack, self.defense
+        damage = np.where(
+            defense_stat < attack_stat / 2,
+            attack_stat - defense_stat,
+            np.where(defense_stat < attack_stat, attack_stat * 5 / 8 - defense_stat / 4, attack_stat / 4),
+        )
+        # damage[a, b] is the damage species a deals to species b.
+        effective = damage[:, None] * effectiveness[self.element[:, None], self.element[None, :]]
+        self.damage = np.rint(effective).astype(np.int64)
+
+
+class _LockstepBattles:
+    """
+    Struct-of-arrays state of N battles.
+
+    Monsters are numbered globally; per monster arrays hold species, hp, level and the already_evo flag.
+    Each side holds its benched monsters in an N x TEAM_LIMIT ring (front and count per battle),
+    mirroring the CircularQueue of the team, plus the monster currently out.
+    """
+
+    def __init__(self, species: _SpeciesTable, teams1: list[ArrayR[MonsterBase]], teams2: list[ArrayR[MonsterBase]],
+                 front_modes: list[tuple[bool, bool]]) -> None:
+        self.species = species
+        n = len(teams1)
+        limit = MonsterTeam.TEAM_LIMIT
+        monsters = [m for team in teams1 + teams2 for m in team]
+        self.monster_species = np.array([species.index_of[type(m)] for m in monsters], dtype=np.int64)
+        self.hp = np.array([m.get_hp() for m in monsters], dtype=np.int64)
+        self.level = np.array([m.get_level() for m in monsters], dtype=np.int64)
+        self.already_evo = np.array([m.already_evo for m in monsters], dtype=bool)
+
+        self.ring = np.zeros((2, n, limit), dtype=np.int64)
+        self.front = np.zeros((2, n), dtype=np.int64)
+        self.count = np.zeros((2, n), dtype=np.int64)
+        self.is_front_mode = np.array(front_modes, dtype=bool).T.reshape(2, n)
+        self.out = np.zeros((2, n), dtype=np.int64)
+
+        next_id = 0
+        for side, teams in enumerate((teams1, teams2)):
+            for b, team in enumerate(teams):
+                for i in range(len(team)):
+                    self.ring[side, b, i] = next_id
+                    next_id += 1
+                self.count[side, b] = len(team)
+
+        self.all_battles = np.arange(n)
+        self.running = np.ones(n, dtype=bool)
+        self.result = np.zeros(n, dtype=np.int64)
+        self.out[0] = self._serve(0, self.all_battles)
+        self.out[1] = self._serve(1, self.all_battles)
+
+    def _serve(self, side: int, battles: np.ndarray) -> np.ndarray:
+        """Serves the front monster of the given battles' benches on one side."""
+        front = self.front[side, battles]
+        served = self.ring[side, battles, front]
+        self.front[side, battles] = (front + 1) % MonsterTeam.TEAM_LIMIT
+        self.count[side, battles] -= 1
+        return served
+
+    def _append(self, side: int, battles: np.ndarray, monsters: np.ndarray) -> None:
+        """Appends monsters to the rear of the given battles' benches on one side."""
+        rear = (self.front[side, battles] + self.count[side, battles]) % MonsterTeam.TEAM_LIMIT
+        self.ring[side, battles, rear] = monsters
+        self.count[side, battles] += 1
+
+    def _swap(self, side: int, battles: np.ndarray) -> None:
+        """
+        Applies a SWAP: the monster out is added back to the team and the next one retrieved.
+        In FRONT mode the monster is added to the front, so the same monster comes straight back out.
+        """
+        battles = battles[~self.is_front_mode[side, battles]]
+        self._append(side, battles, self.out[side, battles])
+        self.out[side, battles] = self._serve(side, battles)
+
+    def _hit(self, attackers: np.ndarray, defenders: np.ndarray) -> None:
+        """Every attacker monster attacks the defender monster at the same position."""
+        table = self.species
+        self.hp[defenders] -= table.damage[self.monster_species[attackers], self.monster_species[defenders]]
+
+    def _level_up_and_evolve(self, monsters: np.ndarray) -> None:
+        """
+        Levels up the monsters (simple stats keep the max HP and therefore the HP the same),
+        then evolves those that are ready, preserving the HP they were missing.
+        """
+        table = self.species
+        self.level[monsters] += 1
+        self.already_evo[monsters] = True
+        current = self.monster_species[monsters]
+        evolution = table.evolution[current]
+        ready = (evolution != _NO_EVOLUTION) & (self.hp[monsters] > 0) & self.already_evo[monsters]
+        monsters, current, evolution = monsters[ready], current[ready], evolution[ready]
+        self.hp[monsters] = table.max_hp[evolution] - (table.max_hp[current] - self.hp[monsters])
+        self.monster_species[monsters] = evolution
+        self.already_evo[monsters] = False
+
+    def _knock_out(self, side: int, battles: np.ndarray) -> None:
+        """
+        Handles the active monster of `side` fainting in the given battles: the opposing monster levels up,
+        and either the next monster is retrieved or the battle ends with the opposing team winning.
+        """
+        other = 1 - side
+        self._level_up_and_evolve(self.out[other, battles])
+        finished = self.count[side, battles] == 0
+        done = battles[finished]
+        self.running[done] = False
+        self.result[done] = other
+        continuing = battles[~finished]
+        self.out[side, continuing] = self._serve(side, continuing)
+
+    def turn(self) -> None:
+        """
+        Processes one turn of every running battle, following Battle.process_turn.
+        :complexity: O(N), where N is the number of running battles.
+        """
+        table = self.species
+        battles = self.all_battles[self.running]
+        out1, out2 = self.out[0, battles], self.out[1, battles]
+        speed1 = table.speed[self.monster_species[out1]]
+        speed2 = table.speed[self.monster_species[out2]]
+        hp1, hp2 = self.hp[out1], self.hp[out2]
+
+        # The default choose_action: ATTACK if at least as fast or with at least as much HP, otherwise SWAP.
+        attack1 = (speed1 >= speed2) | (hp1 >= hp2)
+        attack2 = (speed2 >= speed1) | (hp2 >= hp1)
+        self._swap(0, battles[~attack1])
+        self._swap(1, battles[~attack2])
+        out1, out2 = self.out[0, battles], self.out[1, battles]
+
+        only1 = attack1 & ~attack2
+        only2 = attack2 & ~attack1
+        both = attack1 & attack2
+        self._hit(out1[only1], out2[only1])
+        self._hit(out2[only2], out1[only2])
+
+        first1 = both & (table.speed[self.monster_species[out1]] >= table.speed[self.monster_species[out2]])
+        first2 = both & ~first1
+        self._hit(out1[first1], out2[first1])
+        reply1 = first1.copy()
+        reply1[first1] = self.hp[out2[first1]] > 0
+        self._hit(out2[reply1], out1[reply1])
+        self._hit(out2[first2], out1[first2])
+        reply2 = first2.copy()
+        reply2[first2] = self.hp[out1[first2]] > 0
+        self._hit(out1[reply2], out2[reply2])
+
+        self._knock_out(1, battles[self.hp[self.out[1, battles]] <= 0])
+        battles = battles[self.running[battles]]
+        self._knock_out(0, battles[self.hp[self.out[0, battles]] <= 0])
+        battles = battles[self.running[battles]]
+
+        out1, out2 = self.out[0, battles], self.out[1, battles]
+        both_alive = (self.hp[out1] > 0) & (self.hp[out2] > 0)
+        self.hp[out1[both_alive]] -= 1
+        self.hp[out2[both_alive]] -= 1
+
+    def run(self) -> np.ndarray:
+        """
+        Runs every battle to completion, returning 0 for a team 1 win, 1 for a team 2 win and 2 for a draw.
+        :complexity: O(N*T), where T is the number of turns of the longest battle.
+        """
+        while self.running.any():
+            self.turn()
+        draw = (self.hp[self.out[0]] <= 0) & (self.hp[self.out[1]] <= 0)
+        self.result[draw] = 2
+        return self.result
+
+
+def battle_vectorized(teams1: ArrayR[MonsterTeam], teams2: ArrayR[MonsterTeam]) -> ArrayR[Battle.Result]:
+    """
+    Battles teams1[i] against teams2[i] for every i, returning the results in the same order.
+
+    Pairs where both teams use the default choose_action, are FRONT or BACK teams and only hold
+    simple stat monsters that do not override any MonsterBase behaviour are simulated together
+    in lockstep; every other pair is handed to the scalar Battle engine.
+    The results are the same as calling Battle().battle on each pair. Teams handed to the
+    scalar engine are consumed by it, as usual; the others are left untouched.
+    :complexity: O(s^2 + N*T), where s is the number of monster species involved, N the number
+                 of battles and T the number of turns of the longest battle.
+    """
+    if len(teams1) != len(teams2):
+        raise ValueError("Both sides need the same number of teams.")
+    results = ArrayR[Battle.Result](len(teams1))
+    by_code = (Battle.Result.TEAM1, Battle.Result.TEAM2, Battle.Result.DRAW)
+
+    species = _SpeciesTable()
+    lockstep, monsters1, monsters2, front_modes = [], [], [], []
+    for i in range(len(teams1)):
+        team1, team2 = teams1[i], teams2[i]
+        if _can_vectorize(team1) and _can_vectorize(team2):
+            lockstep.append(i)
+            for monsters, team in ((monsters1, team1), (monsters2, team2)):
+                monsters.append(team.get_monsters())
+                for monster in monsters[-1]:
+                    species.add(type(monster))
+            front_modes.append((
+                team1.team_mode == MonsterTeam.TeamMode.FRONT,
+                team2.team_mode == MonsterTeam.TeamMode.FRONT,
+            ))
+        else:
+            results[i] = Battle().battle(team1, team2)
+
+    if lockstep:
+        species.build()
+        codes = _LockstepBattles(species, monsters1, monsters2, front_modes).run()
+        for i, code in zip(lockstep, codes):
+            results[i] = by_code[code]
+    return results
@@ -3,7 +3,10 @@
     Items to store should be of time ListItem.
 """
 
+from typing import Iterable
+
 from data_structures.referential_array import ArrayR
+from data_structures.merge_sort import merge_sort_indices
 from data_structures.sorted_list_adt import *
 
 __author__ = 'Maria Garcia de la Banda and Brendon Taylor. Modified by Alexey Ignatiev and Graeme Gange'
@@ -58,13 +61,11 @@ class ArraySortedList(SortedList[T]):
 
     def _shuffle_right(self, index: int) -> None:
         """ Shuffle items to the right up to a given position. """
-        for i in range(len(self), index, -1):
-            self.array[i] = self.array[i - 1]
+        self.array.copy_into(self.array, index, index + 1, len(self) - index)
 
     def _shuffle_left(self, index: int) -> None:
         """ Shuffle items starting at a given position to the left. """
-        for i in range(index, len(self)):
-            self.array[i] = self.array[i + 1]
+        self.array.copy_into(self.array, index + 1, index, len(self) - index)
 
     def _resize(self) -> None:
         """ Resize the list. """
@@ -72,8 +73,7 @@ class ArraySortedList(SortedList[T]):
         new_array = ArrayR(2 * len(self.array))
 
         # copying the contents
-        for i in range(self.length):
-            new_array[i] = self.array[i]
+        self.array.copy_into(new_array, 0, 0, self.length)
 
         # referring to the new array
         self.array = new_array
@@ -109,6 +109,45 @@ class ArraySortedList(SortedList[T]):
         self[position] = item
         self.length += 1
 
+    def add_all(self, items: Iterable[ListItem]) -> None:
+        """ Add every item of a batch to the list.
+            The batch is merge sorted by key, then merged into the list from the back, so every
+            item moves straight to its final position and the list is only resized once.
+            Items already in the list go before batch items with the same key.
+            :complexity: O(n + k log k), where n is the length of the list and k the size of the batch.
+        """
+        batch = ArrayR.from_iterable(items)
+        k = len(batch)
+        if k == 0:
+            return
+        order = merge_sort_indices(ArrayR.from_iterable(item.key for item in batch), k)
+        n = len(self)
+        if n + k > len(self.array):
+            new_array = ArrayR(max(2 * len(self.array), n + k))
+            self.array.copy_into(new_array, 0, 0, n)
+            self.array = new_array
+        i = n - 1
+        j = k - 1
+        # Fill from the back, taking the larger of the last unplaced list and batch items,
+        # the batch item on ties so list items stay first.
+        for out in range(n + k - 1, -1, -1):
+            if j < 0:
+                break
+            if i >= 0 and self.array[i].key > batch[order[j]].key:
+                self.array[out] = self.array[i]
+                i -= 1
+            else:
+                self.array[out] = batch[order[j]]
+                j -= 1
+        self.length = n + k
+
+    def bulk_load(self, items: Iterable[ListItem]) -> None:
+        """ Replace the contents of the list with the given items, in any order.
+            :complexity: O(n log n), where n is the number of items, see add_all.
+        """
+        self.reset()
+        self.add_all(items)
+
     def _index_to_add(self, item: ListItem) -> int:
         """ Find the position where the new item should be placed. """
         low = 0
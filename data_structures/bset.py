@@ -3,6 +3,8 @@
 """
 
 from __future__ import annotations
+from typing import Iterator
+from data_structures.referential_array import ArrayR
 from data_structures.set_adt import Set
 
 class BSet(Set[int]):
@@ -36,14 +38,28 @@ class BSet(Set[int]):
 
     def __len__(self) -> int:
         """
-        Size computation. The most expensive operation.
-        Use int.bit_length(your_integer) to calculate the bit length.
+        Size computation, counting the set bits with int.bit_count.
+        :complexity: O(b) in the number of bits, done in C a machine word at a time.
         """
-        res = 0
-        for item in range(1, int.bit_length(self.elems) + 1):
-            if item in self:
-                res += 1
-        return res
+        return self.elems.bit_count()
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        Iterates over the elements in increasing order, by isolating the lowest set bit each time.
+        :complexity: O(1) per element, plus O(b) bit operations on the integer overall.
+        """
+        bits = self.elems
+        while bits:
+            lowest = bits & -bits
+            yield lowest.bit_length()
+            bits ^= lowest
+
+    def to_array(self) -> ArrayR[int]:
+        """
+        The elements in increasing order.
+        :complexity: O(n) where n is the number of elements, see __iter__.
+        """
+        return ArrayR.from_iterable(self)
 
     def add(self, item: int) -> None:
         """ Adds an element to the set.
@@ -99,15 +115,7 @@ class BSet(Set[int]):
 
     def __str__(self):
         """ Construct a nice string representation. """
-        bit_elems = self.elems
-        out_elems = []
-        current = 0
-        while bit_elems:
-            if bit_elems & (1 << current):
-                out_elems.append(str(current+1))
-                bit_elems &= ~(1 << current)
-            current += 1
-        return '{' + ', '.join(out_elems) + '}'
+        return '{' + ', '.join(str(item) for item in self) + '}'
 
 if __name__ == '__main__':
     s = BSet(3)
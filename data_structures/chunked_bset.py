@@ -0,0 +1,333 @@
+"""
+    Chunked bit-vector implementation of Set ADT, for large, sparse universes.
+"""
+
+from __future__ import annotations
+from typing import Iterator
+from data_structures.referential_array import ArrayR
+from data_structures.set_adt import Set
+from data_structures.typed_array import ArrayI
+
+
+class ChunkedBSet(Set[int]):
+    """A bit-vector implementation of the set ADT, split into blocks of BLOCK_BITS bits.
+        Like BSet, item i is in the set if and only if bit i - 1 is set, but only the
+        blocks holding at least one element are stored, each as its own integer, so a
+        few elements numbered in the millions cost a few small integers rather than
+        one integer millions of bits long. Set operations work block by block and only
+        visit the non-empty blocks.
+
+        Attributes:
+        directory (ArrayI): for each block number, its position in the packed arrays plus one,
+            or 0 if the block is empty. Grows to cover the highest block used.
+        numbers (ArrayI): the numbers of the non-empty blocks, in increasing order
+        blocks (ArrayR[int]): the bits of the non-empty blocks, in the same order
+        counts (ArrayI): the number of elements before each non-empty block, for rank and select.
+            Only the counts before position stale_from are up to date, the rest are recounted when next needed.
+        stale_from (int): position of the first count that may be out of date
+        n_blocks (int): number of non-empty blocks
+        size (int): number of elements
+    """
+    BLOCK_SHIFT = 12
+    BLOCK_BITS = 1 << BLOCK_SHIFT
+    MIN_CAPACITY = 1
+
+    def __init__(self, dummy_capacity: int = 1) -> None:
+        """ Initialization. """
+        Set.__init__(self)
+
+    def clear(self) -> None:
+        """ Makes the set empty. """
+        self.directory = ArrayI(self.MIN_CAPACITY)
+        self.numbers = ArrayI(self.MIN_CAPACITY)
+        self.blocks = ArrayR.filled(self.MIN_CAPACITY, 0)
+        self.counts = ArrayI(self.MIN_CAPACITY)
+        self.stale_from = 0
+        self.n_blocks = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        """ Number of elements, kept as they are added and removed.
+        :complexity: O(1)
+        """
+        return self.size
+
+    def is_empty(self) -> bool:
+        """ True if the set is empty. """
+        return self.size == 0
+
+    @staticmethod
+    def _check(item: int) -> None:
+        """ :raises TypeError: if the item is not integer or if not positive. """
+        if not isinstance(item, int) or item <= 0:
+            raise TypeError('Set elements should be integers')
+
+    def _position(self, number: int) -> int:
+        """ Position of a block in the packed arrays, or -1 if the block is empty.
+        :complexity: O(1)
+        """
+        if number >= len(self.directory):
+            return -1
+        return self.directory[number] - 1
+
+    def __contains__(self, item: int) -> bool:
+        """ True if the set contains the item.
+        :raises TypeError: if the item is not integer or if not positive.
+        :complexity: O(1)
+        """
+        self._check(item)
+        position = self._position((item - 1) >> self.BLOCK_SHIFT)
+        return position >= 0 and (self.blocks[position] >> ((item - 1) & (self.BLOCK_BITS - 1))) & 1 == 1
+
+    def add(self, item: int) -> None:
+        """ Adds an element to the set.
+        :raises TypeError: if the item is not integer or if not positive.
+        :complexity: O(1) if the item's block already has elements, otherwise O(b) in the number of blocks
+            to insert the new block in order.
+        """
+        self._check(item)
+        number = (item - 1) >> self.BLOCK_SHIFT
+        bit = 1 << ((item - 1) & (self.BLOCK_BITS - 1))
+        position = self._position(number)
+        if position < 0:
+            position = self._insert_block(number)
+        if not self.blocks[position] & bit:
+            self.blocks[position] |= bit
+            self.size += 1
+            self.stale_from = min(self.stale_from, position + 1)
+
+    def remove(self, item: int) -> None:
+        """ Removes an element from the set.
+        :raises TypeError: if the item is not integer or if not positive.
+        :raises KeyError: if the item is not in the set.
+        :complexity: O(1) unless it empties its block, otherwise O(b) to take the block out.
+        """
+        if item not in self:
+            raise KeyError(item)
+        number = (item - 1) >> self.BLOCK_SHIFT
+        position = self._position(number)
+        self.blocks[position] ^= 1 << ((item - 1) & (self.BLOCK_BITS - 1))
+        self.size -= 1
+        self.stale_from = min(self.stale_from, position + 1)
+        if self.blocks[position] == 0:
+            self._delete_block(position)
+
+    def _insert_block(self, number: int) -> int:
+        """ Inserts an empty block in order, returning its position.
+        :complexity: O(b) to shift the later blocks and update their directory entries.
+        """
+        if number >= len(self.directory):
+            directory = ArrayI(max(2 * len(self.directory), number + 1))
+            self.directory.copy_into(directory, 0, 0, len(self.directory))
+            self.directory = directory
+        if self.n_blocks == len(self.numbers):
+            self.numbers, self.blocks, self.counts = self._grown(2 * len(self.numbers))
+        low = self._block_after(number)
+        moved = self.n_blocks - low
+        self.numbers.copy_into(self.numbers, low, low + 1, moved)
+        self.blocks.copy_into(self.blocks, low, low + 1, moved)
+        self.numbers[low] = number
+        self.blocks[low] = 0
+        self.n_blocks += 1
+        self.stale_from = min(self.stale_from, low)
+        for position in range(low, self.n_blocks):
+            self.directory[self.numbers[position]] = position + 1
+        return low
+
+    def _delete_block(self, position: int) -> None:
+        """ Takes the (empty) block at a position out, shifting the later ones down.
+        :complexity: O(b)
+        """
+        self.directory[self.numbers[position]] = 0
+        moved = self.n_blocks - position - 1
+        self.numbers.copy_into(self.numbers, position + 1, position, moved)
+        self.blocks.copy_into(self.blocks, position + 1, position, moved)
+        self.n_blocks -= 1
+        self.stale_from = min(self.stale_from, position)
+        for later in range(position, self.n_blocks):
+            self.directory[self.numbers[later]] = later + 1
+
+    def _grown(self, capacity: int) -> tuple[ArrayI, ArrayR[int], ArrayI]:
+        """ Copies of the packed arrays with room for capacity blocks.
+        :complexity: O(capacity)
+        """
+        numbers = ArrayI(capacity)
+        blocks = ArrayR.filled(capacity, 0)
+        counts = ArrayI(capacity)
+        self.numbers.copy_into(numbers, 0, 0, self.n_blocks)
+        self.blocks.copy_into(blocks, 0, 0, self.n_blocks)
+        self.counts.copy_into(counts, 0, 0, self.n_blocks)
+        return numbers, blocks, counts
+
+    def _append_block(self, number: int, bits: int) -> None:
+        """ Appends a block numbered after every block so far, ignoring it if empty.
+        Used to build the results of set operations in order.
+        :complexity: O(1) amortised
+        """
+        if bits == 0:
+            return
+        if number >= len(self.directory):
+            directory = ArrayI(max(2 * len(self.directory), number + 1))
+            self.directory.copy_into(directory, 0, 0, len(self.directory))
+            self.directory = directory
+        if self.n_blocks == len(self.numbers):
+            self.numbers, self.blocks, self.counts = self._grown(2 * len(self.numbers))
+        self.numbers[self.n_blocks] = number
+        self.blocks[self.n_blocks] = bits
+        self.n_blocks += 1
+        self.directory[number] = self.n_blocks
+        self.size += bits.bit_count()
+        self.stale_from = min(self.stale_from, self.n_blocks - 1)
+
+    def _merge(self, other: ChunkedBSet, keep_left: bool, keep_right: bool, combine) -> ChunkedBSet:
+        """ Builds a new set from the blocks of both sets, walking their block numbers in order.
+        Blocks only in self are kept if keep_left, blocks only in other if keep_right,
+        and blocks in both are combined with combine.
+        :complexity: O(b1 + b2) in the numbers of blocks of the two sets.
+        """
+        res = ChunkedBSet()
+        i = j = 0
+        while i < self.n_blocks or j < other.n_blocks:
+            if j == other.n_blocks or (i < self.n_blocks and self.numbers[i] < other.numbers[j]):
+                if keep_left:
+                    res._append_block(self.numbers[i], self.blocks[i])
+                i += 1
+            elif i == self.n_blocks or other.numbers[j] < self.numbers[i]:
+                if keep_right:
+                    res._append_block(other.numbers[j], other.blocks[j])
+                j += 1
+            else:
+                res._append_block(self.numbers[i], combine(self.blocks[i], other.blocks[j]))
+                i += 1
+                j += 1
+        return res
+
+    def union(self, other: ChunkedBSet) -> ChunkedBSet:
+        """ Creates a new set equal to the union with another one.
+        :complexity: O(b1 + b2), see _merge.
+        """
+        return self._merge(other, True, True, lambda a, b: a | b)
+
+    def intersection(self, other: ChunkedBSet) -> ChunkedBSet:
+        """ Creates a new set equal to the intersection with another one.
+        :complexity: O(b1 + b2), see _merge.
+        """
+        return self._merge(other, False, False, lambda a, b: a & b)
+
+    def difference(self, other: ChunkedBSet) -> ChunkedBSet:
+        """ Creates a new set equal to the difference with another one.
+        :complexity: O(b1 + b2), see _merge.
+        """
+        return self._merge(other, True, False, lambda a, b: a & ~b)
+
+    def __and__(self, other: ChunkedBSet):
+        return self.intersection(other)
+
+    def __or__(self, other: ChunkedBSet):
+        return self.union(other)
+
+    def __iter__(self) -> Iterator[int]:
+        """ Iterates over the elements in increasing order, skipping straight past empty blocks.
+        :complexity: O(1) per element, plus O(b) over the blocks.
+        """
+        for position in range(self.n_blocks):
+            base = self.numbers[position] << self.BLOCK_SHIFT
+            bits = self.blocks[position]
+            while bits:
+                lowest = bits & -bits
+                yield base + lowest.bit_length()
+                bits ^= lowest
+
+    def to_array(self) -> ArrayR[int]:
+        """ The elements in increasing order.
+        :complexity: O(n), see __iter__.
+        """
+        return ArrayR.from_iterable(self)
+
+    def _update_counts(self, upto: int) -> None:
+        """ Recounts the elements before each block up to position upto, from the first stale count.
+        Changes only make the counts after the block they touch stale, so a count is redone at most
+        once per change before it.
+        :complexity: O(upto - stale_from), nothing if the counts up to upto are already up to date.
+        """
+        if upto < self.stale_from:
+            return
+        position = self.stale_from
+        total = 0 if position == 0 else self.counts[position - 1] + self.blocks[position - 1].bit_count()
+        while position <= upto:
+            self.counts[position] = total
+            total += self.blocks[position].bit_count()
+            position += 1
+        self.stale_from = position
+
+    def _block_after(self, number: int) -> int:
+        """ Position of the first non-empty block numbered number or above, n_blocks if none.
+        :complexity: O(log b)
+        """
+        low, high = 0, self.n_blocks
+        while low < high:
+            mid = (low + high) // 2
+            if self.numbers[mid] < number:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def rank(self, item: int) -> int:
+        """ Number of elements in the set smaller than item, which need not be in the set.
+        :complexity: O(1) if the counts up to item's block are up to date, as the block is found
+            through the directory, and O(w / 64) word operations to count the bits below item in it.
+            If item's block is empty, the next non-empty block is found in O(log b). Changes to a
+            block make the counts after it stale, which the next rank or select recounts up to the
+            block it needs, O(b) at worst, so a set that keeps changing between ranks is not O(1).
+        """
+        self._check(item)
+        number = (item - 1) >> self.BLOCK_SHIFT
+        position = self._position(number)
+        if position < 0:
+            # Count every element before the first block numbered after item's block.
+            position = self._block_after(number)
+            if position == self.n_blocks:
+                return self.size
+            self._update_counts(position)
+            return self.counts[position]
+        self._update_counts(position)
+        below = self.blocks[position] & ((1 << ((item - 1) & (self.BLOCK_BITS - 1))) - 1)
+        return self.counts[position] + below.bit_count()
+
+    def select(self, index: int) -> int:
+        """ The element at position index in increasing order, counting from 0.
+        :raises IndexError: if there are not more than index elements.
+        :complexity: O(log b) to find the block by binary search on the counts, then O(log w) halvings
+            of the block, each O(w / 64) word operations, to find the bit. After changes, plus the
+            recount of the stale counts, see rank.
+        """
+        if not 0 <= index < self.size:
+            raise IndexError(f"No element at position {index} of a set of {self.size}.")
+        self._update_counts(self.n_blocks - 1)
+        low, high = 0, self.n_blocks - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.counts[mid] <= index:
+                low = mid
+            else:
+                high = mid - 1
+        bits = self.blocks[low]
+        index -= self.counts[low]
+        # Keep whichever half of the remaining bits holds the element, until one bit is left.
+        offset = 0
+        width = self.BLOCK_BITS
+        while width > 1:
+            width >>= 1
+            below = (bits & ((1 << width) - 1)).bit_count()
+            if index < below:
+                bits &= (1 << width) - 1
+            else:
+                index -= below
+                bits >>= width
+                offset += width
+        return (self.numbers[low] << self.BLOCK_SHIFT) + offset + 1
+
+    def __str__(self):
+        """ Construct a nice string representation. """
+        return '{' + ', '.join(str(item) for item in self) + '}'
@@ -0,0 +1,220 @@
+""" Binary heap implementation of a priority queue, with arrays.
+
+Items leave the heap smallest key first, or largest first if the heap is created with
+largest_first set. The key of an item is given by the key function, by default the item itself:
+```
+heap = ArrayHeap(10, key=lambda monster: monster.get_speed(), largest_first=True)
+for monster in team.get_monsters():
+    heap.add(monster)
+fastest = heap.pop()
+```
+An indexed heap also remembers where each item is, so update can move an item whose key has
+changed. Its items must be hashable, all different and not None.
+"""
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+from typing import Callable, Generic, Iterable, Optional
+from data_structures.linear_probe_table import LinearProbeTable
+from data_structures.referential_array import ArrayR, T
+
+
+class ArrayHeap(Generic[T]):
+    """ Binary heap with arrays, growing as needed.
+
+    Attributes:
+         length (int): number of items in the heap
+         array (ArrayR[T]): the items, array[0] first out and the children of position i at 2i+1 and 2i+2
+         keys (ArrayR): the key of the item in the same position of array, computed once when it is added
+         key (Callable): gives the key of an item
+         largest_first (bool): whether the largest key comes out first, instead of the smallest
+         positions (LinearProbeTable): for an indexed heap, the position of each item in array, otherwise None
+
+    ArrayR cannot create empty arrays. So MIN_CAPACITY used to avoid this.
+    """
+    MIN_CAPACITY = 1
+
+    def __init__(self, max_capacity: int = 1, key: Optional[Callable] = None, largest_first: bool = False,
+                 indexed: bool = False) -> None:
+        """ :complexity: O(max_capacity) """
+        self.length = 0
+        self.array = ArrayR(max(self.MIN_CAPACITY, max_capacity))
+        self.keys = ArrayR(len(self.array))
+        self.key = key if key is not None else lambda item: item
+        self.largest_first = largest_first
+        self.positions = LinearProbeTable(max_capacity) if indexed else None
+
+    @classmethod
+    def heapify(cls, items: Iterable[T], key: Optional[Callable] = None, largest_first: bool = False,
+                indexed: bool = False) -> ArrayHeap[T]:
+        """ Builds a heap of the given items, sifting down every parent from the last one up.
+        :complexity: O(n), where n is the number of items, as most positions are near the bottom.
+        :raises ValueError: if the heap is indexed and two items are equal.
+        """
+        array = ArrayR.from_iterable(items)
+        heap = cls(len(array), key, largest_first, indexed)
+        heap.length = len(array)
+        if len(array) > 0:
+            heap.array = array
+            heap.keys = ArrayR.from_iterable(heap.key(item) for item in array)
+        if indexed:
+            for i in range(heap.length):
+                heap.positions[array[i]] = i
+            if len(heap.positions) != heap.length:
+                raise ValueError("Items of an indexed heap should all be different")
+        for i in range(heap.length // 2 - 1, -1, -1):
+            heap._sift_down(i)
+        return heap
+
+    def __len__(self) -> int:
+        """ :complexity: O(1) """
+        return self.length
+
+    def is_empty(self) -> bool:
+        """ :complexity: O(1) """
+        return self.length == 0
+
+    def __contains__(self, item: T) -> bool:
+        """ True if the item is in an indexed heap.
+        :raises ValueError: if the heap is not indexed.
+        :complexity: O(1)
+        """
+        if self.positions is None:
+            raise ValueError("Only an indexed heap can look up its items")
+        return item in self.positions
+
+    def _before(self, key1, key2) -> bool:
+        """ True if an item with key1 should come out strictly before one with key2.
+        :complexity: O(1), assuming keys compare in O(1)
+        """
+        return key1 > key2 if self.largest_first else key1 < key2
+
+    def _place(self, position: int, item: T, item_key) -> None:
+        """ Puts an item and its key at a position, keeping the index up to date.
+        :complexity: O(1)
+        """
+        self.array[position] = item
+        self.keys[position] = item_key
+        if self.positions is not None:
+            self.positions[item] = position
+
+    def _sift_up(self, position: int) -> None:
+        """ Moves the item at position up past every parent it should come out before.
+        Parents move down into the hole, the item is only placed once.
+        :complexity: O(log n)
+        """
+        item, item_key = self.array[position], self.keys[position]
+        while position > 0:
+            parent = (position - 1) // 2
+            if not self._before(item_key, self.keys[parent]):
+                break
+            self._place(position, self.array[parent], self.keys[parent])
+            position = parent
+        self._place(position, item, item_key)
+
+    def _sift_down(self, position: int) -> None:
+        """ Moves the item at position down past every child that should come out before it.
+        :complexity: O(log n)
+        """
+        item, item_key = self.array[position], self.keys[position]
+        while True:
+            child = 2 * position + 1
+            if child >= self.length:
+                break
+            if child + 1 < self.length and self._before(self.keys[child + 1], self.keys[child]):
+                child += 1
+            if not self._before(self.keys[child], item_key):
+                break
+            self._place(position, self.array[child], self.keys[child])
+            position = child
+        self._place(position, item, item_key)
+
+    def add(self, item: T) -> None:
+        """ Adds an item, doubling the array first if it is full.
+        :raises ValueError: if the heap is indexed and already has the item.
+        :complexity: O(log n), amortised over the O(n) copies when the array grows.
+        """
+        if self.positions is not None and item in self.positions:
+            raise ValueError("Item is already in the heap")
+        if self.length == len(self.array):
+            array, keys = ArrayR(2 * self.length), ArrayR(2 * self.length)
+            self.array.copy_into(array, 0, 0, self.length)
+            self.keys.copy_into(keys, 0, 0, self.length)
+            self.array, self.keys = array, keys
+        self._place(self.length, item, self.key(item))
+        self.length += 1
+        self._sift_up(self.length - 1)
+
+    def peek(self) -> T:
+        """ Returns the item that comes out first, without removing it.
+        :raises IndexError: if the heap is empty.
+        :complexity: O(1)
+        """
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        return self.array[0]
+
+    def pop(self) -> T:
+        """ Removes and returns the item with the smallest key, or the largest if largest_first.
+        :raises IndexError: if the heap is empty.
+        :complexity: O(log n)
+        """
+        item = self.peek()
+        self.length -= 1
+        if self.positions is not None:
+            del self.positions[item]
+        if self.length > 0:
+            self._place(0, self.array[self.length], self.keys[self.length])
+            self._sift_down(0)
+        self.array[self.length] = None
+        self.keys[self.length] = None
+        return item
+
+    def update(self, item: T) -> None:
+        """ Moves an item of an indexed heap to where its key now puts it, after the key has changed,
+        e.g. for decrease-key. The key function is called again to get the new key.
+        :raises ValueError: if the heap is not indexed.
+        :raises KeyError: if the item is not in the heap.
+        :complexity: O(log n)
+        """
+        if self.positions is None:
+            raise ValueError("Only an indexed heap can update its items")
+        position = self.positions[item]
+        self.keys[position] = self.key(item)
+        self._sift_up(position)
+        self._sift_down(self.positions[item])
+
+    def top_k(self, k: int) -> ArrayR[T]:
+        """ The first k items to come out, in order, leaving the heap unchanged. Uses a second heap of
+        the positions that could hold the next item out, which starts at the root and swaps each
+        position taken for its children.
+        :complexity: O(k log k), whatever the size of the heap.
+        """
+        k = min(k, self.length)
+        ret = ArrayR(k)
+        if k == 0:
+            return ret
+        frontier = ArrayHeap(2 * k + 1, key=lambda position: self.keys[position], largest_first=self.largest_first)
+        frontier.add(0)
+        for i in range(k):
+            position = frontier.pop()
+            ret[i] = self.array[position]
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < self.length:
+                    frontier.add(child)
+        return ret
+
+    def pop_many(self, k: int) -> ArrayR[T]:
+        """ Removes and returns the first k items to come out, in order.
+        :raises IndexError: if the heap has fewer than k items, in which case none are removed.
+        :complexity: O(k log n)
+        """
+        if not 0 <= k <= self.length:
+            raise IndexError(f"Cannot pop {k} items from a heap of {self.length}")
+        ret = ArrayR(k)
+        for i in range(k):
+            ret[i] = self.pop()
+        return ret
+
+    def __str__(self) -> str:
+        return "[" + ", ".join(str(self.array[i]) for i in range(self.length)) + "]"
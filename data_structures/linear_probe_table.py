@@ -0,0 +1,267 @@
+""" Hash table with open addressing and linear probing.
+
+Maps keys to values, like a dict:
+```
+table = LinearProbeTable()
+table["Flamikin"] = 1
+print(table["Flamikin"])        # 1
+del table["Flamikin"]
+print("Flamikin" in table)      # False
+```
+Keys are kept in an array whose size is a power of two. A key goes in the first free position from
+its home position onwards, wrapping around, so it can be found by scanning from its home position up
+to the next free one. Deleting a key shifts later keys of the same run back into its place, so there
+are no tombstones and lookups never get slower from deletions.
+
+When adding a key would take the table past its maximum load factor, a table of twice the size is
+started and the keys are moved into it a few runs at a time by each later change, instead of all
+at once, so no single operation pays for the whole rehash.
+"""
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+from typing import Generic, Iterator, Optional, TypeVar
+from data_structures.referential_array import ArrayR
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class LinearProbeTable(Generic[K, V]):
+    """ Linear probe hash table, growing by incremental rehashing.
+
+    Attributes:
+         keys (ArrayR[K]): the keys, None in free positions
+         values (ArrayR[V]): the value of the key in the same position
+         count (int): number of keys in keys
+         shift (int): 64 minus log2 of the size of keys, to take the top bits of a mixed hash
+         max_load_factor (float): largest fraction of the positions that can be in use
+         old_keys (ArrayR[K]): while rehashing, the keys still to move out of the previous table, otherwise None
+         old_values (ArrayR[V]): while rehashing, their values
+         old_count (int): number of keys in old_keys
+         old_shift (int): shift of the previous table
+         migrate_from (int): position in old_keys the rehash continues from
+         migrate_left (int): number of positions of old_keys the rehash still has to visit
+
+    Every key is in exactly one of the two tables.
+    """
+    MIN_CAPACITY = 8
+    MIGRATE_STEP = 8
+    MULTIPLIER = 0x9E3779B97F4A7C15  # 2**64 divided by the golden ratio, spreads nearby hashes apart
+    MASK64 = (1 << 64) - 1
+
+    def __init__(self, capacity: int = MIN_CAPACITY, max_load_factor: float = 0.75) -> None:
+        """ Creates an empty table with room for at least capacity keys before it grows.
+        :complexity: O(capacity)
+        :raises ValueError: if the load factor is not between 0 and 1, excluded.
+        """
+        if not 0 < max_load_factor < 1:
+            raise ValueError("The maximum load factor should be between 0 and 1")
+        self.max_load_factor = max_load_factor
+        size = self.MIN_CAPACITY
+        while size * max_load_factor < capacity:
+            size *= 2
+        self.keys, self.values, self.shift = self._new_arrays(size)
+        self.count = 0
+        self.old_keys = self.old_values = None
+        self.old_count = self.old_shift = self.migrate_from = self.migrate_left = 0
+
+    @staticmethod
+    def _new_arrays(size: int) -> tuple[ArrayR, ArrayR, int]:
+        """ Empty key and value arrays of a size that is a power of two, and the matching shift.
+        :complexity: O(size)
+        """
+        return ArrayR(size), ArrayR(size), 64 - (size.bit_length() - 1)
+
+    def _home(self, key: K, shift: int) -> int:
+        """ Home position of a key, from the top bits of its hash multiplied by MULTIPLIER.
+        Masking the hash directly would send keys differing only in their high bits to one position.
+        :complexity: O(1), plus hashing the key
+        """
+        return ((hash(key) * self.MULTIPLIER) & self.MASK64) >> shift
+
+    @staticmethod
+    def _find(keys: ArrayR, key: K, home: int) -> int:
+        """ Position of key in keys, or of the free position ending its run if it is not there.
+        :complexity: O(r), where r is the length of the run from home, O(1) on average below the load factor.
+        """
+        mask = len(keys) - 1
+        position = home
+        while keys[position] is not None and keys[position] != key:
+            position = (position + 1) & mask
+        return position
+
+    def _locate(self, key: K) -> tuple[Optional[ArrayR], int]:
+        """ The keys array holding key, and its position there, or (None, 0) if it is in neither table.
+        :complexity: O(1) on average
+        """
+        if key is None:
+            raise KeyError("None cannot be a key")
+        position = self._find(self.keys, key, self._home(key, self.shift))
+        if self.keys[position] is not None:
+            return self.keys, position
+        if self.old_keys is not None:
+            position = self._find(self.old_keys, key, self._home(key, self.old_shift))
+            if self.old_keys[position] is not None:
+                return self.old_keys, position
+        return None, 0
+
+    def __len__(self) -> int:
+        """ :complexity: O(1) """
+        return self.count + self.old_count
+
+    def is_empty(self) -> bool:
+        """ :complexity: O(1) """
+        return len(self) == 0
+
+    def __contains__(self, key: K) -> bool:
+        """ :complexity: O(1) on average, see _find """
+        return self._locate(key)[0] is not None
+
+    def __getitem__(self, key: K) -> V:
+        """ The value of a key.
+        :raises KeyError: if the key is not in the table.
+        :complexity: O(1) on average, see _find
+        """
+        keys, position = self._locate(key)
+        if keys is None:
+            raise KeyError(key)
+        return (self.values if keys is self.keys else self.old_values)[position]
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """ The value of a key, or default if the key is not in the table.
+        :complexity: O(1) on average, see _find
+        """
+        keys, position = self._locate(key)
+        if keys is None:
+            return default
+        return (self.values if keys is self.keys else self.old_values)[position]
+
+    def __setitem__(self, key: K, value: V) -> None:
+        """ Sets the value of a key, adding the key if it is not in the table.
+        :raises KeyError: if the key is None, which marks free positions.
+        :complexity: O(1) on average. Starting a rehash is O(n) to allocate the larger table,
+            but the keys are then moved a few at a time by later changes.
+        """
+        keys, position = self._locate(key)
+        if keys is self.keys:
+            self.values[position] = value
+            return
+        if keys is not None:
+            # Keys move to the current table when they are changed, which also shortens the rehash.
+            self._delete(self.old_keys, self.old_values, position, self.old_shift)
+            self.old_count -= 1
+        elif len(self) + 1 > self.max_load_factor * len(self.keys):
+            self._start_rehash()
+        self._insert(key, value)
+        self._migrate()
+
+    def __delitem__(self, key: K) -> None:
+        """ Removes a key and its value.
+        :raises KeyError: if the key is not in the table.
+        :complexity: O(1) on average, see _delete
+        """
+        keys, position = self._locate(key)
+        if keys is None:
+            raise KeyError(key)
+        if keys is self.keys:
+            self._delete(self.keys, self.values, position, self.shift)
+            self.count -= 1
+        else:
+            self._delete(self.old_keys, self.old_values, position, self.old_shift)
+            self.old_count -= 1
+        self._migrate()
+
+    def _insert(self, key: K, value: V) -> None:
+        """ Adds a key that is in neither table to the current table.
+        :complexity: O(1) on average
+        """
+        position = self._find(self.keys, key, self._home(key, self.shift))
+        self.keys[position] = key
+        self.values[position] = value
+        self.count += 1
+
+    def _delete(self, keys: ArrayR, values: ArrayR, position: int, shift: int) -> None:
+        """ Frees a position, then walks the rest of its run moving back into the gap every key
+        whose home is not between the gap and the key, so every key stays reachable from its home.
+        :complexity: O(r), where r is the length of the rest of the run.
+        """
+        mask = len(keys) - 1
+        gap = position
+        position = (position + 1) & mask
+        while keys[position] is not None:
+            home = self._home(keys[position], shift)
+            # The key can fill the gap unless its home is cyclically after the gap, up to its position.
+            if (position - home) & mask >= (position - gap) & mask:
+                keys[gap] = keys[position]
+                values[gap] = values[position]
+                gap = position
+            position = (position + 1) & mask
+        keys[gap] = None
+        values[gap] = None
+
+    def _start_rehash(self) -> None:
+        """ Makes the current table the old one and starts an empty one of twice the size, finishing
+        any rehash still going first. The move starts just after a free position, so it takes
+        whole runs, and keys left in the old table can still be found from their homes.
+        :complexity: O(n) to allocate the new table, plus the rest of any previous rehash.
+        """
+        if self.old_keys is not None:
+            self._migrate(len(self.old_keys))
+        size = 2 * len(self.keys)
+        while self.max_load_factor * size < len(self) + 1:
+            size *= 2
+        self.old_keys, self.old_values, self.old_shift = self.keys, self.values, self.shift
+        self.old_count, self.count = self.count, 0
+        self.keys, self.values, self.shift = self._new_arrays(size)
+        free = 0
+        while self.old_keys[free] is not None:
+            free += 1
+        self.migrate_from = (free + 1) & (len(self.old_keys) - 1)
+        self.migrate_left = len(self.old_keys)
+
+    def _migrate(self, steps: int = MIGRATE_STEP) -> None:
+        """ Moves the keys of at least steps positions of the old table to the current one, going on
+        to the free position ending the run it is in, as taking part of a run could cut the rest off
+        from their homes.
+        :complexity: O(steps) on average
+        """
+        if self.old_keys is None:
+            return
+        mask = len(self.old_keys) - 1
+        while self.migrate_left > 0 and (steps > 0 or self.old_keys[self.migrate_from] is not None):
+            key = self.old_keys[self.migrate_from]
+            if key is not None:
+                self._insert(key, self.old_values[self.migrate_from])
+                self.old_keys[self.migrate_from] = None
+                self.old_values[self.migrate_from] = None
+                self.old_count -= 1
+            self.migrate_from = (self.migrate_from + 1) & mask
+            self.migrate_left -= 1
+            steps -= 1
+        if self.migrate_left == 0 or self.old_count == 0:
+            self.old_keys = self.old_values = None
+            self.old_count = 0
+
+    def __iter__(self) -> Iterator[K]:
+        """ Iterates over the keys, in no particular order. The table should not change meanwhile.
+        :complexity: O(m), where m is the size of the arrays.
+        """
+        for keys in (self.keys, self.old_keys):
+            if keys is not None:
+                for i in range(len(keys)):
+                    if keys[i] is not None:
+                        yield keys[i]
+
+    def items(self) -> Iterator[tuple[K, V]]:
+        """ Iterates over the (key, value) pairs, in no particular order.
+        :complexity: O(m), see __iter__
+        """
+        for keys, values in ((self.keys, self.values), (self.old_keys, self.old_values)):
+            if keys is not None:
+                for i in range(len(keys)):
+                    if keys[i] is not None:
+                        yield keys[i], values[i]
+
+    def __str__(self) -> str:
+        return "{" + ", ".join(f"{key!r}: {value!r}" for key, value in self.items()) + "}"
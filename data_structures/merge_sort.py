@@ -0,0 +1,47 @@
+""" Stable merge sort of array positions by their keys.
+
+Sorts the positions of an array instead of its contents, so one sort serves any array of keys, and
+the caller can reorder as many parallel arrays as it likes by the result:
+```
+lives = ArrayI.from_iterable([3, 1, 2, 1])
+order = merge_sort_indices(lives, len(lives))
+print(order.to_list())      # [1, 3, 2, 0]
+```
+"""
+__docformat__ = 'reStructuredText'
+
+from data_structures.typed_array import ArrayI
+
+
+def merge_sort_indices(keys, n: int) -> ArrayI:
+    """ The positions 0 to n - 1 of keys, an ArrayR, ArrayI or ArrayF, stably sorted by their keys,
+    using a bottom up merge sort.
+    :complexity: O(n log n), assuming keys compare in O(1).
+    """
+    order = ArrayI(n)
+    for i in range(n):
+        order[i] = i
+    buffer = ArrayI(n)
+    width = 1
+    while width < n:
+        for start in range(0, n, 2 * width):
+            mid = min(start + width, n)
+            end = min(start + 2 * width, n)
+            left, right, k = start, mid, start
+            while left < mid and right < end:
+                # Taking from the left on ties keeps the sort stable.
+                if keys[order[left]] <= keys[order[right]]:
+                    buffer[k] = order[left]
+                    left += 1
+                else:
+                    buffer[k] = order[right]
+                    right += 1
+                k += 1
+            # Once either run is used up, the rest of the other is already in order.
+            if left < mid:
+                order.copy_into(buffer, left, k, mid - left)
+            else:
+                order.copy_into(buffer, right, k, end - right)
+        order, buffer = buffer, order
+        width *= 2
+    return order
@@ -0,0 +1,201 @@
+""" Persistent vector, which keeps every earlier version when it is changed.
+
+set and append return a new vector and leave the one they are called on as it was. The new vector
+shares all but O(log n) of its memory with the old one, so keeping many versions is cheap:
+```
+v1 = PersistentVector.from_iterable(range(1000))
+v2 = v1.set(5, -1)
+print(v1[5], v2[5])         # 5 -1
+v3 = v2.append(1000)
+print(len(v2), len(v3))     # 1000 1001
+```
+The elements are the leaves of a trie with BRANCHING children per node, found from the bits of
+their index, BRANCH_BITS at a time from the top. The last, partly filled leaf is kept apart as the
+tail, so most appends only copy the tail.
+"""
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+from typing import Generic, Iterable, Iterator, Optional
+from data_structures.referential_array import ArrayR, T
+
+
+class PersistentVector(Generic[T]):
+    """ Immutable vector as a bit-partitioned trie, with structural sharing between versions.
+
+    Attributes:
+         length (int): number of elements
+         shift (int): BRANCH_BITS times the number of levels of the trie above the leaves
+         root (ArrayR): the root node of the trie, holding every element before the tail.
+            Nodes above the leaves hold up to BRANCHING nodes, the rest None.
+         tail (ArrayR[T]): the last 1 to BRANCHING elements, or none if the vector is empty
+
+    Nodes are never changed once a vector uses them, they are copied instead.
+    """
+    BRANCH_BITS = 5
+    BRANCHING = 1 << BRANCH_BITS
+    MASK = BRANCHING - 1
+
+    def __init__(self) -> None:
+        """ Creates an empty vector.
+        :complexity: O(1)
+        """
+        self.length = 0
+        self.shift = self.BRANCH_BITS
+        self.root = ArrayR(self.BRANCHING)
+        self.tail = ArrayR(0)
+
+    @classmethod
+    def _make(cls, length: int, shift: int, root: ArrayR, tail: ArrayR) -> PersistentVector[T]:
+        """ :complexity: O(1) """
+        ret = cls.__new__(cls)
+        ret.length, ret.shift, ret.root, ret.tail = length, shift, root, tail
+        return ret
+
+    @classmethod
+    def from_iterable(cls, items: Iterable[T]) -> PersistentVector[T]:
+        """ A vector of the given items, in order.
+        :complexity: O(n), where n is the number of items, see append.
+        """
+        ret = cls()
+        for item in items:
+            ret = ret.append(item)
+        return ret
+
+    def __len__(self) -> int:
+        """ :complexity: O(1) """
+        return self.length
+
+    def _tail_offset(self) -> int:
+        """ Index of the first element in the tail.
+        :complexity: O(1)
+        """
+        return self.length - len(self.tail)
+
+    def _leaf(self, index: int) -> ArrayR[T]:
+        """ The leaf (or tail) holding the element at index.
+        :complexity: O(log n), one node per level.
+        """
+        if index >= self._tail_offset():
+            return self.tail
+        node = self.root
+        level = self.shift
+        while level > 0:
+            node = node[(index >> level) & self.MASK]
+            level -= self.BRANCH_BITS
+        return node
+
+    def _check(self, index: int) -> int:
+        """ The index, counting negative ones from the end like a list.
+        :raises IndexError: if it is out of range.
+        :complexity: O(1)
+        """
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError(f"Index {index} out of range for a vector of {self.length}.")
+        return index
+
+    def __getitem__(self, index: int) -> T:
+        """ :complexity: O(log n), O(1) in the tail
+        :raises IndexError: if the index is out of range.
+        """
+        index = self._check(index)
+        if index >= self._tail_offset():
+            return self.tail[index - self._tail_offset()]
+        return self._leaf(index)[index & self.MASK]
+
+    @staticmethod
+    def _copy(node: ArrayR, length: Optional[int] = None) -> ArrayR:
+        """ A copy of a node, lengthened or shortened to length if given.
+        :complexity: O(length)
+        """
+        length = len(node) if length is None else length
+        ret = ArrayR(length)
+        node.copy_into(ret, 0, 0, min(length, len(node)))
+        return ret
+
+    def set(self, index: int, item: T) -> PersistentVector[T]:
+        """ A new vector with the element at index replaced by item. Only the nodes on the path to
+        the element are copied, the rest are shared with this vector.
+        :raises IndexError: if the index is out of range.
+        :complexity: O(log n), copying one node of BRANCHING places per level.
+        """
+        index = self._check(index)
+        if index >= self._tail_offset():
+            tail = self._copy(self.tail)
+            tail[index - self._tail_offset()] = item
+            return self._make(self.length, self.shift, self.root, tail)
+        return self._make(self.length, self.shift, self._set_in(self.root, self.shift, index, item), self.tail)
+
+    def _set_in(self, node: ArrayR, level: int, index: int, item: T) -> ArrayR:
+        """ A copy of node, level bits above the leaves, with the element at index replaced.
+        :complexity: O(log n)
+        """
+        ret = self._copy(node)
+        if level == 0:
+            ret[index & self.MASK] = item
+        else:
+            child = (index >> level) & self.MASK
+            ret[child] = self._set_in(node[child], level - self.BRANCH_BITS, index, item)
+        return ret
+
+    def append(self, item: T) -> PersistentVector[T]:
+        """ A new vector with item added at the end. When the tail is full, it becomes a leaf of
+        the trie, which grows a level when its root is full.
+        :complexity: O(BRANCHING) to copy the tail, which is O(1), plus O(log n) once every
+            BRANCHING appends, when the tail moves into the trie.
+        """
+        if len(self.tail) < self.BRANCHING:
+            tail = self._copy(self.tail, len(self.tail) + 1)
+            tail[len(self.tail)] = item
+            return self._make(self.length + 1, self.shift, self.root, tail)
+        tail = ArrayR(1)
+        tail[0] = item
+        # The root is full when the trie, which holds every element before the tail, has room for no more.
+        if self._tail_offset() == 1 << (self.shift + self.BRANCH_BITS):
+            root = ArrayR(self.BRANCHING)
+            root[0] = self.root
+            root[1] = self._path(self.shift, self.tail)
+            return self._make(self.length + 1, self.shift + self.BRANCH_BITS, root, tail)
+        return self._make(self.length + 1, self.shift, self._push_tail(self.root, self.shift), tail)
+
+    def _path(self, level: int, leaf: ArrayR) -> ArrayR:
+        """ A chain of new nodes from level bits above the leaves down to the leaf.
+        :complexity: O(log n)
+        """
+        if level == 0:
+            return leaf
+        node = ArrayR(self.BRANCHING)
+        node[0] = self._path(level - self.BRANCH_BITS, leaf)
+        return node
+
+    def _push_tail(self, node: ArrayR, level: int) -> ArrayR:
+        """ A copy of node, level bits above the leaves, with the full tail added as the next leaf.
+        :complexity: O(log n)
+        """
+        ret = self._copy(node)
+        child = (self._tail_offset() >> level) & self.MASK
+        if level == self.BRANCH_BITS:
+            ret[child] = self.tail
+        elif node[child] is None:
+            ret[child] = self._path(level - self.BRANCH_BITS, self.tail)
+        else:
+            ret[child] = self._push_tail(node[child], level - self.BRANCH_BITS)
+        return ret
+
+    def __iter__(self) -> Iterator[T]:
+        """ Iterates over the elements in order, a leaf at a time.
+        :complexity: O(1) per element, plus O(log n) per leaf.
+        """
+        tail_offset = self._tail_offset()
+        for start in range(0, tail_offset, self.BRANCHING):
+            yield from self._leaf(start)
+        yield from self.tail
+
+    def to_array(self) -> ArrayR[T]:
+        """ :complexity: O(n) """
+        return ArrayR.from_iterable(self)
+
+    def __str__(self) -> str:
+        return "[" + ", ".join(str(item) for item in self) + "]"
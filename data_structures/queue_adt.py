@@ -8,7 +8,7 @@ __docformat__ = 'reStructuredText'
 
 import unittest
 from abc import ABC, abstractmethod
-from typing import Generic
+from typing import Generic, Iterator
 from data_structures.referential_array import ArrayR, T
 
 class Queue(ABC, Generic[T]):
@@ -52,25 +52,30 @@ class CircularQueue(Queue[T]):
          front (int): index of the element at the front of the queue
          rear (int): index of the first empty space at the back of the queue
          array (ArrayR[T]): array storing the elements of the queue
+         growable (bool): whether the array doubles in size when full, instead of append raising
 
     ArrayR cannot create empty arrays. So MIN_CAPACITY used to avoid this.
     """
     MIN_CAPACITY = 1
 
-    def __init__(self,max_capacity:int) -> None:
+    def __init__(self,max_capacity:int, growable: bool = False) -> None:
         Queue.__init__(self)
         self.front = 0
         self.rear = 0
         self.array = ArrayR(max(self.MIN_CAPACITY,max_capacity))
+        self.growable = growable
 
 
     def append(self, item: T) -> None:
         """ Adds an element to the rear of the queue.
-        :pre: queue is not full
+        :pre: queue is not full, unless it is growable
         :raises Exception: if the queue is full
+        :complexity: O(1), amortised O(1) for a growable queue, which is O(n) when it grows.
         """
-        if self.is_full():
-            raise Exception("Queue is full")
+        if len(self) == len(self.array):
+            if not self.growable:
+                raise Exception("Queue is full")
+            self._grow()
 
         self.array[self.rear] = item
         self.length += 1
@@ -100,9 +105,56 @@ class CircularQueue(Queue[T]):
         item = self.array[self.front]
         return item
 
+    def _grow(self) -> None:
+        """ Doubles the size of the array, unrolling the elements to start at position 0.
+        :complexity: O(n)
+        """
+        array = ArrayR(2 * len(self.array))
+        first_run = min(len(self), len(self.array) - self.front)
+        self.array.copy_into(array, self.front, 0, first_run)
+        self.array.copy_into(array, 0, first_run, len(self) - first_run)
+        self.array = array
+        self.front = 0
+        self.rear = len(self)
+
+    def _position(self, index: int) -> int:
+        """ Position in the array of the element index places behind the front.
+        :raises IndexError: if the queue does not have that many elements.
+        :complexity: O(1)
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f"No element at position {index} of a queue of {len(self)}.")
+        return (self.front + index) % len(self.array)
+
+    def peek_at(self, index: int) -> T:
+        """ Returns the element index places behind the front, so peek_at(0) is peek().
+        :raises IndexError: if the queue does not have that many elements.
+        :complexity: O(1)
+        """
+        return self.array[self._position(index)]
+
+    def set_at(self, index: int, item: T) -> None:
+        """ Replaces the element index places behind the front.
+        :raises IndexError: if the queue does not have that many elements.
+        :complexity: O(1)
+        """
+        self.array[self._position(index)] = item
+
+    def __iter__(self) -> Iterator[T]:
+        """ Iterates over the elements from the front to the rear, without serving them.
+        The queue should not change while it is iterated over.
+        :complexity: O(1) per element
+        """
+        position = self.front
+        for _ in range(len(self)):
+            yield self.array[position]
+            position += 1
+            if position == len(self.array):
+                position = 0
+
     def is_full(self) -> bool:
-        """ True if the queue is full and no element can be appended. """
-        return len(self) == len(self.array)
+        """ True if the queue is full and no element can be appended. A growable queue is never full. """
+        return not self.growable and len(self) == len(self.array)
 
     def clear(self) -> None:
         """ Clears all elements from the queue. """
@@ -189,6 +241,22 @@ class TestQueue(unittest.TestCase):
             for i in range(nitems):
                 self.assertEqual(queue.serve(), i)
 
+    def test_growable(self):
+        queue = CircularQueue(2, growable=True)
+        queue.append(0)
+        queue.serve()
+        # The elements wrap around the end of the array before it grows.
+        for i in range(7):
+            queue.append(i)
+        self.assertFalse(queue.is_full())
+        self.assertEqual(list(queue), list(range(7)))
+        self.assertEqual(queue.peek_at(6), 6)
+        queue.set_at(0, 10)
+        self.assertEqual(queue.serve(), 10)
+        self.assertEqual(queue.peek_at(0), 1)
+        with self.assertRaises(IndexError):
+            queue.peek_at(6)
+
     def test_clear(self):
         for queue in self.queues:
             queue.clear()
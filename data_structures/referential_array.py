@@ -14,6 +14,11 @@ space to hold the references.
 Note that while I do check the precondition in __init__ (noone else
 would), I do not check that of getitem or setitem, since that is already
 checked by self.array[index].
+
+Whole runs of elements are moved with slice assignment on the ctypes array,
+which copies the references in C rather than one __setitem__ call at a time.
+from_iterable, filled, slicing, __iter__ and copy_into all work this way,
+and the data structures use copy_into to resize and to shift elements.
 """
 __author__ = """
 Julian Garcia for the __init__ code, Maria Garcia de la Banda for the rest.
@@ -22,7 +27,7 @@ Modified by Jackson Goerner
 __docformat__ = "reStructuredText"
 
 from ctypes import py_object
-from typing import TypeVar, Generic
+from typing import Iterable, Iterator, TypeVar, Generic
 
 T = TypeVar("T")
 
@@ -36,7 +41,41 @@ class ArrayR(Generic[T]):
         if length < 0:
             raise ValueError("Array length should be larger than or equal to 0.")
         self.array = (length * py_object)()  # initialises the space
-        self.array[:] = [None for _ in range(length)]
+        self.array[:] = [None] * length
+
+    @classmethod
+    def _unset(cls, length: int) -> ArrayR[T]:
+        """Creates an array whose elements are not set yet, for the caller to fill in one go.
+        Reading an element before it is set raises ValueError.
+        :complexity: O(length) to allocate the space
+        """
+        ret = cls.__new__(cls)
+        ret.array = (length * py_object)()
+        return ret
+
+    @classmethod
+    def from_iterable(cls, items: Iterable[T]) -> ArrayR[T]:
+        """Creates an array holding the given items, in order.
+        :complexity: O(n) where n is the number of items, copied in one slice assignment
+        """
+        if isinstance(items, ArrayR):
+            items = items.array[:]
+        elif not isinstance(items, (list, tuple)):
+            items = list(items)
+        ret = cls._unset(len(items))
+        ret.array[:] = items
+        return ret
+
+    @classmethod
+    def filled(cls, length: int, value: T) -> ArrayR[T]:
+        """Creates an array of the given length with every element set to value.
+        :complexity: O(length)
+        """
+        if length < 0:
+            raise ValueError("Array length should be larger than or equal to 0.")
+        ret = cls._unset(length)
+        ret.array[:] = [value] * length
+        return ret
 
     def __len__(self) -> int:
         """Returns the length of the array
@@ -44,19 +83,45 @@ class ArrayR(Generic[T]):
         """
         return len(self.array)
 
-    def __getitem__(self, index: int) -> T:
-        """Returns the object in position index.
-        :complexity: O(1)
+    def __getitem__(self, index: int | slice) -> T | ArrayR[T]:
+        """Returns the object in position index, or a new array of the objects in a slice.
+        :complexity: O(1) for an index, O(k) for a slice of k elements
         :pre: index in between 0 and length - self.array[] checks it
         """
+        if type(index) is slice:
+            return ArrayR.from_iterable(self.array[index])
         return self.array[index]
 
-    def __setitem__(self, index: int, value: T) -> None:
-        """Sets the object in position index to value
-        :complexity: O(1)
+    def __setitem__(self, index: int | slice, value: T | Iterable[T]) -> None:
+        """Sets the object in position index to value, or the objects in a slice to the values given,
+        which must be as many as the slice has elements.
+        :complexity: O(1) for an index, O(k) for a slice of k elements
         :pre: index in between 0 and length - self.array[] checks it
         """
-        self.array[index] = value
+        if type(index) is slice:
+            if isinstance(value, ArrayR):
+                value = value.array[:]
+            elif not isinstance(value, (list, tuple)):
+                value = list(value)
+            self.array[index] = value
+        else:
+            self.array[index] = value
+
+    def __iter__(self) -> Iterator[T]:
+        """Iterates over the objects in the array, in order.
+        :complexity: O(1) per object
+        """
+        return iter(self.array)
+
+    def copy_into(self, dest: ArrayR[T], src_off: int, dst_off: int, k: int) -> None:
+        """Copies the k objects from position src_off onwards into dest, from position dst_off onwards.
+        dest may be this array, even with the two runs overlapping, as the objects are read before any is written.
+        :complexity: O(k)
+        :raises IndexError: if either run does not fit in its array
+        """
+        if k < 0 or src_off < 0 or dst_off < 0 or src_off + k > len(self.array) or dst_off + k > len(dest.array):
+            raise IndexError(f"Cannot copy {k} objects from {src_off} to {dst_off}.")
+        dest.array[dst_off:dst_off + k] = self.array[src_off:src_off + k]
 
     def index(self, item: T) -> T:
         for index, arr_item in enumerate(self.array):
@@ -76,13 +141,9 @@ class ArrayR(Generic[T]):
 
     @classmethod
     def from_list(cls, l: list[T]) -> ArrayR[T]:
-        ret = ArrayR(len(l))
-        for x in range(len(l)):
-            ret[x] = l[x]
-        return ret
+        """:complexity: O(n), see from_iterable"""
+        return cls.from_iterable(l)
 
     def to_list(self) -> list[T]:
-        ret = []
-        for x in range(len(self)):
-            ret.append(self[x])
-        return ret
+        """:complexity: O(n), the objects are copied in one slice"""
+        return self.array[:]
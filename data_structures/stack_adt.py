@@ -8,7 +8,7 @@ __docformat__ = 'reStructuredText'
 
 import unittest
 from abc import ABC, abstractmethod
-from typing import TypeVar, Generic
+from typing import TypeVar, Generic, Iterable
 from data_structures.referential_array import ArrayR, T
 
 class Stack(ABC, Generic[T]):
@@ -54,32 +54,81 @@ class ArrayStack(Stack[T]):
     Attributes:
          length (int): number of elements in the stack (inherited)
          array (ArrayR[T]): array storing the elements of the queue
+         growable (bool): whether the array doubles in size when full, instead of push raising
 
     ArrayR cannot create empty arrays. So MIN_CAPACITY used to avoid this.
     """
     MIN_CAPACITY = 1
 
-    def __init__(self, max_capacity: int) -> None:
+    def __init__(self, max_capacity: int, growable: bool = False) -> None:
         """ Initialises the length and the array with the given capacity.
             If max_capacity is 0, the array is created with MIN_CAPACITY.
         """
         Stack.__init__(self)
         self.array = ArrayR(max(self.MIN_CAPACITY, max_capacity))
+        self.growable = growable
 
     def is_full(self) -> bool:
-        """ True if the stack is full and no element can be pushed. """
-        return len(self) == len(self.array)
+        """ True if the stack is full and no element can be pushed. A growable stack is never full. """
+        return not self.growable and len(self) == len(self.array)
+
+    def _resize(self, capacity: int) -> None:
+        """ Moves the elements to a new array of the given capacity.
+        :complexity: O(capacity)
+        """
+        array = ArrayR(capacity)
+        self.array.copy_into(array, 0, 0, len(self))
+        self.array = array
+
+    def reset(self, capacity: int = 0) -> None:
+        """ Empties the stack to be used again, keeping its array unless it has fewer than
+            capacity places, in which case it is replaced by one with room for capacity elements.
+        :complexity: O(1), O(capacity) if the array is replaced.
+        """
+        self.clear()
+        if capacity > len(self.array):
+            self.array = ArrayR(capacity)
 
     def push(self, item: T) -> None:
         """ Pushes an element to the top of the stack.
-        :pre: stack is not full
+        :pre: stack is not full, unless it is growable
         :raises Exception: if the stack is full
+        :complexity: O(1), amortised O(1) for a growable stack, which is O(n) when it grows.
         """
-        if self.is_full():
-            raise Exception("Stack is full")
+        if len(self) == len(self.array):
+            if not self.growable:
+                raise Exception("Stack is full")
+            self._resize(2 * len(self.array))
         self.array[len(self)] = item
         self.length += 1
 
+    def push_many(self, items: Iterable[T]) -> None:
+        """ Pushes the elements in order, so the last one ends up on top.
+            If the stack fills part way through, the elements pushed so far stay on it.
+        :pre: stack has room for the elements, unless it is growable
+        :raises Exception: if the stack is full
+        :complexity: O(k) amortised, where k is the number of elements. If items has a length,
+            a growable stack grows at most once.
+        """
+        if self.growable and hasattr(items, "__len__") and len(self) + len(items) > len(self.array):
+            self._resize(max(2 * len(self.array), len(self) + len(items)))
+        for item in items:
+            self.push(item)
+
+    def pop_many(self, k: int) -> ArrayR[T]:
+        """ Pops k elements, returning them in the order they were popped, top first.
+        :pre: stack has at least k elements
+        :raises Exception: if the stack has fewer than k elements, in which case none are popped
+        :complexity: O(k)
+        """
+        if not 0 <= k <= len(self):
+            raise Exception("Stack does not have " + str(k) + " elements")
+        popped = ArrayR(k)
+        for i in range(k):
+            popped[i] = self.array[self.length - 1 - i]
+        self.length -= k
+        return popped
+
     def pop(self) -> T:
         """ Pops the element at the top of the stack.
         :pre: stack is not empty
@@ -177,6 +226,30 @@ class TestStack(unittest.TestCase):
             for i in range(nitems-1, -1, -1):
                 self.assertEqual(stack.pop(), i)
 
+    def test_growable(self):
+        stack = ArrayStack(1, growable=True)
+        stack.push_many(range(5))
+        stack.push_many(iter([5, 6]))
+        self.assertFalse(stack.is_full())
+        self.assertEqual(len(stack), 7)
+        self.assertEqual(stack.pop_many(3).to_list(), [6, 5, 4])
+        self.assertEqual(stack.peek(), 3)
+        with self.assertRaises(Exception):
+            stack.pop_many(5)
+        self.assertEqual(len(stack), 4)
+        array = stack.array
+        stack.reset()
+        self.assertTrue(stack.is_empty())
+        self.assertIs(stack.array, array)
+        stack.reset(100)
+        self.assertEqual(len(stack.array), 100)
+
+    def test_push_many_full(self):
+        stack = ArrayStack(2)
+        with self.assertRaises(Exception):
+            stack.push_many([1, 2, 3])
+        self.assertEqual(stack.pop_many(2).to_list(), [2, 1])
+
     def test_clear(self):
         for stack in self.stacks:
             stack.clear()
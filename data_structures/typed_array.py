@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+""" Compact arrays of machine numbers, with the interface of ArrayR
+
+ArrayR holds a reference to a boxed Python object per element, which costs
+the pointer plus the object itself. For arrays that only ever hold numbers,
+ArrayI (64 bit signed integers) and ArrayF (64 bit floats) store the raw
+values in a single block of memory instead, 8 bytes per element, using the
+array module.
+
+They can be used wherever an ArrayR of numbers is, and their memory can be
+handed to NumPy without copying it:
+```
+lives = ArrayI(1000)
+lives[0] = 5
+view = lives.to_numpy()     # Shares memory with lives
+view[1] = 7
+print(lives[1])             # 7
+```
+Storing a value that does not fit raises OverflowError (ArrayI) or TypeError.
+"""
+__docformat__ = "reStructuredText"
+
+from array import array
+from typing import Iterable, Iterator
+
+
+class _TypedArray:
+    """ Array of numbers of the type given by TYPECODE (see the array module). """
+    TYPECODE = ""
+
+    def __init__(self, length: int) -> None:
+        """Creates an array of the given length with every element 0
+        :complexity: O(length) for best/worst case to zero the memory
+        :pre: length >= 0
+        """
+        if length < 0:
+            raise ValueError("Array length should be larger than or equal to 0.")
+        self.array = array(self.TYPECODE, bytes(length * 8))
+
+    @classmethod
+    def from_iterable(cls, items: Iterable) -> _TypedArray:
+        """Creates an array holding the given numbers, in order.
+        :complexity: O(n) where n is the number of items
+        """
+        ret = cls.__new__(cls)
+        ret.array = array(cls.TYPECODE, items.array if isinstance(items, _TypedArray) else items)
+        return ret
+
+    @classmethod
+    def filled(cls, length: int, value: int | float) -> _TypedArray:
+        """Creates an array of the given length with every element set to value.
+        :complexity: O(length)
+        """
+        if length < 0:
+            raise ValueError("Array length should be larger than or equal to 0.")
+        ret = cls.__new__(cls)
+        ret.array = array(cls.TYPECODE, [value]) * length
+        return ret
+
+    @classmethod
+    def from_list(cls, l: list) -> _TypedArray:
+        """:complexity: O(n), see from_iterable"""
+        return cls.from_iterable(l)
+
+    def to_list(self) -> list:
+        """:complexity: O(n)"""
+        return self.array.tolist()
+
+    def __len__(self) -> int:
+        """Returns the length of the array
+        :complexity: O(1)
+        """
+        return len(self.array)
+
+    def __getitem__(self, index: int | slice) -> int | float | _TypedArray:
+        """Returns the number in position index, or a new array of the numbers in a slice.
+        :complexity: O(1) for an index, O(k) for a slice of k elements
+        :pre: index in between 0 and length - self.array[] checks it
+        """
+        if type(index) is slice:
+            ret = self.__class__.__new__(self.__class__)
+            ret.array = self.array[index]
+            return ret
+        return self.array[index]
+
+    def __setitem__(self, index: int | slice, value) -> None:
+        """Sets the number in position index to value, or the numbers in a slice to the values given,
+        which must be as many as the slice has elements.
+        :complexity: O(1) for an index, O(k) for a slice of k elements
+        :pre: index in between 0 and length - self.array[] checks it
+        """
+        if type(index) is slice:
+            if not isinstance(value, _TypedArray):
+                value = self.from_iterable(value)
+            if len(range(*index.indices(len(self.array)))) != len(value.array):
+                raise ValueError("Can only assign sequence of same size")
+            self.array[index] = value.array
+        else:
+            self.array[index] = value
+
+    def __iter__(self) -> Iterator:
+        """Iterates over the numbers in the array, in order.
+        :complexity: O(1) per number
+        """
+        return iter(self.array)
+
+    def copy_into(self, dest: _TypedArray, src_off: int, dst_off: int, k: int) -> None:
+        """Copies the k numbers from position src_off onwards into dest, from position dst_off onwards.
+        dest may be this array, even with the two runs overlapping.
+        :complexity: O(k)
+        :raises IndexError: if either run does not fit in its array
+        """
+        if k < 0 or src_off < 0 or dst_off < 0 or src_off + k > len(self.array) or dst_off + k > len(dest.array):
+            raise IndexError(f"Cannot copy {k} numbers from {src_off} to {dst_off}.")
+        memoryview(dest.array)[dst_off:dst_off + k] = memoryview(self.array)[src_off:src_off + k]
+
+    def index(self, item: int | float) -> int:
+        """Position of the first element equal to item.
+        :complexity: O(n)
+        :raises ValueError: if no element is equal to item
+        """
+        try:
+            return self.array.index(item)
+        except ValueError:
+            raise ValueError("Value does not exist")
+
+    def __str__(self) -> str:
+        return "[" + ", ".join(str(item) for item in self.array) + "]"
+
+    def view(self) -> memoryview:
+        """The memory of the array, without copying it. The array cannot change length while it is in use.
+        :complexity: O(1)
+        """
+        return memoryview(self.array)
+
+    def to_numpy(self):
+        """A NumPy array sharing the memory of this array, so changes to either show in both.
+        :complexity: O(1)
+        """
+        import numpy
+        return numpy.frombuffer(self.array, dtype=self.array.typecode)
+
+
+class ArrayI(_TypedArray):
+    """ Array of 64 bit signed integers. """
+    TYPECODE = "q"
+
+
+class ArrayF(_TypedArray):
+    """ Array of 64 bit floats. """
+    TYPECODE = "d"
@@ -5,7 +5,9 @@ from typing import Optional
 
 from base_enum import BaseEnum
 
+from data_structures.linear_probe_table import LinearProbeTable
 from data_structures.referential_array import ArrayR
+from data_structures.typed_array import ArrayF
 
 
 class Element(BaseEnum):
@@ -41,10 +43,22 @@ class Element(BaseEnum):
 
     @classmethod
     def from_string(cls, string: str) -> Element:
-        for elem in Element:
-            if elem.name.lower() == string.lower():
-                return elem
-        raise ValueError(f"Unexpected string {string}")
+        """
+        The element with the given name, ignoring case.
+        :complexity: O(1) on average, after the first call fills in the table of names.
+        :raises ValueError: if no element has that name.
+        """
+        if _elements_by_name.is_empty():
+            for elem in Element:
+                _elements_by_name[elem.name.lower()] = elem
+        elem = _elements_by_name.get(string.lower())
+        if elem is None:
+            raise ValueError(f"Unexpected string {string}")
+        return elem
+
+
+# The elements by lower case name, see Element.from_string.
+_elements_by_name: LinearProbeTable[str, Element] = LinearProbeTable(len(Element))
 
 
 class EffectivenessCalculator:
@@ -59,7 +73,7 @@ class EffectivenessCalculator:
 
     instance: Optional[EffectivenessCalculator] = None
 
-    def __init__(self, element_names: ArrayR[str], effectiveness_values: ArrayR[float]) -> None:
+    def __init__(self, element_names: ArrayR[str], effectiveness_values: ArrayR[float] | ArrayF) -> None:
         """
         Initialise the Effectiveness Calculator.
 
@@ -108,7 +122,7 @@ class EffectivenessCalculator:
             header = header.split(",")
             rest = rest.replace("\n", ",").split(",")
             a_header = ArrayR(len(header))
-            a_all = ArrayR(len(rest))
+            a_all = ArrayF(len(rest))
             for i in range(len(header)):
                 a_header[i] = header[i]
             for i in range(len(rest)):
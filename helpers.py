@@ -2,6 +2,7 @@ from __future__ import annotations
 import yaml
 from typing import TYPE_CHECKING
 
+from data_structures.linear_probe_table import LinearProbeTable
 from data_structures.referential_array import ArrayR
 
 if TYPE_CHECKING:
@@ -9,6 +10,8 @@ if TYPE_CHECKING:
 
 
 _monsters: ArrayR[MonsterBase] = None
+# The position of every monster class in _monsters, by name and by class.
+_monster_index: LinearProbeTable[str | type[MonsterBase], int] = None
 
 
 def MonsterBaseFactory(name, description, evolution, element, simple_stats, complex_stats, can_be_spawned) -> type[MonsterBase]:
@@ -29,12 +32,23 @@ def get_all_monsters():
         _make_all_monster_classes()
     return _monsters
 
+def get_monster_index(monster: str | type[MonsterBase]) -> int:
+    """
+    Position of a monster class, given by itself or by name, among get_all_monsters().
+    :complexity: O(1) on average
+    :raises KeyError: if there is no such monster.
+    """
+    if _monsters is None:
+        _make_all_monster_classes()
+    return _monster_index[monster]
+
 def _make_all_monster_classes():
     from stats import SimpleStats, ComplexStats
-    global _monsters
+    global _monsters, _monster_index
     with open("monsters.yaml", "r") as f:
         monsters_yaml = yaml.safe_load(f)
     _monsters = ArrayR(len(monsters_yaml))
+    _monster_index = LinearProbeTable(2 * len(monsters_yaml))
     idx = 0
     for monster in monsters_yaml:
         simple = monster["simple"]
@@ -55,15 +69,18 @@ def _make_all_monster_classes():
         )
         globals()[monster["name"]] = new_class
         _monsters[idx] = new_class
+        _monster_index[monster["name"]] = idx
+        _monster_index[new_class] = idx
         idx += 1
     # Now assign evolution
     for monster in monsters_yaml:
         evolution = monster.get("evolution", None)
         if evolution is None:
             continue
-        evolution_class = globals()[evolution]
-        globals()[monster["name"]].evolution_class = evolution_class
-        globals()[monster["name"]].get_evolution = classmethod(lambda s: s.evolution_class)
+        evolution_class = _monsters[_monster_index[evolution]]
+        monster_class = _monsters[_monster_index[monster["name"]]]
+        monster_class.evolution_class = evolution_class
+        monster_class.get_evolution = classmethod(lambda s: s.evolution_class)
 
 get_all_monsters()
 
@@ -0,0 +1,150 @@
+"""
+Per battle counters and timers, reported to pluggable sinks.
+
+Pass an Instrumentation to a Battle to have every battle counted. Battles without instrumentation
+take the plain loop in Battle.battle and do no counting at all.
+
+Usage:
+```
+sink = MemorySink()
+b = Battle(instrumentation=Instrumentation(sink, timers=True))
+b.battle(team1, team2)
+print(sink.records[0]["turns"], sink.records[0]["attack_ns"])
+
+with open("battles.jsonl", "w") as f:
+    b = Battle(instrumentation=Instrumentation(JsonLinesSink(f)))
+    ...
+```
+"""
+from __future__ import annotations
+
+import json
+from typing import Optional, TextIO
+
+from battle import Battle
+
+
+class BattleCounters:
+    """
+    Counters for one or more battles, built up from the TurnEvents of their turns.
+    Fields ending in 1 describe team 1's side, fields ending in 2 describe team 2's side.
+    """
+    __slots__ = (
+        "battles", "turns", "swaps", "specials", "knockouts", "evolutions",
+        "damage1", "damage2", "choose_ns", "attack_ns", "result",
+    )
+
+    def __init__(self) -> None:
+        """:complexity: O(1)"""
+        self.battles = 0
+        self.turns = 0
+        self.swaps = 0
+        self.specials = 0
+        self.knockouts = 0
+        self.evolutions = 0
+        self.damage1 = 0
+        self.damage2 = 0
+        self.choose_ns = 0
+        self.attack_ns = 0
+        self.result = None
+
+    def add_event(self, event: Battle.TurnEvent) -> None:
+        """
+        Adds the turns described by an event.
+        :complexity: O(1)
+        """
+        repeat = event.repeat
+        self.turns += repeat
+        for action in (event.action1, event.action2):
+            if action == Battle.Action.SWAP:
+                self.swaps += repeat
+            elif action == Battle.Action.SPECIAL:
+                self.specials += repeat
+        self.knockouts += event.fainted1 + event.fainted2
+        self.evolutions += event.evolved1 + event.evolved2
+        self.damage1 += event.damage1 * repeat
+        self.damage2 += event.damage2 * repeat
+        self.choose_ns += event.choose_ns
+        self.attack_ns += event.attack_ns
+
+    def add_counters(self, other: BattleCounters) -> None:
+        """
+        Adds the counters of other battles to these.
+        :complexity: O(1)
+        """
+        for name in self.__slots__:
+            if name != "result":
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self) -> dict:
+        """
+        The counters as a JSON friendly dictionary. The result is only included if set.
+        :complexity: O(1)
+        """
+        record = {name: getattr(self, name) for name in self.__slots__ if name != "result"}
+        if self.result is not None:
+            record["result"] = self.result.name
+        return record
+
+
+class MemorySink:
+    """
+    Keeps the record of every battle in memory.
+    """
+
+    def __init__(self) -> None:
+        self.records = []
+
+    def emit(self, record: dict) -> None:
+        """:complexity: O(1) amortised"""
+        self.records.append(record)
+
+
+class JsonLinesSink:
+    """
+    Writes the record of every battle as one line of JSON to a text file.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def emit(self, record: dict) -> None:
+        """:complexity: O(1)"""
+        self.stream.write(json.dumps(record) + "\n")
+
+
+class Instrumentation:
+    """
+    Counts what happens in the battles of a Battle, keeping running totals and handing the counters
+    of every finished battle to a sink (anything with an emit(record: dict) method).
+
+    With timers enabled, the time spent in choose_action and in attacks is measured with perf_counter_ns.
+    Fast forwarded turns (see Battle.locked_turns) are counted, but not timed.
+    """
+
+    def __init__(self, sink: Optional[MemorySink | JsonLinesSink] = None, timers: bool = False) -> None:
+        """:complexity: O(1)"""
+        self.sink = sink
+        self.timers = timers
+        self.totals = BattleCounters()
+        self.current = None
+
+    def start_battle(self) -> None:
+        """:complexity: O(1)"""
+        self.current = BattleCounters()
+        self.current.battles = 1
+
+    def record(self, event: Battle.TurnEvent) -> None:
+        """:complexity: O(1)"""
+        self.current.add_event(event)
+
+    def finish_battle(self, result: Battle.Result) -> None:
+        """
+        Adds the battle to the totals and emits its record.
+        :complexity: O(1), plus the cost of the sink.
+        """
+        self.current.result = result
+        self.totals.add_counters(self.current)
+        if self.sink is not None:
+            self.sink.emit(self.current.as_dict())
+        self.current = None
@@ -98,6 +98,13 @@ class MonsterBase(abc.ABC):
         Attack another monster instance
         Time Complexity: O(n^2), where n is the length of element_names in the EffectivenessCalculator class.
         """
+        other.set_hp(other.get_hp() - self.calculate_damage(other))
+
+    def calculate_damage(self, other: MonsterBase) -> int:
+        """
+        The damage this monster instance would deal when attacking another, without applying it.
+        Time Complexity: O(n^2), where n is the length of element_names in the EffectivenessCalculator class.
+        """
         # Step 1: Compute attack stat vs. defense stat
         attack_stat = self.get_attack()
         defense_stat = self.get_defense()
@@ -114,9 +121,7 @@ class MonsterBase(abc.ABC):
         type_effectiveness = EffectivenessCalculator.get_effectiveness(attacker_element, defender_element)
         effective_damage = damage * type_effectiveness
         # Step 3: Ceil to int
-        effective_damage = int(round(effective_damage))
-        # Step 4: Lose HP
-        other.set_hp(other.get_hp() - effective_damage)
+        return int(round(effective_damage))
 
     def ready_to_evolve(self) -> bool:
         """Whether this monster is ready to evolve. See assignment spec for specific logic."""
@@ -0,0 +1,476 @@
+"""
+Compact binary replay log of battles.
+
+A battle is fully determined by the starting state of both teams and the actions chosen each turn,
+so that is all a replay stores. Each record in a replay file is laid out as:
+
+    MAGIC
+    seed                                          varint
+    team 1 spec, team 2 spec                      see write_team
+    action runs                                   varint (run length << 4 | action pair), ...
+    0                                             varint, marks the end of the runs
+    result                                        varint, Battle.Result value
+
+All integers are unsigned LEB128 varints (signed values are zigzag encoded first), and consecutive
+turns with the same pair of actions are stored as a single run, so a battle costs a few bytes
+in total plus well under a byte per turn.
+
+The varint and team encodings (write_varint, BytesReader, write_team and read_team) are public, for other
+formats built on them, such as the checkpoints and templates in tower.py.
+
+Usage:
+```
+with open("battles.rpl", "wb") as f:
+    b = Battle(replay=ReplayWriter(f))
+    b.battle(team1, team2)              # The writer records the battle as it is played
+    b.battle(team3, team4)              # One record per battle
+
+with open("battles.rpl", "rb") as f:
+    for replay in BattleReplay.read_all(f):
+        battle = replay.seek(10)        # The battle state after 10 turns
+        print(battle.out1, battle.out2)
+        print(replay.play())            # Replays to the end, returning the result
+```
+"""
+from __future__ import annotations
+
+from typing import BinaryIO, Iterator, Optional
+
+from battle import Battle
+from helpers import get_all_monsters, get_monster_index
+from monster_base import MonsterBase
+from random_gen import RandomGen
+from team import MonsterTeam
+
+from data_structures.referential_array import ArrayR
+
+MAGIC = b"BRP1"
+
+# Number of distinct actions, and thus of distinct action pairs in a turn.
+N_ACTIONS = 3
+RUN_SHIFT = 4
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    """
+    Appends a non-negative integer as a LEB128 varint.
+    :complexity: O(log value)
+    """
+    if value < 0:
+        raise ValueError(f"Cannot encode negative value {value} as a varint.")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class BytesReader:
+    """
+    Reads varints, and the teams written by write_team, from a bytes like object, from position pos onwards.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+
+    def read_byte(self) -> int:
+        if self.pos >= len(self.data):
+            raise ValueError("Truncated replay.")
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def varint(self) -> int:
+        """
+        Reads a LEB128 varint.
+        :complexity: O(log value)
+        """
+        value = 0
+        shift = 0
+        while True:
+            byte = self.read_byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def read_bytes(self, length: int) -> bytes:
+        """
+        Reads the next length bytes as they are.
+        :complexity: O(length)
+        """
+        if self.pos + length > len(self.data):
+            raise ValueError("Truncated replay.")
+        self.pos += length
+        return bytes(self.data[self.pos - length:self.pos])
+
+
+class _StreamReader(BytesReader):
+    """
+    Reads varints straight from a binary file, keeping a copy of the bytes read since the last call to take.
+    """
+
+    def __init__(self, stream: BinaryIO) -> None:
+        super().__init__(b"")
+        self.stream = stream
+        self.consumed = bytearray()
+
+    def read_byte(self) -> int:
+        byte = self.stream.read(1)
+        if not byte:
+            raise ValueError("Truncated replay.")
+        self.consumed += byte
+        return byte[0]
+
+    def take(self) -> bytes:
+        """Returns the bytes read since the last call, and forgets them."""
+        taken = bytes(self.consumed)
+        self.consumed = bytearray()
+        return taken
+
+
+def _zigzag(value: int) -> int:
+    """Maps signed integers to unsigned ones, keeping small magnitudes small."""
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    """Inverse of _zigzag."""
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+def _species_index(monster: MonsterBase) -> int:
+    """
+    Position of the monster's class among get_all_monsters(), which is how species are stored.
+    :complexity: O(1) on average, see helpers.get_monster_index.
+    :raises ValueError: if the class is not one of the registered monsters.
+    """
+    try:
+        return get_monster_index(type(monster))
+    except KeyError:
+        raise ValueError(f"Only registered monsters can be recorded, got {type(monster)}.")
+
+
+def _encode_monster(out: bytearray, monster: MonsterBase) -> None:
+    """
+    Appends species, level, HP and flags of a monster.
+    :complexity: O(1) on average, see _species_index.
+    """
+    write_varint(out, _species_index(monster))
+    write_varint(out, monster.get_level())
+    write_varint(out, _zigzag(monster.get_hp()))
+    write_varint(out, int(monster.simple_mode) | int(monster.already_evo) << 1)
+
+
+def _decode_monster(reader: BytesReader) -> MonsterBase:
+    """
+    Reads a monster written by _encode_monster, returning a new instance.
+    :complexity: O(1)
+    """
+    species = reader.varint()
+    level = reader.varint()
+    hp = reader.varint()
+    flags = reader.varint()
+    monster = get_all_monsters()[species](simple_mode=bool(flags & 1), level=level)
+    monster.set_hp(_unzigzag(hp))
+    monster.already_evo = bool(flags & 2)
+    return monster
+
+
+def write_team(out: bytearray, team: MonsterTeam) -> None:
+    """
+    Appends the mode, sort key, toggle and monsters (in retrieval order) of a team.
+    :complexity: O(n*s), where n is the number of monsters in the team, see _encode_monster.
+    """
+    write_varint(out, team.team_mode.value)
+    sort_key = getattr(team, "sort_key", None)
+    write_varint(out, 0 if sort_key is None else sort_key.value)
+    write_varint(out, int(team.toggle))
+    monsters = team.get_monsters()
+    write_varint(out, len(monsters))
+    for monster in monsters:
+        _encode_monster(out, monster)
+
+
+def read_team(reader: BytesReader) -> MonsterTeam:
+    """
+    Reads a team written by write_team, returning a new team in the same state.
+    :complexity: O(n), where n is the number of monsters in the team.
+    """
+    mode = reader.varint()
+    sort_key = reader.varint()
+    toggle = reader.varint()
+    size = reader.varint()
+    return MonsterTeam.from_monsters(
+        MonsterTeam.TeamMode(mode),
+        (_decode_monster(reader) for _ in range(size)),
+        sort_key=None if sort_key == 0 else MonsterTeam.SortMode(sort_key),
+        toggle=bool(toggle),
+    )
+
+
+def encode_team(team: MonsterTeam) -> bytes:
+    """
+    The state of a team as bytes, for sending teams between processes or storing them.
+    :complexity: O(n*s), see write_team.
+    """
+    out = bytearray()
+    write_team(out, team)
+    return bytes(out)
+
+
+def decode_team(data: bytes) -> MonsterTeam:
+    """
+    A new team in the state encoded by encode_team.
+    :complexity: O(n), see read_team.
+    """
+    return read_team(BytesReader(data))
+
+
+def _action_pair(action1: Battle.Action, action2: Battle.Action) -> int:
+    """Packs the actions of both teams into a single number below N_ACTIONS ** 2."""
+    return (action1.value - 1) * N_ACTIONS + (action2.value - 1)
+
+
+def _unpack_action_pair(pair: int) -> tuple[Battle.Action, Battle.Action]:
+    """Inverse of _action_pair."""
+    return Battle.Action(pair // N_ACTIONS + 1), Battle.Action(pair % N_ACTIONS + 1)
+
+
+class ReplayWriter:
+    """
+    Streams replay records of the battles of a Battle to a binary file.
+
+    Pass it as Battle(replay=...). The battle calls start when the teams are set up, record for every
+    turn processed (or every run of fast forwarded turns) and finish with the result.
+    Turns are buffered as a run of identical action pairs, so nothing is written until the actions change.
+    """
+
+    def __init__(self, stream: BinaryIO) -> None:
+        """:complexity: O(1)"""
+        self.stream = stream
+        self.buffer = bytearray()
+        self.run_pair = None
+        self.run_length = 0
+
+    def start(self, team1: MonsterTeam, team2: MonsterTeam, seed: Optional[int] = None) -> None:
+        """
+        Writes the header of a new record. The seed defaults to the current RandomGen seed.
+        :complexity: O(n*s), see write_team.
+        """
+        self.buffer = bytearray(MAGIC)
+        write_varint(self.buffer, RandomGen.seed if seed is None else seed)
+        write_team(self.buffer, team1)
+        write_team(self.buffer, team2)
+        self.run_pair = None
+        self.run_length = 0
+        self._flush()
+
+    def record(self, action1: Battle.Action, action2: Battle.Action, turns: int = 1) -> None:
+        """
+        Records the actions chosen for the given number of consecutive turns.
+        :complexity: O(1) amortised
+        """
+        pair = _action_pair(action1, action2)
+        if pair != self.run_pair:
+            self._end_run()
+            self.run_pair = pair
+        self.run_length += turns
+
+    def finish(self, result: Battle.Result) -> None:
+        """
+        Completes the record with the result of the battle.
+        :complexity: O(1)
+        """
+        self._end_run()
+        write_varint(self.buffer, 0)
+        write_varint(self.buffer, result.value)
+        self._flush()
+
+    def _end_run(self) -> None:
+        """Moves the current run of action pairs to the output buffer."""
+        if self.run_length > 0:
+            write_varint(self.buffer, self.run_length << RUN_SHIFT | self.run_pair)
+            if len(self.buffer) >= 4096:
+                self._flush()
+        self.run_pair = None
+        self.run_length = 0
+
+    def _flush(self) -> None:
+        """Writes out the buffered bytes."""
+        self.stream.write(bytes(self.buffer))
+        self.buffer = bytearray()
+
+
+class _ScriptedTeam:
+    """
+    Replaces a team's choose_action with the actions read from a replay.
+    """
+
+    def __init__(self, replay: BattleReplay, side: int) -> None:
+        self.replay = replay
+        self.side = side
+
+    def __call__(self, currently_out: MonsterBase, enemy: MonsterBase) -> Battle.Action:
+        return self.replay._current_actions()[self.side]
+
+
+class BattleReplay:
+    """
+    A recorded battle that can be replayed, or fast-forwarded to any turn.
+
+    While the battle is replayed, a snapshot of its state is kept every checkpoint_interval turns,
+    so seeking only replays the turns since the closest earlier checkpoint.
+    """
+
+    DEFAULT_CHECKPOINT_INTERVAL = 64
+
+    def __init__(self, seed: int, teams: bytes, runs: ArrayR[tuple[int, int]], result: Battle.Result,
+                 checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL) -> None:
+        """
+        :teams: the encoded starting teams
+        :runs: (run length, action pair) of every run of turns
+        :complexity: O(r), where r is the number of runs.
+        """
+        self.seed = seed
+        self.teams = teams
+        self.runs = runs
+        self.result = result
+        self.turn_count = 0
+        for i in range(len(runs)):
+            self.turn_count += runs[i][0]
+        self.checkpoint_interval = checkpoint_interval
+        # checkpoints[i] is the encoded state after i * checkpoint_interval turns.
+        self.checkpoints = [None for _ in range(self.turn_count // checkpoint_interval + 1)]
+        self.battle = None
+        self.turn = 0
+        self.run_index = 0
+        self.run_offset = 0
+
+    @classmethod
+    def read(cls, stream: BinaryIO, checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL) -> Optional[BattleReplay]:
+        """
+        Reads the next record from a replay file, or returns None at the end of the file.
+        :complexity: O(b), where b is the size of the record in bytes.
+        """
+        magic = stream.read(len(MAGIC))
+        if not magic:
+            return None
+        if magic != MAGIC:
+            raise ValueError("Not a battle replay.")
+        reader = _StreamReader(stream)
+        seed = reader.varint()
+        reader.take()
+        read_team(reader)
+        read_team(reader)
+        teams = reader.take()
+        runs = []
+        run = reader.varint()
+        while run != 0:
+            runs.append((run >> RUN_SHIFT, run & ((1 << RUN_SHIFT) - 1)))
+            run = reader.varint()
+        result = Battle.Result(reader.varint())
+        return cls(seed, teams, ArrayR.from_list(runs), result, checkpoint_interval)
+
+    @classmethod
+    def read_all(cls, stream: BinaryIO, checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL
+                 ) -> Iterator[BattleReplay]:
+        """
+        Lazily reads every record of a replay file.
+        :complexity: O(b) per record, see read.
+        """
+        replay = cls.read(stream, checkpoint_interval)
+        while replay is not None:
+            yield replay
+            replay = cls.read(stream, checkpoint_interval)
+
+    def _current_actions(self) -> tuple[Battle.Action, Battle.Action]:
+        """The actions of the turn about to be processed."""
+        return _unpack_action_pair(self.runs[self.run_index][1])
+
+    def _snapshot(self) -> bytes:
+        """
+        Encodes the current battle state.
+        :complexity: O(n*s), see write_team.
+        """
+        out = bytearray()
+        write_team(out, self.battle.team1)
+        write_team(out, self.battle.team2)
+        _encode_monster(out, self.battle.out1)
+        _encode_monster(out, self.battle.out2)
+        return bytes(out)
+
+    def _restore(self, state: bytes, turn: int) -> None:
+        """
+        Rebuilds the battle from the encoded starting teams (turn 0) or a checkpoint, positioned at the given turn.
+        :complexity: O(n + r), where n is the number of monsters and r the number of runs.
+        """
+        reader = BytesReader(state)
+        team1 = read_team(reader)
+        team2 = read_team(reader)
+        team1.choose_action = _ScriptedTeam(self, 0)
+        team2.choose_action = _ScriptedTeam(self, 1)
+        battle = Battle(fast_forward=False)
+        battle.team1 = team1
+        battle.team2 = team2
+        if turn == 0:
+            battle.out1 = team1.retrieve_from_team()
+            battle.out2 = team2.retrieve_from_team()
+        else:
+            battle.out1 = _decode_monster(reader)
+            battle.out2 = _decode_monster(reader)
+        self.battle = battle
+        self.turn = turn
+        self.run_index = 0
+        remaining = turn
+        while remaining > 0 and remaining >= self.runs[self.run_index][0]:
+            remaining -= self.runs[self.run_index][0]
+            self.run_index += 1
+        self.run_offset = remaining
+
+    def _step(self) -> Optional[Battle.Result]:
+        """
+        Processes one recorded turn, keeping a checkpoint when one is due.
+        :complexity: O(1), plus O(n*s) when a checkpoint is taken.
+        """
+        result = self.battle.process_turn()
+        self.turn += 1
+        self.run_offset += 1
+        if self.run_offset == self.runs[self.run_index][0]:
+            self.run_index += 1
+            self.run_offset = 0
+        if result is None and self.turn % self.checkpoint_interval == 0:
+            slot = self.turn // self.checkpoint_interval
+            if self.checkpoints[slot] is None:
+                self.checkpoints[slot] = self._snapshot()
+        return result
+
+    def seek(self, turn: int) -> Battle:
+        """
+        Returns the battle as it was after the given number of turns. Use its out1, out2, team1 and team2.
+        The returned object is reused by later calls to seek and play.
+        :complexity: O(n + r + c) where c is the number of turns since the closest checkpoint,
+                     at most checkpoint_interval once the battle has been replayed past that turn.
+        """
+        if not 0 <= turn <= self.turn_count:
+            raise IndexError(f"Turn {turn} is outside of the replay, which has {self.turn_count} turns.")
+        slot = turn // self.checkpoint_interval
+        while slot > 0 and self.checkpoints[slot] is None:
+            slot -= 1
+        # Carry on from the current position, unless it is past the turn or further back than the checkpoint.
+        if self.battle is None or turn < self.turn or slot * self.checkpoint_interval > self.turn:
+            state = self.teams if slot == 0 else self.checkpoints[slot]
+            self._restore(state, slot * self.checkpoint_interval)
+        while self.turn < turn:
+            self._step()
+        return self.battle
+
+    def play(self) -> Battle.Result:
+        """
+        Replays the battle from the start to the end, returning its result.
+        :complexity: O(t), where t is the number of turns.
+        """
+        self.seek(0)
+        result = None
+        while result is None:
+            result = self._step()
+        return self.battle._finish(result)
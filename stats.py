@@ -1,8 +1,12 @@
 import abc
+import threading
 
 from data_structures.referential_array import ArrayR
 from data_structures.stack_adt import ArrayStack
 
+# One operand stack per thread, reused by every formula the thread evaluates.
+_evaluation = threading.local()
+
 
 class Stats(abc.ABC):
 
@@ -70,7 +74,10 @@ class ComplexStats(Stats):
             All other operations inside the loop (including the sorting for 'middle' operation)
             are performed in O(1) time complexity.
             """
-        stack = ArrayStack(len(formula))
+        stack = getattr(_evaluation, "stack", None)
+        if stack is None:
+            stack = _evaluation.stack = ArrayStack(len(formula), growable=True)
+        stack.reset(len(formula))
         for expr in formula:
             if expr.isnumeric():
                 stack.push(int(expr))
@@ -1,13 +1,16 @@
 from __future__ import annotations
 from enum import auto
-from typing import Optional, TYPE_CHECKING
+from typing import Iterable, Optional, TYPE_CHECKING
 
 from base_enum import BaseEnum
+from elements import EffectivenessCalculator, Element
 from monster_base import MonsterBase
 from random_gen import RandomGen
 from helpers import get_all_monsters
 
 from data_structures.referential_array import ArrayR
+from data_structures.bset import BSet
+from data_structures.persistent_vector import PersistentVector
 from data_structures.queue_adt import CircularQueue
 
 if TYPE_CHECKING:
@@ -36,6 +39,10 @@ class MonsterTeam:
         LEVEL = auto()
 
     TEAM_LIMIT = 6
+    COVERAGE_WEIGHT = 5  # Strength a team gets for every element it is super effective against, see strength_of
+
+    # The values of the elements each element is super effective against, by element value. Filled in on first use.
+    super_effective = None
 
     def __init__(self, team_mode: TeamMode, selection_mode, **kwargs) -> None:
         """The method is simple assignment of variables, which makes it complexity O(1) best/worst cases"""
@@ -95,34 +102,27 @@ class MonsterTeam:
 
         # Depending on the team_mode, add the monster to the appropriate position in the team
         if self.team_mode == self.TeamMode.FRONT:
-            old_data = [self.team_data.serve() for _ in range(len(self.team_data))]
+            # Append at the rear, then move everyone one place back in the queue to free the front.
             self.team_data.append(monster)
-            for m in old_data:
-                self.team_data.append(m)
+            for i in range(len(self.team_data) - 1, 0, -1):
+                self.team_data.set_at(i, self.team_data.peek_at(i - 1))
+            self.team_data.set_at(0, monster)
 
         elif self.team_mode == self.TeamMode.BACK:
             # Use append() method of CircularQueue for BACK mode
             self.team_data.append(monster)
 
         elif self.team_mode == self.TeamMode.OPTIMISE:
-            new_team = ArrayR(self.TEAM_LIMIT)
-            inserted = False
-            j = 0  # To track the index in the new_team Array
+            # Find the first monster the new one goes before, then shift the rest right to make room.
+            value = self._get_sort_value(monster)
+            position = self.team_count
             for i in range(self.team_count):
-                if self.toggle:
-                    condition = not inserted and self._get_sort_value(monster) > self._get_sort_value(self.team_data[i])
-                else:
-                    condition = not inserted and self._get_sort_value(monster) < self._get_sort_value(self.team_data[i])
-
-                if condition:
-                    new_team[j] = monster
-                    inserted = True
-                    j += 1
-                new_team[j] = self.team_data[i]
-                j += 1
-            if not inserted:
-                new_team[j] = monster
-            self.team_data = new_team
+                other = self._get_sort_value(self.team_data[i])
+                if (value > other) if self.toggle else (value < other):
+                    position = i
+                    break
+            self.team_data.copy_into(self.team_data, position, position + 1, self.team_count - position)
+            self.team_data[position] = monster
             self.team_count += 1
 
     def retrieve_from_team(self) -> MonsterBase:
@@ -141,8 +141,7 @@ class MonsterTeam:
 
         elif self.team_mode == self.TeamMode.OPTIMISE:
             monster = self.team_data[0]
-            for i in range(1, self.team_count):
-                self.team_data[i - 1] = self.team_data[i]
+            self.team_data.copy_into(self.team_data, 1, 0, self.team_count - 1)
 
             self.team_data[self.team_count - 1] = None
             # Decrease the count of monsters
@@ -156,50 +155,22 @@ class MonsterTeam:
         :complexity: O(n) for all team modes where n is the number of monsters.
         """
         if self.team_mode == self.TeamMode.FRONT:
-            # Determine how many elements need to be reversed.
+            # Reverse the first 3 monsters (or fewer) in place, the rest stay where they are.
             swaps = min(3, len(self.team_data))
-
-            # Extract first 3 elements using CircularQueue methods.
-            temp_arr_to_reverse = ArrayR(swaps)
-            temp_arr_remaining = ArrayR(len(self.team_data) - swaps)
-
-            for i in range(swaps):
-                temp_arr_to_reverse[i] = self.team_data.serve()
-
-            j = 0
-            while not self.team_data.is_empty():
-                temp_arr_remaining[j] = self.team_data.serve()
-                j += 1
-
-            # Now, add elements from temp_arr_to_reverse (in reverse order) to the team_data.
-            for i in range(swaps - 1, -1, -1):
-                self.team_data.append(temp_arr_to_reverse[i])
-            for i in range(len(temp_arr_remaining)):
-                self.team_data.append(temp_arr_remaining[i])
+            for i in range(swaps // 2):
+                first = self.team_data.peek_at(i)
+                self.team_data.set_at(i, self.team_data.peek_at(swaps - 1 - i))
+                self.team_data.set_at(swaps - 1 - i, first)
 
         elif self.team_mode == self.TeamMode.BACK:
-            # Half the size of the team
+            # The second half goes first, reversed, then the first half in its order.
             half_size = len(self.team_data) // 2
-            # Store the first half in temp_arr1
-            temp_arr1 = ArrayR(half_size)
+            monsters = ArrayR.from_iterable(self.team_data)
+            n = len(monsters)
+            for i in range(n - half_size):
+                self.team_data.set_at(i, monsters[n - 1 - i])
             for i in range(half_size):
-                temp_arr1[i] = self.team_data.serve()
-            # Store the second half in temp_arr2
-            temp_arr2 = ArrayR(len(self.team_data))
-            index = 0
-            while not self.team_data.is_empty():
-                temp_arr2[index] = self.team_data.serve()
-                index += 1
-            # Create a new CircularQueue
-            new_queue = CircularQueue(self.TEAM_LIMIT)
-            # First, add the second half in reverse order
-            for i in range(len(temp_arr2) - 1, -1, -1):
-                new_queue.append(temp_arr2[i])
-            # Then, add the first half
-            for i in range(len(temp_arr1)):
-                new_queue.append(temp_arr1[i])
-            # Set the new queue to team_data
-            self.team_data = new_queue
+                self.team_data.set_at(n - half_size + i, monsters[i])
 
         elif self.team_mode == self.TeamMode.OPTIMISE:
             reversed_team_data = ArrayR(self.team_count)
@@ -243,26 +214,39 @@ class MonsterTeam:
                     self.team_data[j + 1] = key
                 self.toggle = not self.toggle
 
-    def select_randomly(self):
-        team_size = RandomGen.randint(1, self.TEAM_LIMIT)
+    @classmethod
+    def random_monster_classes(cls) -> ArrayR[type[MonsterBase]]:
+        """
+        Draws the monster classes of a random team, in the order select_randomly adds them to the team.
+        Uses exactly the random numbers creating a random team does, without creating any monster.
+
+        :complexity: O(n*m) where n is the team size and m the number of monster classes.
+        """
+        team_size = RandomGen.randint(1, cls.TEAM_LIMIT)
         monsters = get_all_monsters()
         n_spawnable = 0
         for x in range(len(monsters)):
             if monsters[x].can_be_spawned():
                 n_spawnable += 1
 
-        for _ in range(team_size):
+        chosen = ArrayR(team_size)
+        for i in range(team_size):
             spawner_index = RandomGen.randint(0, n_spawnable - 1)
             cur_index = -1
             for x in range(len(monsters)):
                 if monsters[x].can_be_spawned():
                     cur_index += 1
                     if cur_index == spawner_index:
-                        # Spawn this monster
-                        self.add_to_team(monsters[x]())
+                        chosen[i] = monsters[x]
                         break
             else:
                 raise ValueError("Spawning logic failed.")
+        return chosen
+
+    def select_randomly(self):
+        for monster_class in self.random_monster_classes():
+            # Spawn this monster
+            self.add_to_team(monster_class())
 
     def select_manually(self):
         """
@@ -484,22 +468,107 @@ class MonsterTeam:
         elif self.team_mode in [MonsterTeam.TeamMode.FRONT, MonsterTeam.TeamMode.BACK]:
             # If team_mode is FRONT or BACK, clone CircularQueue
             cloned_team = CircularQueue(self.TEAM_LIMIT)
-            temp_queue = CircularQueue(self.TEAM_LIMIT)
-
-            # Empty the current queue into the temp_queue
-            while not self.team_data.is_empty():
-                monster_instance = self.team_data.serve()
-                # Create a new instance for each monster and add to cloned_team and temp_queue
-                new_monster = type(monster_instance)()
+            for i in range(len(self.team_data)):
+                # Create a new instance for each monster, which replaces the original in place too.
+                new_monster = type(self.team_data.peek_at(i))()
                 cloned_team.append(new_monster)
-                temp_queue.append(new_monster)
-
-            # Restore the original queue from the temp_queue
-            while not temp_queue.is_empty():
-                self.team_data.append(temp_queue.serve())
+                self.team_data.set_at(i, new_monster)
 
         return cloned_team
 
+    def get_monsters(self) -> ArrayR[MonsterBase]:
+        """
+        Returns the monsters of the team in the order they would be retrieved, leaving the team unchanged.
+
+        :complexity: O(n) where n is the number of monsters in the team.
+        """
+        if self.team_mode == self.TeamMode.OPTIMISE:
+            return self.team_data[:self.team_count]
+        return ArrayR.from_iterable(self.team_data)
+
+    def snapshot(self) -> PersistentVector[tuple]:
+        """
+        The state of the team's monsters in the order they would be retrieved, as
+        (class, simple mode, level, HP, already evolved) tuples, see fork.
+        Snapshots are immutable, and set and append on them return new snapshots that copy only the
+        O(log n) nodes on the path to the changed monster and share every other node with the old one,
+        so a search can keep many variations of one team cheaply.
+
+        :complexity: O(n) where n is the number of monsters in the team.
+        """
+        return PersistentVector.from_iterable(
+            (type(monster), monster.simple_mode, monster.get_level(), monster.get_hp(), monster.already_evo)
+            for monster in self.get_monsters()
+        )
+
+    def fork(self, snapshot: Optional[PersistentVector[tuple]] = None) -> MonsterTeam:
+        """
+        A new team in the same mode, with new monsters in the states of a snapshot, by default the
+        team as it is now. Changes to either team do not affect the other.
+
+        :complexity: O(n) where n is the number of monsters in the snapshot.
+        """
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        monsters = ArrayR(len(snapshot))
+        for i, (monster_class, simple_mode, level, hp, already_evo) in enumerate(snapshot):
+            monsters[i] = monster_class(simple_mode=simple_mode, level=level)
+            monsters[i].set_hp(hp)
+            monsters[i].already_evo = already_evo
+        return self.from_monsters(self.team_mode, monsters, getattr(self, "sort_key", None), self.toggle)
+
+    @classmethod
+    def from_monsters(cls, team_mode: TeamMode, monsters: Iterable[MonsterBase],
+                      sort_key: Optional[SortMode] = None, toggle: bool = True) -> MonsterTeam:
+        """
+        A team in team_mode holding the given monsters, as they are, in the order they would be retrieved.
+        Used to rebuild a team from a saved state, see fork and replay.read_team.
+        The monsters are put straight into place, as add_to_team would reorder them in FRONT and OPTIMISE mode.
+
+        :complexity: O(n) where n is the number of monsters.
+        """
+        team = cls(team_mode, cls.SelectionMode.PROVIDED, provided_monsters=ArrayR(0), sort_key=sort_key)
+        team.toggle = toggle
+        team.backup_monsters = None
+        for monster in monsters:
+            if team_mode == cls.TeamMode.OPTIMISE:
+                team.team_data[team.team_count] = monster
+                team.team_count += 1
+            else:
+                team.team_data.append(monster)
+        return team
+
+    def strength(self) -> int:
+        """
+        A score of how hard the team is to beat, see strength_of.
+
+        :complexity: O(n) where n is the number of monsters in the team.
+        """
+        return self.strength_of(self.get_monsters())
+
+    @classmethod
+    def strength_of(cls, monsters: ArrayR[MonsterBase]) -> int:
+        """
+        A score of how hard a team of the given monsters is to beat: the sum of their attack, defense,
+        speed and max HP, plus COVERAGE_WEIGHT for every element at least one of them is super effective against.
+
+        :complexity: O(n) where n is the number of monsters, once the effectiveness table has been read the first time.
+        """
+        if cls.super_effective is None:
+            super_effective = ArrayR[BSet](len(Element) + 1)
+            for attacker in Element:
+                super_effective[attacker.value] = BSet()
+                for defender in Element:
+                    if EffectivenessCalculator.get_effectiveness(attacker, defender) > 1:
+                        super_effective[attacker.value].add(defender.value)
+            cls.super_effective = super_effective
+
+        stats = 0
+        covered = BSet()
+        for monster in monsters:
+            stats += monster.get_attack() + monster.get_defense() + monster.get_speed() + monster.get_max_hp()
+            covered = covered.union(cls.super_effective[Element.from_string(monster.get_element()).value])
+        return stats + cls.COVERAGE_WEIGHT * len(covered)
+
     def choose_action(self, currently_out: MonsterBase, enemy: MonsterBase) -> Battle.Action:
         # This is just a placeholder function that doesn't matter much for testing.
         from battle import Battle
@@ -6,6 +6,7 @@ from ed_utils.timeout import timeout
 from battle import Battle
 from team import MonsterTeam
 from helpers import Flamikin, Aquariuma, Vineon, Strikeon, Normake, Marititan, Leviatitan, Treetower, Infernoth
+from random_gen import RandomGen
 
 from data_structures.referential_array import ArrayR
 
@@ -38,6 +39,29 @@ class BattleMock(Battle):
             self.cur_index += 1
         return super().process_turn()
 
+class TankFlamikin(Flamikin):
+
+    def get_max_hp(self):
+        return 20000
+
+
+class TankAquariuma(Aquariuma):
+
+    def get_max_hp(self):
+        return 30000
+
+
+class TurnCountingBattle(Battle):
+
+    def __init__(self, verbosity=0, fast_forward=True) -> None:
+        super().__init__(verbosity, fast_forward)
+        self.turns_processed = 0
+
+    def process_turn(self):
+        self.turns_processed += 1
+        return super().process_turn()
+
+
 class TestBattle(TestCase):
 
     @number("4.1")
@@ -133,3 +157,89 @@ class TestBattle(TestCase):
         ]
         res = b.battle(team1, team2)
         self.assertEqual(res, Battle.Result.DRAW)
+
+    @number("4.4")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_fast_forward_matches_step_by_step(self):
+        for seed in range(100):
+            outcomes = []
+            for fast_forward in (False, True):
+                RandomGen.set_seed(seed)
+                team1 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+                team2 = MonsterTeam(MonsterTeam.TeamMode.FRONT, MonsterTeam.SelectionMode.RANDOM)
+                b = Battle(fast_forward=fast_forward)
+                res = b.battle(team1, team2)
+                outcomes.append((res, str(b.out1), str(b.out2), len(team1), len(team2)))
+            self.assertEqual(outcomes[0], outcomes[1], f"Seed {seed}")
+
+    @number("4.5")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_fast_forward_tank_fight(self):
+        outcomes = []
+        for fast_forward in (False, True):
+            team1 = MonsterTeam(
+                team_mode=MonsterTeam.TeamMode.BACK,
+                selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                provided_monsters=ArrayR.from_list([TankFlamikin]),
+            )
+            team2 = MonsterTeam(
+                team_mode=MonsterTeam.TeamMode.BACK,
+                selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                provided_monsters=ArrayR.from_list([TankAquariuma]),
+            )
+            b = TurnCountingBattle(fast_forward=fast_forward)
+            res = b.battle(team1, team2)
+            outcomes.append((res, str(b.out1), str(b.out2), b.turns_processed))
+        slow, fast = outcomes
+        self.assertEqual(slow[:3], fast[:3])
+        self.assertGreater(slow[3], 1000)
+        self.assertLessEqual(fast[3], 3)
+
+    @number("4.8")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_iter_turns(self):
+        for seed in range(50):
+            RandomGen.set_seed(seed)
+            team1 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+            team2 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+            b = TurnCountingBattle(fast_forward=False)
+            expected = b.battle(team1, team2)
+
+            for fast_forward in (False, True):
+                RandomGen.set_seed(seed)
+                team1 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+                team2 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+                events = list(Battle(fast_forward=fast_forward).iter_turns(team1, team2))
+                self.assertEqual(events[-1].result, expected, f"Seed {seed}")
+                self.assertTrue(all(event.result is None for event in events[:-1]))
+                self.assertEqual(sum(event.repeat for event in events), b.turns_processed)
+                self.assertEqual(events[-1].turn + events[-1].repeat - 1, b.turns_processed)
+
+    @number("4.9")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_iter_turns_is_lazy(self):
+        team1 = MonsterTeam(
+            team_mode=MonsterTeam.TeamMode.BACK,
+            selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+            provided_monsters=ArrayR.from_list([Flamikin, Aquariuma]),
+        )
+        team2 = MonsterTeam(
+            team_mode=MonsterTeam.TeamMode.BACK,
+            selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+            provided_monsters=ArrayR.from_list([Vineon, Strikeon]),
+        )
+        team1.choose_action = lambda out, team: Battle.Action.ATTACK
+        team2.choose_action = lambda out, team: Battle.Action.ATTACK
+        b = TurnCountingBattle()
+        turns = b.iter_turns(team1, team2)
+        self.assertEqual(b.turns_processed, 0)
+        event = next(turns)
+        self.assertEqual(b.turns_processed, 1)
+        self.assertEqual(event.turn, 1)
+        self.assertEqual(event.action1, Battle.Action.ATTACK)
+        self.assertEqual(event.action2, Battle.Action.ATTACK)
+        self.assertEqual(event.damage1, 6 - b.out2.get_hp() - 1)
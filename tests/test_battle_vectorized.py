@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+from random_gen import RandomGen
+
+from battle import Battle
+from battle_vectorized import battle_vectorized
+from team import MonsterTeam
+
+from data_structures.referential_array import ArrayR
+
+
+class TestBattleVectorized(TestCase):
+
+    def make_teams(self, seed: int, n: int) -> tuple[ArrayR[MonsterTeam], ArrayR[MonsterTeam]]:
+        RandomGen.set_seed(seed)
+        modes = [MonsterTeam.TeamMode.BACK, MonsterTeam.TeamMode.FRONT]
+        teams1 = ArrayR(n)
+        teams2 = ArrayR(n)
+        for i in range(n):
+            teams1[i] = MonsterTeam(modes[i % 2], MonsterTeam.SelectionMode.RANDOM)
+            teams2[i] = MonsterTeam(modes[(i // 2) % 2], MonsterTeam.SelectionMode.RANDOM)
+        return teams1, teams2
+
+    @number("4.6")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_matches_scalar_engine(self):
+        teams1, teams2 = self.make_teams(1008, 300)
+        expected = [Battle().battle(teams1[i], teams2[i]) for i in range(len(teams1))]
+
+        teams1, teams2 = self.make_teams(1008, 300)
+        got = battle_vectorized(teams1, teams2)
+        self.assertListEqual(got.to_list(), expected)
+
+    @number("4.7")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_custom_actions_fall_back(self):
+        teams1, teams2 = self.make_teams(2085, 20)
+        for i in range(0, 20, 3):
+            teams1[i].choose_action = lambda out, enemy: Battle.Action.ATTACK
+        expected = [Battle().battle(teams1[i], teams2[i]) for i in range(len(teams1))]
+
+        teams1, teams2 = self.make_teams(2085, 20)
+        for i in range(0, 20, 3):
+            teams1[i].choose_action = lambda out, enemy: Battle.Action.ATTACK
+        got = battle_vectorized(teams1, teams2)
+        self.assertListEqual(got.to_list(), expected)
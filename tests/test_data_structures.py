@@ -0,0 +1,313 @@
+from unittest import TestCase
+
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from data_structures.array_sorted_list import ArraySortedList
+from data_structures.bset import BSet
+from data_structures.chunked_bset import ChunkedBSet
+from data_structures.heap import ArrayHeap
+from data_structures.linear_probe_table import LinearProbeTable
+from data_structures.persistent_vector import PersistentVector
+from data_structures.referential_array import ArrayR
+from data_structures.sorted_list_adt import ListItem
+from data_structures.typed_array import ArrayF, ArrayI
+
+
+class TestDataStructures(TestCase):
+
+    @number("6.1")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_array_bulk(self):
+        self.assertEqual(ArrayR.from_iterable(range(5)).to_list(), [0, 1, 2, 3, 4])
+        self.assertEqual(ArrayR.from_iterable(x * x for x in range(4)).to_list(), [0, 1, 4, 9])
+        self.assertEqual(ArrayR.from_iterable(ArrayR.from_list(["a", "b"])).to_list(), ["a", "b"])
+        self.assertEqual(ArrayR.filled(3, 7).to_list(), [7, 7, 7])
+        self.assertEqual(len(ArrayR.filled(0, 7)), 0)
+        self.assertEqual(ArrayR(2).to_list(), [None, None])
+        with self.assertRaises(ValueError):
+            ArrayR.filled(-1, 0)
+
+        a = ArrayR.from_iterable(range(10))
+        self.assertEqual(list(a), list(range(10)))
+        self.assertEqual(a[2:5].to_list(), [2, 3, 4])
+        self.assertEqual(a[::3].to_list(), [0, 3, 6, 9])
+        a[0:3] = ArrayR.from_list(["x", "y", "z"])
+        a[8:10] = iter([80, 90])
+        self.assertEqual(a.to_list(), ["x", "y", "z", 3, 4, 5, 6, 7, 80, 90])
+        with self.assertRaises(ValueError):
+            a[0:2] = [1]
+
+    @number("6.2")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_array_copy_into(self):
+        a = ArrayR.from_iterable(range(8))
+        b = ArrayR.filled(5, None)
+        a.copy_into(b, 5, 1, 3)
+        self.assertEqual(b.to_list(), [None, 5, 6, 7, None])
+        # Overlapping runs in the same array, either way.
+        a.copy_into(a, 0, 2, 5)
+        self.assertEqual(a.to_list(), [0, 1, 0, 1, 2, 3, 4, 7])
+        a.copy_into(a, 3, 0, 5)
+        self.assertEqual(a.to_list(), [1, 2, 3, 4, 7, 3, 4, 7])
+        a.copy_into(b, 0, 0, 0)
+        for k, src, dst in ((4, 5, 0), (3, 0, 3), (-1, 0, 0)):
+            with self.assertRaises(IndexError):
+                a.copy_into(b, src, dst, k)
+
+    @number("6.3")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_sorted_list_shifts(self):
+        sorted_list = ArraySortedList(1)
+        keys = [5, 1, 9, 3, 7, 2, 8, 0, 6, 4]
+        for key in keys:
+            sorted_list.add(ListItem(str(key), key))
+        self.assertEqual([sorted_list[i].key for i in range(len(sorted_list))], sorted(keys))
+        sorted_list.delete_at_index(0)
+        sorted_list.delete_at_index(4)
+        sorted_list.delete_at_index(len(sorted_list) - 1)
+        self.assertEqual([sorted_list[i].value for i in range(len(sorted_list))], ["1", "2", "3", "4", "6", "7", "8"])
+
+    @number("6.4")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_typed_arrays(self):
+        for cls, values in ((ArrayI, [3, -1, 2 ** 40, 0]), (ArrayF, [0.5, -2.25, 1e300, 0.0])):
+            a = cls(4)
+            self.assertEqual(a.to_list(), [0, 0, 0, 0])
+            for i, value in enumerate(values):
+                a[i] = value
+            self.assertEqual(list(a), values)
+            self.assertEqual(a.view().itemsize, 8)
+            self.assertEqual(a[1:3].to_list(), values[1:3])
+            self.assertEqual(a.index(values[2]), 2)
+            a[0:2] = cls.from_list(values[2:])
+            self.assertEqual(a.to_list(), values[2:] + values[2:])
+            a.copy_into(a, 0, 1, 3)
+            self.assertEqual(a.to_list(), [values[2], values[2], values[3], values[2]])
+            self.assertEqual(cls.filled(3, values[0]).to_list(), [values[0]] * 3)
+            self.assertEqual(cls.from_iterable(iter(values)).to_list(), values)
+        with self.assertRaises(OverflowError):
+            ArrayI(1)[0] = 2 ** 64
+        with self.assertRaises(TypeError):
+            ArrayI(1)[0] = 0.5
+
+    @number("6.5")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_typed_arrays_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy is not installed")
+        a = ArrayI.from_list([1, 2, 3])
+        view = a.to_numpy()
+        self.assertEqual(view.dtype, numpy.int64)
+        # The memory is shared both ways.
+        view[0] = 10
+        a[2] = 30
+        self.assertEqual(a.to_list(), [10, 2, 30])
+        self.assertEqual(view.tolist(), [10, 2, 30])
+        self.assertEqual(ArrayF.from_list([0.5]).to_numpy().dtype, numpy.float64)
+
+    @number("6.6")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_sorted_list_bulk(self):
+        keys = [(i * 7919) % 101 for i in range(300)]
+        sorted_list = ArraySortedList(1)
+        sorted_list.bulk_load(ListItem(i, key) for i, key in enumerate(keys[:200]))
+        self.assertEqual(len(sorted_list), 200)
+        sorted_list.add_all(ListItem(i + 200, key) for i, key in enumerate(keys[200:]))
+        sorted_list.add_all([])
+        sorted_list.add(ListItem(-1, 50))
+        got = [(sorted_list[i].key, sorted_list[i].value) for i in range(len(sorted_list))]
+        self.assertEqual([key for key, _ in got], sorted(keys + [50]))
+        # Items with the same key stay in the order they were added, bar the single add, which goes anywhere among them.
+        without_single = [(key, value) for key, value in got if value != -1]
+        self.assertEqual(without_single, sorted(((key, i) for i, key in enumerate(keys)), key=lambda pair: pair[0]))
+
+        sorted_list.bulk_load(iter([ListItem("b", 2), ListItem("a", 1)]))
+        self.assertEqual([sorted_list[i].value for i in range(len(sorted_list))], ["a", "b"])
+
+    @number("6.7")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_bset_iteration(self):
+        s = BSet()
+        self.assertEqual(len(s), 0)
+        self.assertEqual(list(s), [])
+        self.assertEqual(str(s), "{}")
+        for item in (70, 3, 1, 64, 65, 200):
+            s.add(item)
+        self.assertEqual(len(s), 6)
+        self.assertEqual(list(s), [1, 3, 64, 65, 70, 200])
+        self.assertEqual(s.to_array().to_list(), [1, 3, 64, 65, 70, 200])
+        self.assertEqual(str(s), "{1, 3, 64, 65, 70, 200}")
+        s.remove(64)
+        self.assertEqual(len(s), 5)
+        self.assertEqual(list(s.difference(s)), [])
+
+    @number("6.8")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_chunked_bset(self):
+        items = [1, 2, 4096, 4097, 999_999, 1_000_000, 50_000, 8193]
+        s = ChunkedBSet()
+        for item in items:
+            s.add(item)
+        s.add(50_000)
+        self.assertEqual(len(s), len(items))
+        self.assertEqual(list(s), sorted(items))
+        self.assertEqual(s.to_array().to_list(), sorted(items))
+        self.assertIn(999_999, s)
+        self.assertNotIn(999_998, s)
+        self.assertNotIn(2_000_000, s)
+        # Only the blocks in use are kept.
+        self.assertEqual(s.n_blocks, 5)
+        for i, item in enumerate(sorted(items)):
+            self.assertEqual(s.select(i), item)
+            self.assertEqual(s.rank(item), i)
+        self.assertEqual(s.rank(3), 2)
+        self.assertEqual(s.rank(600_000), 6)
+        self.assertEqual(s.rank(2_000_000), len(items))
+        with self.assertRaises(IndexError):
+            s.select(len(items))
+
+        s.remove(50_000)
+        self.assertEqual(s.n_blocks, 4)
+        self.assertEqual(s.rank(1_000_000), 6)
+        # Changes to an early block are counted again by the next rank or select.
+        s.add(3)
+        self.assertEqual(s.rank(999_999), 6)
+        self.assertEqual(s.select(2), 3)
+        s.remove(3)
+        self.assertEqual(s.select(2), 4096)
+        with self.assertRaises(KeyError):
+            s.remove(50_000)
+        with self.assertRaises(TypeError):
+            s.add(0)
+
+        t = ChunkedBSet()
+        for item in (2, 4097, 12, 700_000):
+            t.add(item)
+        self.assertEqual(list(s | t), sorted(set(s) | set(t)))
+        self.assertEqual(list(s & t), [2, 4097])
+        self.assertEqual(list(s.difference(t)), [1, 4096, 8193, 999_999, 1_000_000])
+        self.assertEqual(len(s.difference(s)), 0)
+        self.assertTrue(s.difference(s).is_empty())
+        self.assertEqual(str(t), "{2, 12, 4097, 700000}")
+
+    @number("6.9")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_heap(self):
+        items = [(i * 37) % 23 for i in range(40)]
+        heap = ArrayHeap.heapify(ArrayR.from_list(items))
+        self.assertEqual(len(heap), 40)
+        self.assertEqual(heap.peek(), 0)
+        self.assertEqual(heap.top_k(5).to_list(), sorted(items)[:5])
+        self.assertEqual(len(heap), 40)
+        for item in (-1, 100, 5):
+            heap.add(item)
+        self.assertEqual(heap.pop_many(43).to_list(), sorted(items + [-1, 100, 5]))
+        with self.assertRaises(IndexError):
+            heap.pop()
+
+        largest = ArrayHeap(1, key=len, largest_first=True)
+        for word in ("bb", "a", "dddd", "ccc"):
+            largest.add(word)
+        self.assertEqual(largest.top_k(10).to_list(), ["dddd", "ccc", "bb", "a"])
+        self.assertEqual(largest.pop(), "dddd")
+
+    @number("6.10")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_heap_update(self):
+        priorities = {name: priority for priority, name in enumerate("abcdef")}
+        heap = ArrayHeap.heapify(iter("fedcba"), key=lambda name: priorities[name], indexed=True)
+        self.assertEqual(heap.peek(), "a")
+        priorities["e"] = -1
+        heap.update("e")
+        priorities["a"] = 10
+        heap.update("a")
+        self.assertIn("e", heap)
+        self.assertEqual(heap.pop_many(6).to_list(), ["e", "b", "c", "d", "f", "a"])
+        self.assertNotIn("e", heap)
+        with self.assertRaises(KeyError):
+            heap.update("e")
+        heap.add("b")
+        with self.assertRaises(ValueError):
+            heap.add("b")
+        with self.assertRaises(ValueError):
+            ArrayHeap.heapify(["a", "a"], indexed=True)
+        with self.assertRaises(ValueError):
+            ArrayHeap().update(1)
+
+    @number("6.11")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_linear_probe_table(self):
+        table = LinearProbeTable(max_load_factor=0.5)
+        expected = {}
+        for i in range(2000):
+            key = (i * 7919) % 3001
+            table[key] = i
+            expected[key] = i
+            if i % 3 == 0 and (i * 104729) % 3001 in expected:
+                del table[(i * 104729) % 3001]
+                del expected[(i * 104729) % 3001]
+            # Lookups work part way through every rehash.
+            self.assertEqual(len(table), len(expected))
+        for key, value in expected.items():
+            self.assertIn(key, table)
+            self.assertEqual(table[key], value)
+        self.assertEqual(dict(table.items()), expected)
+        self.assertEqual(sorted(table), sorted(expected))
+        self.assertLessEqual(len(table), 0.5 * len(table.keys))
+
+        names = LinearProbeTable()
+        names["Flamikin"] = 1
+        names["Flamikin"] = 2
+        self.assertEqual(names.get("Flamikin"), 2)
+        self.assertIsNone(names.get("Aquariuma"))
+        self.assertEqual(str(names), "{'Flamikin': 2}")
+        del names["Flamikin"]
+        self.assertTrue(names.is_empty())
+        with self.assertRaises(KeyError):
+            del names["Flamikin"]
+        with self.assertRaises(KeyError):
+            names[None] = 1
+        with self.assertRaises(ValueError):
+            LinearProbeTable(max_load_factor=1)
+
+    @number("6.12")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_persistent_vector(self):
+        empty = PersistentVector()
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(list(empty), [])
+        # Enough elements for a trie three levels deep.
+        n = 32 * 32 + 40
+        v1 = PersistentVector.from_iterable(range(n))
+        self.assertEqual(len(v1), n)
+        self.assertEqual(list(v1), list(range(n)))
+        self.assertEqual(v1[-1], n - 1)
+        v2 = v1.set(5, "five").set(n - 1, "last")
+        v3 = v2.append("extra")
+        self.assertEqual((v1[5], v2[5], v3[5]), (5, "five", "five"))
+        self.assertEqual((v1[n - 1], v2[n - 1]), (n - 1, "last"))
+        self.assertEqual((len(v2), len(v3)), (n, n + 1))
+        # Only the path to the changed element is copied.
+        self.assertIsNot(v2.root, v1.root)
+        self.assertIs(v2.root[1], v1.root[1])
+        self.assertEqual(v3.to_array()[n], "extra")
+        with self.assertRaises(IndexError):
+            v1[n]
+        with self.assertRaises(IndexError):
+            empty.set(0, 1)
+        self.assertEqual(str(PersistentVector.from_iterable("ab")), "[a, b]")
@@ -0,0 +1,62 @@
+import json
+from io import StringIO
+from unittest import TestCase
+
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+from random_gen import RandomGen
+
+from battle import Battle
+from instrumentation import Instrumentation, JsonLinesSink, MemorySink
+from team import MonsterTeam
+
+
+class TestInstrumentation(TestCase):
+
+    def play(self, b: Battle, seed: int) -> list[Battle.TurnEvent]:
+        RandomGen.set_seed(seed)
+        team1 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+        team2 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+        return list(b.iter_turns(team1, team2))
+
+    @number("4.12")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_counters(self):
+        sink = MemorySink()
+        instrumentation = Instrumentation(sink, timers=True)
+        for seed in range(20):
+            events = self.play(Battle(fast_forward=False), seed)
+            RandomGen.set_seed(seed)
+            team1 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+            team2 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+            result = Battle(instrumentation=instrumentation).battle(team1, team2)
+
+            record = sink.records[-1]
+            self.assertEqual(record["result"], result.name)
+            self.assertEqual(record["turns"], len(events))
+            self.assertEqual(record["swaps"], sum(
+                (e.action1 == Battle.Action.SWAP) + (e.action2 == Battle.Action.SWAP) for e in events
+            ))
+            self.assertEqual(record["knockouts"], sum(e.fainted1 + e.fainted2 for e in events))
+            self.assertEqual(record["evolutions"], sum(e.evolved1 + e.evolved2 for e in events))
+            self.assertEqual(record["damage1"], sum(e.damage1 for e in events))
+            self.assertEqual(record["damage2"], sum(e.damage2 for e in events))
+            self.assertGreater(record["choose_ns"], 0)
+        self.assertEqual(instrumentation.totals.battles, 20)
+        self.assertEqual(instrumentation.totals.turns, sum(r["turns"] for r in sink.records))
+
+    @number("4.13")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_json_lines(self):
+        f = StringIO()
+        b = Battle(instrumentation=Instrumentation(JsonLinesSink(f)))
+        for seed in range(5):
+            self.play(b, seed)
+        records = [json.loads(line) for line in f.getvalue().splitlines()]
+        self.assertEqual(len(records), 5)
+        for record in records:
+            self.assertEqual(record["battles"], 1)
+            self.assertEqual(record["choose_ns"], 0)
+            self.assertIn(record["result"], ("TEAM1", "TEAM2", "DRAW"))
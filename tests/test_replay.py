@@ -0,0 +1,55 @@
+from io import BytesIO
+from unittest import TestCase
+
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+from random_gen import RandomGen
+
+from battle import Battle
+from replay import BattleReplay, ReplayWriter
+from team import MonsterTeam
+
+
+class TestReplay(TestCase):
+
+    def record(self, seed: int, n: int) -> tuple[bytes, list]:
+        RandomGen.set_seed(seed)
+        f = BytesIO()
+        b = Battle(replay=ReplayWriter(f))
+        outcomes = []
+        for i in range(n):
+            team1 = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+            team2 = MonsterTeam(MonsterTeam.TeamMode.FRONT, MonsterTeam.SelectionMode.RANDOM)
+            outcomes.append((b.battle(team1, team2), str(b.out1), str(b.out2)))
+        return f.getvalue(), outcomes
+
+    @number("4.10")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_round_trip(self):
+        data, outcomes = self.record(1054, 50)
+        replays = list(BattleReplay.read_all(BytesIO(data)))
+        self.assertEqual(len(replays), 50)
+        for replay, (result, out1, out2) in zip(replays, outcomes):
+            self.assertEqual(replay.result, result)
+            self.assertEqual(replay.play(), result)
+            self.assertEqual(str(replay.battle.out1), out1)
+            self.assertEqual(str(replay.battle.out2), out2)
+        turns = sum(replay.turn_count for replay in replays)
+        # The teams take a few bytes per monster, and turns well under a byte each.
+        self.assertLess(len(data), 50 * 60 + turns)
+
+    @number("4.11")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_seek(self):
+        data, _ = self.record(2085, 10)
+        for replay in BattleReplay.read_all(BytesIO(data), checkpoint_interval=2):
+            states = []
+            for turn in range(replay.turn_count + 1):
+                b = replay.seek(turn)
+                states.append((str(b.out1), str(b.out2), len(b.team1), len(b.team2)))
+            # Seeking again, out of order, goes through the checkpoints taken above.
+            for turn in range(replay.turn_count, -1, -1):
+                b = replay.seek(turn)
+                self.assertEqual((str(b.out1), str(b.out2), len(b.team1), len(b.team2)), states[turn])
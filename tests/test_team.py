@@ -260,3 +260,32 @@ class TestTeam(TestCase):
 
         self.assertEqual(len(team), 1)
         self.assertIsInstance(team.retrieve_from_team(), Flamikin)
+
+    @number("3.8")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_snapshot_and_fork(self):
+        team = MonsterTeam(
+            team_mode=MonsterTeam.TeamMode.OPTIMISE,
+            selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+            provided_monsters=ArrayR.from_list([Flamikin, Aquariuma, Vineon]),
+            sort_key=MonsterTeam.SortMode.HP,
+        )
+        first = team.get_monsters()[0]
+        first.set_hp(1)
+        snapshot = team.snapshot()
+        self.assertEqual([state[3] for state in snapshot], [monster.get_hp() for monster in team.get_monsters()])
+
+        fork = team.fork()
+        first.set_hp(0)
+        forked = fork.get_monsters()
+        self.assertEqual(len(fork), 3)
+        self.assertIsNot(forked[0], first)
+        self.assertEqual(forked[0].get_hp(), 1)
+        self.assertEqual([type(monster) for monster in forked], [type(monster) for monster in team.get_monsters()])
+
+        # Variations of a snapshot leave it unchanged.
+        monster_class, simple_mode, level, hp, already_evo = snapshot[0]
+        healed = snapshot.set(0, (monster_class, simple_mode, level, 10, already_evo))
+        self.assertEqual(snapshot[0][3], 1)
+        self.assertEqual(team.fork(healed).retrieve_from_team().get_hp(), 10)
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+from random_gen import RandomGen
+
+from battle import Battle
+from replay import decode_team, encode_team
+from team import MonsterTeam
+from tournament import run_tournament
+
+from data_structures.referential_array import ArrayR
+
+
+class TestTournament(TestCase):
+
+    def setUp(self) -> None:
+        RandomGen.set_seed(2024)
+        self.teams = {
+            name: MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+            for name in "abcdefgh"
+        }
+
+    def winner(self, left: str, right: str) -> str:
+        # Play the match between fresh copies of the teams, like the tournament does.
+        result = Battle().battle(decode_team(encode_team(self.teams[left])), decode_team(encode_team(self.teams[right])))
+        return right if result == Battle.Result.TEAM2 else left
+
+    @number("5.13")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_rounds(self):
+        # An unbalanced bracket: e plays the winner of the first semi final in round 3.
+        bracket = ArrayR.from_list(["a", "b", "+", "c", "d", "+", "+", "e", "+", "f", "g", "+", "+"])
+        report = run_tournament(bracket, self.teams, workers=0)
+
+        ab, cd, fg = self.winner("a", "b"), self.winner("c", "d"), self.winner("f", "g")
+        abcd = self.winner(ab, cd)
+        abcde = self.winner(abcd, "e")
+        self.assertEqual([len(r.matches) for r in report.rounds], [3, 1, 1, 1])
+        self.assertEqual([(m[0], m[1]) for m in report.rounds[0].matches], [("a", "b"), ("c", "d"), ("f", "g")])
+        self.assertEqual(report.rounds[2].matches[0][:2], (abcd, "e"))
+        self.assertEqual(report.rounds[3].matches[0][:2], (abcde, fg))
+        self.assertEqual(report.champion, self.winner(abcde, fg))
+        self.assertIn(f"{report.champion} won", str(report))
+
+        self.assertEqual(run_tournament(iter(["h"]), self.teams).champion, "h")
+        with self.assertRaises(ValueError):
+            run_tournament(iter(["a", "b", "+", "+"]), self.teams, workers=0)
+        with self.assertRaises(ValueError):
+            run_tournament(iter(["a", "z", "+"]), self.teams, workers=0)
+
+    @number("5.14")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_process_pool(self):
+        bracket = ArrayR.from_list(["a", "b", "+", "c", "d", "+", "+", "e", "f", "+", "g", "h", "+", "+", "+"])
+        sequential = run_tournament(bracket, self.teams, workers=0)
+        parallel = run_tournament(bracket, self.teams, workers=2)
+        self.assertEqual(parallel.champion, sequential.champion)
+        for i in range(len(sequential.rounds)):
+            self.assertEqual(parallel.rounds[i].matches.to_list(), sequential.rounds[i].matches.to_list())
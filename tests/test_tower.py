@@ -1,3 +1,6 @@
+import io
+import os
+import tempfile
 from unittest import TestCase
 
 from ed_utils.decorators import number, visibility, advanced
@@ -7,7 +10,7 @@ from random_gen import RandomGen
 from battle import Battle
 from elements import Element
 from team import MonsterTeam
-from tower import BattleTower, tournament_balanced
+from tower import BattleTower, TowerTemplate, tournament_balanced, tournament_tokens
 from helpers import Flamikin, Faeboa
 
 from data_structures.referential_array import ArrayR
@@ -45,6 +48,37 @@ class BadFlamikin(Flamikin):
     def get_max_hp(self):
         return 1
 
+class ScriptedBattle(Battle):
+    """Hands out the given results in a cycle instead of fighting, remembering the enemy teams faced."""
+
+    def __init__(self, results: list[Battle.Result]) -> None:
+        super().__init__(verbosity=0)
+        self.results = results
+        self.fought = []
+
+    def battle(self, team1: MonsterTeam, team2: MonsterTeam) -> Battle.Result:
+        self.fought.append(team2)
+        return self.results[(len(self.fought) - 1) % len(self.results)]
+
+
+class WearingBattle(ScriptedBattle):
+    """Like ScriptedBattle, but every battle takes the next monster out of the enemy team."""
+
+    def battle(self, team1: MonsterTeam, team2: MonsterTeam) -> Battle.Result:
+        if len(team2) > 0:
+            team2.retrieve_from_team()
+        return super().battle(team1, team2)
+
+
+class EmptyingBattle(ScriptedBattle):
+    """Like ScriptedBattle, but every battle takes every monster out of the enemy team."""
+
+    def battle(self, team1: MonsterTeam, team2: MonsterTeam) -> Battle.Result:
+        while len(team2) > 0:
+            team2.retrieve_from_team()
+        return super().battle(team1, team2)
+
+
 class TestTower(TestCase):
 
     @number("5.1")
@@ -255,3 +289,459 @@ class TestTower(TestCase):
         self.assertFalse(tournament_balanced(invalid2))
         self.assertFalse(tournament_balanced(unbalanced))
         self.assertTrue(tournament_balanced(balanced))
+
+    @number("5.6")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_remaining_bookkeeping(self):
+        RandomGen.set_seed(123456789)
+        b = ScriptedBattle([Battle.Result.TEAM2, Battle.Result.DRAW, Battle.Result.TEAM2])
+        bt = BattleTower(b)
+        bt.set_my_team(MonsterTeam(
+            team_mode=MonsterTeam.TeamMode.BACK,
+            selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+            provided_monsters=ArrayR.from_list([Flamikin])
+        ))
+        bt.player_lives = 100
+        bt.generate_teams(3)
+        lives = bt.team_lives.to_list()
+        order = []
+        while bt.battles_remaining():
+            result, team1, team2, l1, l2 = bt.next_battle()
+            order.append(bt.teams.index(team2))
+        # The first team with lives left is always the one fought.
+        expected = [0] * lives[0] + [1] * lives[1] + [2] * lives[2]
+        self.assertListEqual(order, expected)
+        self.assertEqual(bt.alive_count, 0)
+        self.assertEqual(bt.player_lives, 100 - len(expected) // 3)
+        self.assertRaises(ValueError, bt.next_battle)
+
+    @number("5.7")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_tall_tower(self):
+        RandomGen.set_seed(1008)
+        bt = BattleTower(ScriptedBattle([Battle.Result.TEAM2]))
+        bt.set_my_team(MonsterTeam(
+            team_mode=MonsterTeam.TeamMode.BACK,
+            selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+            provided_monsters=ArrayR.from_list([Flamikin])
+        ))
+        bt.generate_teams(2000)
+        total_lives = sum(bt.team_lives.to_list())
+        battles = 0
+        while bt.battles_remaining():
+            bt.next_battle()
+            battles += 1
+        self.assertEqual(battles, total_lives)
+
+    @number("5.8")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_lazy_generation(self):
+        towers = []
+        for lazy in (False, True):
+            RandomGen.set_seed(987654321)
+            bt = BattleTower(ScriptedBattle([Battle.Result.TEAM2, Battle.Result.TEAM1]))
+            bt.set_my_team(MonsterTeam(
+                team_mode=MonsterTeam.TeamMode.BACK,
+                selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                provided_monsters=ArrayR.from_list([Flamikin])
+            ))
+            bt.generate_teams(50, lazy=lazy)
+            towers.append((bt, RandomGen.seed))
+        (eager, eager_seed), (lazy, lazy_seed) = towers
+        self.assertIsNone(lazy.teams)
+        # Both draw the same random numbers, so what comes after the tower is unaffected.
+        self.assertEqual(eager_seed, lazy_seed)
+        self.assertListEqual(eager.team_lives.to_list(), lazy.team_lives.to_list())
+        for i in range(50):
+            self.assertListEqual(
+                [str(m) for m in eager.get_team(i).get_monsters()],
+                [str(m) for m in lazy.get_team(i).get_monsters()],
+            )
+        self.assertEqual(RandomGen.seed, lazy_seed)
+
+        played = []
+        for bt in (eager, lazy):
+            results = []
+            while bt.battles_remaining():
+                result, team1, team2, l1, l2 = bt.next_battle()
+                results.append((result, l1, l2, [str(m) for m in team2.get_monsters()]))
+            played.append(results)
+        self.assertListEqual(played[0], played[1])
+
+    @number("5.9")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_iteration(self):
+        def make_tower() -> BattleTower:
+            RandomGen.set_seed(123456789)
+            bt = BattleTower(ScriptedBattle([Battle.Result.TEAM2, Battle.Result.TEAM1, Battle.Result.DRAW]))
+            bt.set_my_team(MonsterTeam(
+                team_mode=MonsterTeam.TeamMode.BACK,
+                selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                provided_monsters=ArrayR.from_list([Flamikin])
+            ))
+            bt.player_lives = 5
+            bt.generate_teams(3)
+            return bt
+
+        bt = make_tower()
+        expected = []
+        while bt.battles_remaining():
+            result, team1, team2, l1, l2 = bt.next_battle()
+            expected.append((result, l1, l2))
+
+        got = [(result, l1, l2) for result, team1, team2, l1, l2 in make_tower()]
+        self.assertListEqual(got, expected)
+
+        totals = make_tower().run()
+        self.assertEqual(totals.battles, len(expected))
+        self.assertEqual(totals.wins, sum(r == Battle.Result.TEAM1 for r, _, _ in expected))
+        self.assertEqual(totals.losses, sum(r == Battle.Result.TEAM2 for r, _, _ in expected))
+        self.assertEqual(totals.draws, sum(r == Battle.Result.DRAW for r, _, _ in expected))
+        self.assertEqual(totals.player_lives, expected[-1][1])
+
+        bt = make_tower()
+        totals = bt.run(max_battles=2)
+        self.assertEqual(totals.battles, 2)
+        self.assertEqual((totals.player_lives, bt.team_lives[0]), expected[1][1:])
+
+    @number("5.10")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_out_of_meta_incremental(self):
+        def elements(team: MonsterTeam) -> set[int]:
+            return {Element.from_string(m.get_element()).value for m in team.get_monsters()}
+
+        RandomGen.set_seed(123456789)
+        bt = BattleTower(ScriptedBattle([Battle.Result.TEAM2]))
+        bt.set_my_team(MonsterTeam(
+            team_mode=MonsterTeam.TeamMode.BACK,
+            selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+            provided_monsters=ArrayR.from_list([Faeboa])
+        ))
+        bt.generate_teams(6)
+        battled = set()
+        while bt.battles_remaining():
+            self.assertEqual(bt.out_of_meta().to_list(), [
+                Element(value) for value in sorted(battled - elements(bt.get_team(bt.next_index)) - elements(bt.player_team))
+            ])
+            result, team1, team2, l1, l2 = bt.next_battle()
+            battled |= elements(team1) | elements(team2)
+        # With no enemy team left, only the player team's elements are in the meta.
+        self.assertEqual(bt.out_of_meta().to_list(), [
+            Element(value) for value in sorted(battled - elements(bt.player_team))
+        ])
+
+    @number("5.11")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_sort_by_lives_kept_sorted(self):
+        for lazy in (False, True):
+            RandomGen.set_seed(123456789)
+            bt = BattleTower(ScriptedBattle([Battle.Result.TEAM2, Battle.Result.TEAM2, Battle.Result.DRAW]))
+            bt.set_my_team(MonsterTeam(
+                team_mode=MonsterTeam.TeamMode.BACK,
+                selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                provided_monsters=ArrayR.from_list([Faeboa])
+            ))
+            bt.player_lives = 1000
+            bt.generate_teams(50, lazy=lazy)
+
+            def team_key(index):
+                # Lazily generated teams are only known by their seed.
+                return bt.team_seeds[index] if lazy else id(bt.teams[index])
+
+            lives = [bt.team_lives[i] for i in range(50)]
+            keys = [team_key(i) for i in range(50)]
+
+            bt.sort_by_lives()
+            # Stable: teams with the same lives keep their order.
+            expected = sorted(range(50), key=lambda i: lives[i])
+            self.assertEqual([bt.team_lives[i] for i in range(50)], [lives[i] for i in expected])
+            self.assertEqual([team_key(i) for i in range(50)], [keys[i] for i in expected])
+
+            lives_by_key = dict(zip(keys, lives))
+            for _ in range(60):
+                key = team_key(bt._next_team_index())
+                result, team1, team2, l1, l2 = bt.next_battle()
+                if result != Battle.Result.TEAM1:
+                    lives_by_key[key] -= 1
+                self.assertEqual(l2, lives_by_key[key])
+                sorted_lives = [bt.team_lives[i] for i in range(50)]
+                self.assertEqual(sorted_lives, sorted(sorted_lives))
+            # Every team still has its own lives after being moved around.
+            self.assertEqual({team_key(i): bt.team_lives[i] for i in range(50)}, lives_by_key)
+
+    @number("5.12")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_tournament_streaming(self):
+        def balanced(height):
+            # Postfix tokens of a balanced tournament, generated without building it.
+            if height == 0:
+                yield "T"
+            else:
+                yield from balanced(height - 1)
+                yield from balanced(height - 1)
+                yield "+"
+
+        # 2 ** 17 teams, never held in an array.
+        self.assertTrue(tournament_balanced(balanced(17)))
+        self.assertFalse(tournament_balanced(iter(["T1", "+"])))
+        self.assertFalse(tournament_balanced(iter([])))
+
+        bracket = io.StringIO("a b + c d\n+ +\n\ne f +\n")
+        self.assertFalse(tournament_balanced(tournament_tokens(bracket)))
+        bracket = io.StringIO("a b +\nc d + +\n")
+        self.assertTrue(tournament_balanced(tournament_tokens(bracket)))
+
+    @number("5.15")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_checkpoint_resume(self):
+        results = [Battle.Result.TEAM2, Battle.Result.TEAM2, Battle.Result.DRAW, Battle.Result.TEAM1]
+
+        def new_tower(lazy):
+            RandomGen.set_seed(55555)
+            bt = BattleTower(WearingBattle(results))
+            bt.set_my_team(MonsterTeam(
+                team_mode=MonsterTeam.TeamMode.BACK,
+                selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                provided_monsters=ArrayR.from_list([Flamikin, Faeboa])
+            ))
+            bt.player_lives = 500
+            bt.generate_teams(40, lazy=lazy)
+            bt.sort_by_lives()
+            return bt
+
+        def play(bt):
+            played = []
+            for result, team1, team2, l1, l2 in bt:
+                played.append((result, l1, l2, [str(m) for m in team2.get_monsters()]))
+            return played
+
+        sizes = []
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tower.ckpt")
+            for lazy in (False, True):
+                expected = play(new_tower(lazy))
+                self.assertGreater(len(expected), 65)
+                expected_seed = RandomGen.seed
+
+                bt = new_tower(lazy)
+                totals = bt.run(max_battles=65, checkpoint_path=path, checkpoint_every=20)
+                self.assertEqual(totals.battles, 65)
+                # The run stopped at 65, so the latest checkpoint was taken at the end of it.
+                RandomGen.set_seed(1)
+                resumed = BattleTower.resume(path, WearingBattle(results[65 % len(results):] + results[:65 % len(results)]))
+                self.assertEqual(RandomGen.seed, expected_seed)
+                self.assertEqual(resumed.sorted_by_lives, True)
+                self.assertEqual(play(resumed), expected[65:])
+                # Until battles change them, lazily generated teams are stored by their seed.
+                sizes.append(len(new_tower(lazy).checkpoint()))
+        self.assertLess(sizes[1], sizes[0])
+
+    @number("5.16")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_shared_template(self):
+        results = [Battle.Result.TEAM2, Battle.Result.DRAW, Battle.Result.TEAM1]
+
+        def new_tower(template=None):
+            bt = BattleTower(WearingBattle(results))
+            # Set directly, as set_my_team would draw a random number.
+            bt.player_team = MonsterTeam(
+                team_mode=MonsterTeam.TeamMode.BACK,
+                selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                provided_monsters=ArrayR.from_list([Flamikin])
+            )
+            bt.player_lives = 300
+            if template is None:
+                bt.generate_teams(30, lazy=True)
+            else:
+                bt.use_template(template)
+            bt.sort_by_lives()
+            return bt
+
+        def play(bt):
+            return [(result, l1, l2, [str(m) for m in team2.get_monsters()]) for result, team1, team2, l1, l2 in bt]
+
+        RandomGen.set_seed(31337)
+        expected = play(new_tower())
+        RandomGen.set_seed(31337)
+        template = TowerTemplate.generate(30)
+        data = template.data
+
+        # Every tower using the template battles the same teams, without changing the template.
+        for _ in range(3):
+            self.assertEqual(play(new_tower(template)), expected)
+        self.assertEqual(template.data, data)
+
+        memory = template.share()
+        try:
+            shared, attached = TowerTemplate.attach(memory.name)
+            self.assertEqual(play(new_tower(shared)), expected)
+            bt = new_tower(shared)
+            bt.run(max_battles=40)
+            resumed = BattleTower.restore(bt.checkpoint(), WearingBattle(results[40 % 3:] + results[:40 % 3]), shared)
+            self.assertEqual(play(resumed), expected[40:])
+            with self.assertRaises(ValueError):
+                BattleTower.restore(bt.checkpoint())
+            del shared, bt, resumed
+            attached.close()
+        finally:
+            memory.close()
+            memory.unlink()
+
+    @number("5.17")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_strength_index(self):
+        def check(bt):
+            alive = [i for i in range(bt.team_count) if bt.team_lives[i] > 0]
+            for low, high in ((0, 1000), (60, 120), (100, 100), (150, 40)):
+                expected = sorted(
+                    (i for i in alive if low <= bt.team_strength(i) <= high),
+                    key=lambda i: (bt.team_strength(i), bt.team_floors[i])
+                )
+                self.assertEqual(bt.teams_in_strength_range(low, high).to_list(), expected)
+            for strength in (0, 75, 110, 1000):
+                harder = [i for i in alive if bt.team_strength(i) > strength]
+                expected = min(harder, key=lambda i: (bt.team_strength(i), bt.team_floors[i])) if harder else None
+                self.assertEqual(bt.next_harder_team(strength), expected)
+
+        towers = []
+        for lazy in (False, True):
+            RandomGen.set_seed(20240)
+            bt = BattleTower(ScriptedBattle([Battle.Result.TEAM2, Battle.Result.DRAW, Battle.Result.TEAM1]))
+            bt.set_my_team(MonsterTeam(
+                team_mode=MonsterTeam.TeamMode.BACK,
+                selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                provided_monsters=ArrayR.from_list([Flamikin])
+            ))
+            bt.player_lives = 1000
+            bt.generate_teams(60, lazy=lazy)
+            towers.append(bt)
+            for i in range(60):
+                self.assertEqual(bt.team_strength(i), bt.get_team(i).strength())
+            check(bt)
+            for battle in range(150):
+                if battle == 50:
+                    bt.sort_by_lives()
+                if not bt.battles_remaining():
+                    break
+                bt.next_battle()
+                check(bt)
+            cleared = [bt.team_floors[i] + 1 for i in range(bt.team_count) if bt.team_lives[i] <= 0]
+            self.assertEqual(list(bt.cleared_floors), sorted(cleared))
+            restored = BattleTower.restore(bt.checkpoint())
+            check(restored)
+            self.assertEqual(list(restored.cleared_floors), sorted(cleared))
+        self.assertEqual(towers[0].floor_strengths.to_list(), towers[1].floor_strengths.to_list())
+
+    @number("5.18")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_emptied_teams_skipped(self):
+        RandomGen.set_seed(4242)
+        n = 3000
+        bt = BattleTower(EmptyingBattle([Battle.Result.TEAM1]))
+        bt.set_my_team(MonsterTeam(
+            team_mode=MonsterTeam.TeamMode.BACK,
+            selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+            provided_monsters=ArrayR.from_list([Flamikin])
+        ))
+        bt.player_lives = n + 1
+        bt.generate_teams(n)
+        looked_up = []
+        get_team = bt.get_team
+        bt.get_team = lambda index: looked_up.append(index) or get_team(index)
+
+        # Every team is left empty with all its lives, so is only battled once, and only passed over once.
+        totals = bt.run()
+        self.assertEqual(totals.battles, n)
+        self.assertEqual(bt.battle.fought, [bt.teams[i] for i in range(n)])
+        self.assertEqual(totals.player_lives, 1)
+        self.assertEqual(totals.teams_remaining, n)
+        self.assertLessEqual(len(looked_up), 3 * n)
+        self.assertIsNone(bt._next_team_index())
+
+    @number("5.19")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_lazy_generation_keeps_changes(self):
+        results = [Battle.Result.TEAM1, Battle.Result.TEAM2, Battle.Result.TEAM1, Battle.Result.DRAW]
+
+        def new_tower(mode, sort):
+            RandomGen.set_seed(77777)
+            bt = BattleTower(WearingBattle(results))
+            # Set directly, as set_my_team would draw a random number.
+            bt.player_team = MonsterTeam(
+                team_mode=MonsterTeam.TeamMode.BACK,
+                selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                provided_monsters=ArrayR.from_list([Flamikin])
+            )
+            bt.player_lives = 1000
+            if mode == "template":
+                bt.use_template(TowerTemplate.generate(40))
+            else:
+                bt.generate_teams(40, lazy=mode == "lazy")
+            if sort:
+                bt.sort_by_lives()
+            return bt
+
+        def play(bt, max_battles=None):
+            played = []
+            for result, team1, team2, l1, l2 in bt:
+                played.append((result, l1, l2, [str(m) for m in team2.get_monsters()]))
+                # Looking at other teams in between battles does not undo what the battles did to them.
+                bt.get_team(len(played) % bt.team_count)
+                if len(played) == max_battles:
+                    break
+            return played
+
+        for sort in (False, True):
+            expected = play(new_tower("eager", sort))
+            self.assertGreater(len(expected), 60)
+            for mode in ("lazy", "template"):
+                self.assertEqual(play(new_tower(mode, sort)), expected)
+            # The changed teams are part of the checkpoint.
+            bt = new_tower("lazy", sort)
+            play(bt, 30)
+            self.assertGreater(sum(state is not None for state in bt.team_states), 0)
+            resumed = BattleTower.restore(bt.checkpoint(), WearingBattle(results[30 % 4:] + results[:30 % 4]))
+            self.assertEqual(play(resumed), expected[30:])
+
+    @number("5.20")
+    @visibility(visibility.VISIBILITY_SHOW)
+    @timeout()
+    def test_sorted_with_emptied_teams(self):
+        results = [Battle.Result.TEAM1, Battle.Result.TEAM2, Battle.Result.DRAW, Battle.Result.TEAM2]
+        for battle_type in (EmptyingBattle, WearingBattle):
+            for lazy in (False, True):
+                RandomGen.set_seed(1)
+                bt = BattleTower(battle_type(results))
+                bt.set_my_team(MonsterTeam(
+                    team_mode=MonsterTeam.TeamMode.BACK,
+                    selection_mode=MonsterTeam.SelectionMode.PROVIDED,
+                    provided_monsters=ArrayR.from_list([Flamikin])
+                ))
+                bt.player_lives = 10000
+                n = 60
+                bt.generate_teams(n, lazy=lazy)
+                bt.sort_by_lives()
+                while bt.battles_remaining():
+                    in_play = [i for i in range(n) if bt.team_lives[i] > 0 and len(bt.get_team(i)) > 0]
+                    if not in_play:
+                        self.assertIsNone(bt.next_battle())
+                        break
+                    floor = bt.team_floors[in_play[0]]
+                    bt.next_battle()
+                    # Emptied teams keep their lives, but the teams still battled move past them as they lose theirs.
+                    lives = [bt.team_lives[i] for i in range(n)]
+                    self.assertEqual(lives, sorted(lives))
+                    self.assertEqual(bt.team_floors[bt.floor_indices[floor]], floor)
+                self.assertEqual(sum(1 for i in range(n) if bt.team_lives[i] > 0), bt.alive_count)
@@ -0,0 +1,163 @@
+"""
+Runs tournament brackets, playing the independent matches of each round in parallel.
+
+A bracket is given in the postfix form checked by tower.tournament_balanced: team names are leaves
+and each "+" is a match between the winners of the two brackets before it. A match is played in
+the round after the later of the two matches feeding it, and each round only starts once every
+match of the round before has finished.
+
+Teams are sent to the worker processes as bytes (see replay.encode_team), and every match is played
+between fresh copies of the two teams as they were given, so a team does not carry the damage of
+one match into the next.
+
+Usage:
+```
+bracket = ArrayR.from_list(["a", "b", "+", "c", "d", "+", "+"])
+report = run_tournament(bracket, {"a": team_a, "b": team_b, "c": team_c, "d": team_d})
+print(report.champion)
+print(report)                   # Total time and the throughput of every round
+
+with open("bracket.txt") as f:  # Brackets can be streamed from a file
+    report = run_tournament(tournament_tokens(f), teams, workers=8)
+```
+"""
+from __future__ import annotations
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from time import perf_counter
+from typing import Iterable, Mapping, Optional
+
+from battle import Battle
+from replay import decode_team, encode_team
+from team import MonsterTeam
+
+from data_structures.referential_array import ArrayR
+
+
+class TournamentRound:
+    """
+    The matches of one round of a tournament, as (team 1, team 2, result) tuples, and how long they took.
+    """
+    __slots__ = ("matches", "seconds")
+
+    def __init__(self, matches: ArrayR[tuple[str, str, Battle.Result]], seconds: float) -> None:
+        """:complexity: O(1)"""
+        self.matches = matches
+        self.seconds = seconds
+
+    def matches_per_second(self) -> float:
+        """:complexity: O(1)"""
+        return len(self.matches) / self.seconds if self.seconds > 0 else float("inf")
+
+
+class TournamentReport:
+    """
+    The outcome of a tournament: its champion, every round played and the total wall clock time.
+    """
+    __slots__ = ("champion", "rounds", "seconds")
+
+    def __init__(self, champion: str, rounds: ArrayR[TournamentRound], seconds: float) -> None:
+        """:complexity: O(1)"""
+        self.champion = champion
+        self.rounds = rounds
+        self.seconds = seconds
+
+    def __str__(self) -> str:
+        ret = f"{self.champion} won, in {self.seconds:.3f}s"
+        for i, tournament_round in enumerate(self.rounds):
+            ret += (f"\nRound {i + 1}: {len(tournament_round.matches)} matches in {tournament_round.seconds:.3f}s, "
+                    f"{tournament_round.matches_per_second():.1f} matches/s")
+        return ret
+
+
+def _bracket_rounds(bracket: Iterable[str]) -> tuple[list[list[tuple[int, str | int, str | int]]], int, str | int]:
+    """
+    Splits a bracket into rounds of (match number, left side, right side) matches, numbered in the order
+    they appear in the bracket. Each side is either a team name or the number of the earlier match whose
+    winner plays it. Also returns the number of matches and the side of the final, which is a team name
+    if the bracket is a single team.
+    :complexity: O(n), where 'n' is the number of tokens, one pass over the bracket.
+    :raises ValueError: if the bracket is not a valid postfix bracket.
+    """
+    rounds = []
+    match_count = 0
+    stack = []  # (round the side is decided in, side) of the brackets waiting for their match
+    for token in bracket:
+        if token == "+":
+            if len(stack) < 2:
+                raise ValueError("Invalid bracket, a match is missing a team.")
+            right_round, right = stack.pop()
+            left_round, left = stack.pop()
+            match_round = max(left_round, right_round)
+            if match_round == len(rounds):
+                rounds.append([])
+            rounds[match_round].append((match_count, left, right))
+            stack.append((match_round + 1, match_count))
+            match_count += 1
+        else:
+            stack.append((0, token))
+    if len(stack) != 1:
+        raise ValueError("Invalid bracket, it does not end in a single final.")
+    return rounds, match_count, stack[0][1]
+
+
+def _play_match(specs: tuple[bytes, bytes]) -> int:
+    """
+    Plays a match between two encoded teams, returning the value of the result.
+    Runs in the worker processes, so only takes and returns values that pickle cheaply.
+    :complexity: O(t), where t is the number of turns, see Battle.battle.
+    """
+    return Battle().battle(decode_team(specs[0]), decode_team(specs[1])).value
+
+
+def run_tournament(bracket: Iterable[str], teams: Mapping[str, MonsterTeam],
+                   workers: Optional[int] = None) -> TournamentReport:
+    """
+    Runs a bracket, returning who won and how long each round took.
+    The matches of a round are played concurrently in a pool of worker processes. With workers set to 0
+    they are played one after another in this process instead, which is quicker for small brackets.
+    The winner of a match goes through to the next. On a draw the team on the left goes through.
+    :complexity: O(n + m*t) in total work, where 'n' is the number of tokens, 'm' the number of matches
+                 and t the number of turns in a match, spread over the workers one round at a time.
+    :raises ValueError: if the bracket is invalid or names a team that is not given.
+    """
+    start = perf_counter()
+    rounds, match_count, final = _bracket_rounds(bracket)
+    specs = {}
+    winners = ArrayR[str](match_count)
+
+    def side_name(side: str | int) -> str:
+        """The team playing a side of a match, encoding it the first time it plays."""
+        name = winners[side] if isinstance(side, int) else side
+        if name not in specs:
+            if name not in teams:
+                raise ValueError(f"Team {name} is in the bracket, but not given.")
+            specs[name] = encode_team(teams[name])
+        return name
+
+    if not rounds:
+        side_name(final)
+    executor: Optional[Executor] = ProcessPoolExecutor(workers) if workers != 0 and rounds else None
+    report_rounds = ArrayR[TournamentRound](len(rounds))
+    try:
+        for i, matches in enumerate(rounds):
+            round_start = perf_counter()
+            names = [(side_name(left), side_name(right)) for _, left, right in matches]
+            match_specs = [(specs[left], specs[right]) for left, right in names]
+            if executor is None:
+                values = map(_play_match, match_specs)
+            else:
+                values = executor.map(_play_match, match_specs, chunksize=max(1, len(match_specs) // 64))
+            # Collecting every result is the barrier between rounds.
+            results = ArrayR[tuple[str, str, Battle.Result]](len(matches))
+            for j, value in enumerate(values):
+                left, right = names[j]
+                result = Battle.Result(value)
+                results[j] = (left, right, result)
+                winners[matches[j][0]] = right if result == Battle.Result.TEAM2 else left
+            report_rounds[i] = TournamentRound(results, perf_counter() - round_start)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    champion = winners[final] if isinstance(final, int) else final
+    return TournamentReport(champion, report_rounds, perf_counter() - start)
@@ -1,13 +1,50 @@
 from __future__ import annotations
 
+import os
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Iterator, TextIO
+
 from random_gen import RandomGen
 from team import MonsterTeam
 from battle import Battle
+from replay import BytesReader, decode_team, encode_team, read_team, write_team, write_varint
 
 from elements import Element
 
 from data_structures.referential_array import ArrayR
+from data_structures.typed_array import ArrayI
 from data_structures.bset import BSet
+from data_structures.chunked_bset import ChunkedBSet
+from data_structures.stack_adt import ArrayStack
+from data_structures.array_sorted_list import ArraySortedList
+from data_structures.merge_sort import merge_sort_indices
+from data_structures.sorted_list_adt import ListItem
+
+CHECKPOINT_MAGIC = b"BTC1"
+TEMPLATE_MAGIC = b"BTT1"
+DEFAULT_CHECKPOINT_INTERVAL = 100
+
+
+class TowerRun:
+    """
+    Totals of a run of tower battles, as returned by BattleTower.run.
+    Wins, losses and draws are from the point of view of the player (team 1 in every battle).
+    """
+    __slots__ = ("battles", "wins", "losses", "draws", "player_lives", "teams_remaining")
+
+    def __init__(self) -> None:
+        """:complexity: O(1)"""
+        self.battles = 0
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.player_lives = 0
+        self.teams_remaining = 0
+
+    def __str__(self) -> str:
+        return (f"{self.battles} battles: {self.wins} won, {self.losses} lost, {self.draws} drawn. "
+                f"{self.player_lives} player lives and {self.teams_remaining} enemy teams left.")
+
 
 class BattleTower:
 
@@ -18,8 +55,27 @@ class BattleTower:
         """The method is simple assignment of variables, which makes it complexity O(1) best/worst cases"""
         self.battle = battle or Battle(verbosity=0)
         self.teams = None  # Will be initialized in generate_teams
+        self.team_seeds = None  # Used instead of teams when the teams are generated lazily
+        self.template = None  # Shared enemy teams used instead of teams, see use_template
+        self.template_indices = None  # Index in the template of each team
         self.team_lives = None
+        self.floor_strengths = None  # Strength of each team by floor, the order the teams were generated in
+        self.team_floors = None  # Floor of the team at each index, as sort_by_lives reorders the teams
+        self.floor_indices = None  # Index of the team of each floor
+        self.strength_index = ArraySortedList(1)  # Floors of the teams with lives left, keyed by (strength, floor)
+        self.strength_ranks = None  # Position of each floor in strength_index
+        self.strength_skip = None  # Links past the floors in strength_index that have run out of lives since
+        self.cleared_floors = ChunkedBSet()  # Floors, counted from 1, whose team is out of lives
+        self.team_states = None  # Encoded state of each lazily generated team changed since it was generated
+        self.cached_index = -1  # The lazily generated team last asked for, see get_team
+        self.cached_team = None
+        self.cached_state = None  # Encoded state of the cached team when it was created, or None if not known
         self.team_count = 0
+        self.battled_elements = BSet()  # Elements of every monster in the battles so far
+        self.alive_count = 0  # Number of enemy teams with lives left
+        self.next_index = 0  # No enemy team before this index has lives left and monsters to battle
+        self.done_until = 0  # Nor does any team after next_index and before this index, see _restore_lives_order
+        self.sorted_by_lives = False  # Kept sorted by next_battle once sort_by_lives is called
         self.player_team = None
         self.player_lives = 0
 
@@ -32,101 +88,724 @@ class BattleTower:
         self.player_team = team
         self.player_lives = RandomGen.randint(self.MIN_LIVES, self.MAX_LIVES)
 
-    def generate_teams(self, n: int) -> None:
+    def generate_teams(self, n: int, lazy: bool = False) -> None:
         """
         Generate 'n' number of enemy teams with monsters chosen at random.
-        :complexity: O(n), where 'n' is the number of teams generated. Each team generation is O(1).
+
+        With lazy set, no team is kept. Only the random seed each team would have been generated from is stored,
+        and get_team regenerates a team from its seed when it is needed. A team that battles change is stored
+        encoded from then on (see get_team), so battles go exactly as when generating eagerly. The random numbers
+        drawn, the lives and the teams themselves are the same as when generating eagerly too.
+        The strength of every team (see MonsterTeam.strength_of) is worked out once here, for the strength queries.
+        :complexity: O(n log n), where 'n' is the number of teams generated, to index the strengths.
+                     Each team generation is O(1).
         """
-        self.teams = ArrayR[MonsterTeam](n)
-        self.team_lives = ArrayR[int](n)
+        self.teams = None if lazy else ArrayR[MonsterTeam](n)
+        self.team_seeds = ArrayR[int](n) if lazy else None
+        self.team_states = ArrayR[bytes](n) if lazy else None
+        self.template = None
+        self.template_indices = None
+        self.team_lives = ArrayI(n)
         self.team_count = n
+        self.battled_elements = BSet()
+        self.alive_count = 0
+        self.next_index = 0
+        self.done_until = 0
+        self.sorted_by_lives = False
+        self.cached_index = -1
+        self.cached_team = None
+        self.cached_state = None
+        strengths = ArrayI(n)
         for i in range(n):
-            enemy_team = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+            if lazy:
+                self.team_seeds[i] = RandomGen.seed
+                # Draw the same random numbers creating the team would, without keeping the team.
+                classes = MonsterTeam.random_monster_classes()
+                monsters = ArrayR(len(classes))
+                for j in range(len(classes)):
+                    monsters[j] = classes[j]()
+                strengths[i] = MonsterTeam.strength_of(monsters)
+            else:
+                self.teams[i] = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+                strengths[i] = self.teams[i].strength()
             enemy_team_lives = RandomGen.randint(self.MIN_LIVES, self.MAX_LIVES)
-            self.teams[i] = enemy_team
             self.team_lives[i] = enemy_team_lives
+            if enemy_team_lives > 0:
+                self.alive_count += 1
+        self._index_strengths(strengths)
+
+    def use_template(self, template: TowerTemplate) -> None:
+        """
+        Battle copies of the enemy teams of a template, instead of generating teams.
+        The template is never changed, so it can be shared by any number of towers, each with their own lives.
+        Like lazily generated teams, a copy of a team is only made when it comes up in get_team,
+        and the tower keeps its own encoded copy of any team its battles change.
+        :complexity: O(n log n), where 'n' is the number of teams in the template, to index their strengths.
+        """
+        n = len(template)
+        self.teams = None
+        self.team_seeds = None
+        self.team_states = ArrayR[bytes](n)
+        self.template = template
+        self.template_indices = ArrayI(n)
+        self.team_lives = ArrayI(n)
+        self.team_count = n
+        self.battled_elements = BSet()
+        self.alive_count = 0
+        self.next_index = 0
+        self.done_until = 0
+        self.sorted_by_lives = False
+        self.cached_index = -1
+        self.cached_team = None
+        self.cached_state = None
+        for i in range(n):
+            self.template_indices[i] = i
+            self.team_lives[i] = template.lives[i]
+            if template.lives[i] > 0:
+                self.alive_count += 1
+        self._index_strengths(template.strengths)
+
+    def get_team(self, index: int) -> MonsterTeam:
+        """
+        Returns the enemy team at the given index.
+        Lazily generated teams are regenerated from their seed, without touching the random numbers
+        drawn elsewhere, and teams of a template are copied from it. Only the team last asked for is kept
+        as a team. When another team is asked for, it is stored encoded in team_states if it has changed
+        since it was created, and is decoded from there from then on, so no change to a team is ever lost.
+        :complexity: O(1) if the teams were generated eagerly or the team is the one last asked for,
+                     otherwise O(m) to encode the team being left, where 'm' is the number of monsters,
+                     plus the cost of creating one random team, or of copying one from the template or team_states.
+        """
+        if self.teams is not None:
+            return self.teams[index]
+        if index != self.cached_index:
+            if self.cached_index >= 0:
+                state = encode_team(self.cached_team)
+                if state != self.cached_state:
+                    self.team_states[self.cached_index] = state
+            state = self.team_states[index]
+            if state is not None:
+                self.cached_team = decode_team(state)
+            elif self.template is not None:
+                self.cached_team = self.template.team(self.template_indices[index])
+                state = encode_team(self.cached_team)
+            else:
+                seed = RandomGen.seed
+                RandomGen.set_seed(self.team_seeds[index])
+                self.cached_team = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+                RandomGen.set_seed(seed)
+                state = encode_team(self.cached_team)
+            self.cached_index = index
+            self.cached_state = state
+        return self.cached_team
 
     def battles_remaining(self) -> bool:
         """
         Check if there are any battles remaining based on player and enemy teams' lives.
-        :complexity: O(n), where 'n' is the number of enemy teams. The loop iterates over all enemy teams.
+        :complexity: O(1), as the number of enemy teams with lives left is kept up to date by next_battle.
         """
-        if self.player_lives <= 0:
-            return False
-        for i in range(self.team_count):
-            if self.team_lives[i] > 0:
-                return True
-        return False
+        return self.player_lives > 0 and self.alive_count > 0
 
     def next_battle(self) -> tuple[Battle.Result, MonsterTeam, MonsterTeam, int, int]:
         """
-        Conducts the next battle between the player and the next available enemy team.
-        :complexity: O(n), where 'n' is the number of enemy teams.
-        The loop iterates until an enemy with lives greater than 0 is found.
+        Conducts the next battle between the player and the next available enemy team,
+        which is the first team with lives left that is not empty.
+        :complexity: O(1) amortised, see _next_team_index, plus O(log n) once sorted by lives,
+                     see _restore_lives_order.
         """
         if not self.battles_remaining():
             raise ValueError("No battles remaining.")
 
-        for i in range(self.team_count):
-            team = self.teams[i]
-            lives = self.team_lives[i]
-            if lives > 0 and not len(team) == 0:  # Add check for empty team here
-                result = self.battle.battle(self.player_team, team)
-                if result == Battle.Result.TEAM2:  # Player is team1 and enemy is team2
-                    self.team_lives[i] -= 1
-                elif result == Battle.Result.TEAM1:
-                    self.player_lives -= 1
-                else:  # result == Battle.Result.DRAW:
-                    self.player_lives -= 1
-                    self.team_lives[i] -= 1
-                return result, self.player_team, team, self.player_lives, self.team_lives[i]
+        i = self._next_team_index()
+        if i is not None:
+            team = self.get_team(i)
+            # The battle takes monsters out of the teams, so note down their elements first.
+            self.battled_elements = self.battled_elements.union(self._team_elements(team))
+            self.battled_elements = self.battled_elements.union(self._team_elements(self.player_team))
+            result = self.battle.battle(self.player_team, team)
+            if result == Battle.Result.TEAM2:  # Player is team1 and enemy is team2
+                self.team_lives[i] -= 1
+            elif result == Battle.Result.TEAM1:
+                self.player_lives -= 1
+            else:  # result == Battle.Result.DRAW:
+                self.player_lives -= 1
+                self.team_lives[i] -= 1
+            team_lives = self.team_lives[i]
+            if team_lives == 0:
+                self.alive_count -= 1
+                self._unindex_strength(i)
+                self.cleared_floors.add(self.team_floors[i] + 1)
+            if self.sorted_by_lives and result != Battle.Result.TEAM1:
+                self._restore_lives_order(i)
+            return result, self.player_team, team, self.player_lives, team_lives
 
-    def out_of_meta(self) -> ArrayR[Element]:
+    def _index_strengths(self, strengths: ArrayI, floors: ArrayI | None = None) -> None:
+        """
+        Keeps the strength of every team, by floor, and indexes the teams with lives left by strength.
+        The floors of the teams out of lives go in cleared_floors.
+        Teams that run out of lives later stay in strength_index, and are skipped through strength_skip,
+        see _unindex_strength.
+        floors gives the floor of the team at each index, if the teams are no longer in the order they were generated.
+        :complexity: O(n log n), where 'n' is the number of teams, see ArraySortedList.bulk_load.
+        """
+        n = self.team_count
+        self.floor_strengths = strengths
+        self.team_floors = ArrayI(n)
+        self.floor_indices = ArrayI(n)
+        for i in range(n):
+            floor = i if floors is None else floors[i]
+            self.team_floors[i] = floor
+            self.floor_indices[floor] = i
+        self.cleared_floors = ChunkedBSet()
+        for floor in range(n):
+            if self.team_lives[self.floor_indices[floor]] <= 0:
+                self.cleared_floors.add(floor + 1)
+        self.strength_index = ArraySortedList(n)
+        self.strength_index.bulk_load(
+            ListItem(floor, (strengths[floor], floor))
+            for floor in range(n) if self.team_lives[self.floor_indices[floor]] > 0
+        )
+        self.strength_ranks = ArrayI(n)
+        self.strength_skip = ArrayI(len(self.strength_index) + 1)
+        for rank in range(len(self.strength_index)):
+            self.strength_ranks[self.strength_index[rank].value] = rank
+            self.strength_skip[rank] = rank
+        self.strength_skip[len(self.strength_index)] = len(self.strength_index)
+
+    def _unindex_strength(self, index: int) -> None:
+        """
+        Takes the team at index, which has just run out of lives, out of the strength queries.
+        Deleting it from strength_index would shift down every stronger team, so instead its position
+        is linked to the next one, and the queries follow the links past it, see _alive_rank.
+        :complexity: O(1)
+        """
+        rank = self.strength_ranks[self.team_floors[index]]
+        self.strength_skip[rank] = rank + 1
+
+    def _alive_rank(self, rank: int) -> int:
         """
-        Compute the elements that are out of meta by comparing the elements of monsters from all battled teams and the upcoming enemy team.
-        :complexity: O(n*m), where 'n' is the number of teams and 'm' is the average number of monsters in each team.
-                     The outer loop iterates over all enemy teams, and the inner loop iterates over monsters of each team.
+        The first position in strength_index from rank onwards of a team with lives left,
+        or len(strength_index) if there is none.
+        Follows the links of strength_skip, pointing every other link on the way two steps further (path halving),
+        so no run of teams out of lives is walked through more than a few times.
+        :complexity: O(log n) worst case, O(α(n)), effectively O(1), amortised over all the queries.
         """
-        # Create a set to store elements of the upcoming enemy team
-        upcoming_enemy_elements = BSet()
-        for monster in self.teams[self.team_count].get_monsters():
-            upcoming_enemy_elements.add(monster.element.value)
+        skip = self.strength_skip
+        while skip[rank] != rank:
+            skip[rank] = skip[skip[rank]]
+            rank = skip[rank]
+        return rank
 
-        # Create a set to store elements of the player team
-        player_team_elements = BSet()
-        for monster in self.player_team.get_monsters():
-            player_team_elements.add(monster.element.value)
+    def _strength_rank(self, key: tuple[int, int]) -> int:
+        """
+        Number of teams in the strength index with a (strength, floor) key below the given key,
+        counting the teams that have run out of lives since it was built.
+        :complexity: O(log n), a binary search.
+        """
+        low, high = 0, len(self.strength_index)
+        while low < high:
+            mid = (low + high) // 2
+            if self.strength_index[mid].key < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def team_strength(self, index: int) -> int:
+        """
+        The strength of the enemy team at the given index, as worked out when it was generated.
+        :complexity: O(1)
+        """
+        return self.floor_strengths[self.team_floors[index]]
+
+    def teams_in_strength_range(self, low: int, high: int) -> ArrayI:
+        """
+        Indices of the enemy teams with lives left whose strength is between low and high, both included,
+        from weakest to strongest.
+        :complexity: O(log n + k) amortised, where 'n' is the number of teams and 'k' the number of teams returned,
+                     see _alive_rank.
+        """
+        end = self._strength_rank((high, self.team_count))
+        return ArrayI.from_iterable(self._alive_floor_indices(self._strength_rank((low, -1)), end))
+
+    def _alive_floor_indices(self, rank: int, end: int) -> Iterator[int]:
+        """
+        The indices of the teams with lives left at positions rank to end - 1 of strength_index, in order.
+        :complexity: O(k) amortised, where 'k' is the number of teams, see _alive_rank.
+        """
+        rank = self._alive_rank(rank)
+        while rank < end:
+            yield self.floor_indices[self.strength_index[rank].value]
+            rank = self._alive_rank(rank + 1)
+
+    def next_harder_team(self, strength: int) -> int | None:
+        """
+        Index of the weakest enemy team with lives left that is stronger than the given strength,
+        or None if there is no such team. Teams as strong as each other are taken in the order they were generated.
+        :complexity: O(log n), where 'n' is the number of teams, see _alive_rank.
+        """
+        rank = self._alive_rank(self._strength_rank((strength, self.team_count)))
+        if rank == len(self.strength_index):
+            return None
+        return self.floor_indices[self.strength_index[rank].value]
+
+    def _next_team_index(self) -> int | None:
+        """
+        Index of the enemy team the next battle is against, or None if no team with lives left is not empty.
+        Teams never get lives or monsters back, so a team that is out of either is done with for good.
+        next_index moves past it, and straight on past the teams up to done_until, which are done with too.
+        :complexity: O(1) amortised. next_index only moves back when _restore_lives_order moves the team battled
+                     forward, once per life lost, and otherwise goes past each team at most once.
+        """
+        while self.next_index < self.team_count and (
+                self.team_lives[self.next_index] <= 0 or len(self.get_team(self.next_index)) == 0):
+            self.next_index = max(self.next_index + 1, self.done_until)
+        return self.next_index if self.next_index < self.team_count else None
+
+    @staticmethod
+    def _team_elements(team: MonsterTeam) -> BSet:
+        """
+        The set of element values of the monsters in a team.
+        :complexity: O(m), where 'm' is the number of monsters in the team.
+        """
+        elements = BSet()
+        for monster in team.get_monsters():
+            elements.add(Element.from_string(monster.get_element()).value)
+        return elements
+
+    def __iter__(self) -> BattleTower:
+        """
+        The tower is its own iterator, yielding the results of next_battle until no battles remain.
+        :complexity: O(1)
+        """
+        return self
+
+    def __next__(self) -> tuple[Battle.Result, MonsterTeam, MonsterTeam, int, int]:
+        """
+        Conducts the next battle, see next_battle.
+        :complexity: O(1) amortised, plus the cost of the battle.
+        :raises StopIteration: once no battles remain.
+        """
+        if not self.battles_remaining():
+            raise StopIteration
+        battle = self.next_battle()
+        if battle is None:
+            # Every enemy team with lives left is empty, so there is nobody left to fight.
+            raise StopIteration
+        return battle
 
-        # Create a set to store elements that have been present in the battles so far, including the player's team
-        battled_elements = player_team_elements
+    def run(self, max_battles: int | None = None, checkpoint_path: str | None = None,
+            checkpoint_every: int = DEFAULT_CHECKPOINT_INTERVAL) -> TowerRun:
+        """
+        Conducts battles until none remain, or max_battles have been fought, only keeping count of the results.
+        With a checkpoint_path, the tower is saved there every checkpoint_every battles and once the run ends,
+        so a run that is cut short can carry on from BattleTower.resume(checkpoint_path).
+        :complexity: O(b) where b is the number of battles fought, plus the cost of the battles,
+                     plus O(c) every checkpoint_every battles, see checkpoint.
+        """
+        totals = TowerRun()
+        while max_battles is None or totals.battles < max_battles:
+            battle = next(self, None)
+            if battle is None:
+                break
+            result = battle[0]
+            totals.battles += 1
+            if result == Battle.Result.TEAM1:
+                totals.wins += 1
+            elif result == Battle.Result.TEAM2:
+                totals.losses += 1
+            else:
+                totals.draws += 1
+            if checkpoint_path is not None and totals.battles % checkpoint_every == 0:
+                self.save_checkpoint(checkpoint_path)
+        if checkpoint_path is not None and totals.battles % checkpoint_every != 0:
+            self.save_checkpoint(checkpoint_path)
+        totals.player_lives = self.player_lives
+        totals.teams_remaining = self.alive_count
+        return totals
 
-        # Iterate over past enemy teams
+    def checkpoint(self) -> bytes:
+        """
+        Encodes everything needed to carry on with the tower exactly where it is: the random seed,
+        the player's team and lives, and every enemy team with its lives, along with the progress
+        through the tower. Lazily generated teams are stored by their seed and teams of a template by their index
+        in it. Only the team being battled and the teams changed by battles are stored in full then,
+        so such checkpoints take a few bytes per untouched floor.
+        All integers are varints, as in replay.py.
+        :complexity: O(n + m*s), where 'n' is the number of teams and 'm' the number of monsters stored in full,
+                     see replay.write_team.
+        """
+        out = bytearray(CHECKPOINT_MAGIC)
+        lazy = self.team_seeds is not None
+        shared = self.template is not None
+        write_varint(out, RandomGen.seed)
+        write_varint(out, int(lazy) | int(self.sorted_by_lives) << 1 | int(self.player_team is not None) << 2
+                      | int(shared) << 3)
+        write_varint(out, self.player_lives)
+        if self.player_team is not None:
+            write_team(out, self.player_team)
+        write_varint(out, self.team_count)
+        write_varint(out, self.next_index)
+        write_varint(out, self.alive_count)
+        write_varint(out, self.battled_elements.elems)
         for i in range(self.team_count):
-            enemy_elements = BSet()
-            for monster in self.teams[i].get_monsters():
-                enemy_elements.add(monster.element.value)
-            battled_elements = battled_elements.union(enemy_elements)
+            write_varint(out, self.team_lives[i])
+            write_varint(out, self.team_floors[i])
+            write_varint(out, self.floor_strengths[self.team_floors[i]])
+            if lazy:
+                write_varint(out, self.team_seeds[i])
+            elif shared:
+                write_varint(out, self.template_indices[i])
+            else:
+                write_team(out, self.teams[i])
+            if lazy or shared:
+                state = self.team_states[i]
+                write_varint(out, 0 if state is None else len(state) + 1)
+                if state is not None:
+                    out += state
+        if lazy or shared:
+            # The cached team may have been changed by a battle, so it is kept as it is.
+            write_varint(out, self.cached_index + 1)
+            if self.cached_index >= 0:
+                write_team(out, self.cached_team)
+        return bytes(out)
+
+    @classmethod
+    def restore(cls, data: bytes, battle: Battle | None = None, template: TowerTemplate | None = None) -> BattleTower:
+        """
+        Rebuilds a tower from a checkpoint, setting the random seed back to what it was.
+        The battle and template are not part of the checkpoint, so are given again.
+        :complexity: O(n + m), where 'n' is the number of teams and 'm' the number of monsters stored in full.
+        :raises ValueError: if the data is not a tower checkpoint, or is of a tower using a template
+                            and no template is given.
+        """
+        if data[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+            raise ValueError("Not a tower checkpoint.")
+        reader = BytesReader(data)
+        reader.pos = len(CHECKPOINT_MAGIC)
+        tower = cls(battle)
+        seed = reader.varint()
+        flags = reader.varint()
+        lazy = bool(flags & 1)
+        shared = bool(flags & 8)
+        if shared and template is None:
+            raise ValueError("The checkpoint is of a tower using a template, so the template must be given.")
+        tower.sorted_by_lives = bool(flags & 2)
+        tower.player_lives = reader.varint()
+        if flags & 4:
+            tower.player_team = read_team(reader)
+        tower.team_count = n = reader.varint()
+        tower.next_index = reader.varint()
+        tower.alive_count = reader.varint()
+        tower.battled_elements.elems = reader.varint()
+        tower.teams = None if lazy or shared else ArrayR[MonsterTeam](n)
+        tower.team_seeds = ArrayR[int](n) if lazy else None
+        tower.team_states = ArrayR[bytes](n) if lazy or shared else None
+        tower.template = template if shared else None
+        tower.template_indices = ArrayI(n) if shared else None
+        tower.team_lives = ArrayI(n)
+        floors = ArrayI(n)
+        strengths = ArrayI(n)
+        for i in range(n):
+            tower.team_lives[i] = reader.varint()
+            floors[i] = reader.varint()
+            strengths[floors[i]] = reader.varint()
+            if lazy:
+                tower.team_seeds[i] = reader.varint()
+            elif shared:
+                tower.template_indices[i] = reader.varint()
+            else:
+                tower.teams[i] = read_team(reader)
+            if lazy or shared:
+                length = reader.varint() - 1
+                if length >= 0:
+                    tower.team_states[i] = reader.read_bytes(length)
+        if lazy or shared:
+            tower.cached_index = reader.varint() - 1
+            if tower.cached_index >= 0:
+                tower.cached_team = read_team(reader)
+        tower._index_strengths(strengths, floors)
+        RandomGen.set_seed(seed)
+        return tower
+
+    def save_checkpoint(self, path: str) -> None:
+        """
+        Writes a checkpoint to a file. The file is replaced in one go, so a run stopped while saving
+        still leaves the previous checkpoint behind.
+        :complexity: see checkpoint.
+        """
+        partial_path = path + ".partial"
+        with open(partial_path, "wb") as f:
+            f.write(self.checkpoint())
+        os.replace(partial_path, path)
+
+    @classmethod
+    def resume(cls, path: str, battle: Battle | None = None, template: TowerTemplate | None = None) -> BattleTower:
+        """
+        Rebuilds a tower from the checkpoint written to a file by save_checkpoint.
+        :complexity: see restore.
+        """
+        with open(path, "rb") as f:
+            return cls.restore(f.read(), battle, template)
+
+    def out_of_meta(self) -> ArrayR[Element]:
+        """
+        Compute the elements that are out of meta: those of monsters in the battles so far,
+        that are in neither the upcoming enemy team nor the player team.
+        The elements of past battles are collected as they are played (see next_battle),
+        so only the upcoming enemy team and the player team need to be looked at here.
+        :complexity: O(m + e), where 'm' is the number of monsters in the two teams and 'e' the number of elements.
+        """
+        upcoming = self._next_team_index()
+        upcoming_enemy_elements = BSet() if upcoming is None else self._team_elements(self.get_team(upcoming))
+        player_team_elements = self._team_elements(self.player_team)
 
         # Compute the elements that are out of meta
-        out_of_meta_elements = battled_elements.difference(upcoming_enemy_elements).difference(player_team_elements)
+        out_of_meta_elements = self.battled_elements.difference(upcoming_enemy_elements).difference(player_team_elements)
+
+        # The set iterates in increasing order, which is the order of element definition in elements.py.
+        return ArrayR.from_iterable(Element(value) for value in out_of_meta_elements)
+
+    def sort_by_lives(self) -> None:
+        """
+        Reorders the enemy teams by their lives left, fewest first. Teams with the same lives keep their order.
+        The teams stay sorted from then on, as next_battle moves a team forward each time it loses a life.
+        :complexity: O(n log n), where 'n' is the number of teams, using a merge sort of the team indices.
+        """
+        order = merge_sort_indices(self.team_lives, self.team_count)
+        teams = None if self.teams is None else ArrayR[MonsterTeam](self.team_count)
+        team_seeds = None if self.team_seeds is None else ArrayR[int](self.team_count)
+        team_states = None if self.team_states is None else ArrayR[bytes](self.team_count)
+        template_indices = None if self.template_indices is None else ArrayI(self.team_count)
+        team_floors = ArrayI(self.team_count)
+        team_lives = ArrayI(self.team_count)
+        cached_index = -1
+        for new_index in range(self.team_count):
+            old_index = order[new_index]
+            if teams is not None:
+                teams[new_index] = self.teams[old_index]
+            if team_seeds is not None:
+                team_seeds[new_index] = self.team_seeds[old_index]
+            if team_states is not None:
+                team_states[new_index] = self.team_states[old_index]
+            if template_indices is not None:
+                template_indices[new_index] = self.template_indices[old_index]
+            team_lives[new_index] = self.team_lives[old_index]
+            team_floors[new_index] = self.team_floors[old_index]
+            self.floor_indices[team_floors[new_index]] = new_index
+            if old_index == self.cached_index:
+                cached_index = new_index
+        self.teams = teams
+        self.team_seeds = team_seeds
+        self.team_states = team_states
+        self.template_indices = template_indices
+        self.team_lives = team_lives
+        self.team_floors = team_floors
+        self.cached_index = cached_index
+        # Teams out of lives are now at the front, so next_battle skips past them again.
+        self.next_index = 0
+        self.done_until = 0
+        self.sorted_by_lives = True
+
+    def _restore_lives_order(self, index: int) -> None:
+        """
+        Puts the teams back in order of lives after the team at index has lost a life.
+        The teams before it have at most one life more than it now has, so swapping it with the first of them
+        that has more lives puts every team back in order. Teams with the same lives may change order.
+        The team at index is the one just battled, at next_index, so the teams it is swapped past are done with.
+        next_index follows it, and done_until marks the teams it went past, so they are not looked at again.
+        :complexity: O(log n), where 'n' is the number of teams, from a binary search for the team to swap with.
+        """
+        lives = self.team_lives[index]
+        low, high = 0, index
+        while low < high:
+            mid = (low + high) // 2
+            if self.team_lives[mid] > lives:
+                high = mid
+            else:
+                low = mid + 1
+        if low < index:
+            self._swap_teams(low, index)
+            self.done_until = max(self.done_until, index + 1)
+            self.next_index = low
+
+    def _swap_teams(self, i: int, j: int) -> None:
+        """
+        Swaps the enemy teams at two indices, along with their lives and floors.
+        :complexity: O(1)
+        """
+        if self.teams is not None:
+            self.teams[i], self.teams[j] = self.teams[j], self.teams[i]
+        if self.team_seeds is not None:
+            self.team_seeds[i], self.team_seeds[j] = self.team_seeds[j], self.team_seeds[i]
+        if self.team_states is not None:
+            self.team_states[i], self.team_states[j] = self.team_states[j], self.team_states[i]
+        if self.template_indices is not None:
+            self.template_indices[i], self.template_indices[j] = self.template_indices[j], self.template_indices[i]
+        self.team_lives[i], self.team_lives[j] = self.team_lives[j], self.team_lives[i]
+        self.team_floors[i], self.team_floors[j] = self.team_floors[j], self.team_floors[i]
+        self.floor_indices[self.team_floors[i]] = i
+        self.floor_indices[self.team_floors[j]] = j
+        if self.cached_index == i:
+            self.cached_index = j
+        elif self.cached_index == j:
+            self.cached_index = i
 
-        # Convert the set to a sorted array based on the order of element definition in Elements.py
-        # Using the __str__ method of BSet to get the elements and converting them to integers
-        out_of_meta_array = ArrayR(len(out_of_meta_elements))
-        out_of_meta_str_elements = str(out_of_meta_elements)[1:-1].split(', ')
 
-        for i, elem in enumerate(out_of_meta_str_elements):
-            out_of_meta_array[i] = Element(int(elem))
+class TowerTemplate:
+    """
+    Enemy teams and their starting lives, generated once and never changed, for any number of towers
+    to battle through with BattleTower.use_template.
 
-        return out_of_meta_array
+    The teams are kept encoded in a single bytes like object (see replay.encode_team), and a fresh copy of
+    a team is decoded whenever a tower needs one. That object can be put in shared memory with share,
+    so towers in other processes can attach to the same template without copying or regenerating it:
+    ```
+    template = TowerTemplate.generate(1000)
+    memory = template.share()
+    # In each worker process:
+    template, memory = TowerTemplate.attach(memory.name)
+    tower = BattleTower(battle)
+    tower.use_template(template)
+    ```
+    Laid out as MAGIC, the number of teams, the lives, strength and encoded length of each team,
+    then the encoded teams.
+    """
+
+    def __init__(self, data: bytes | memoryview) -> None:
+        """
+        Reads the template laid out in data, which is kept rather than copied.
+        :complexity: O(n), where 'n' is the number of teams.
+        :raises ValueError: if data is not a template.
+        """
+        if bytes(data[:len(TEMPLATE_MAGIC)]) != TEMPLATE_MAGIC:
+            raise ValueError("Not a tower template.")
+        reader = BytesReader(data)
+        reader.pos = len(TEMPLATE_MAGIC)
+        n = reader.varint()
+        self.lives = ArrayI(n)
+        self.strengths = ArrayI(n)
+        self.offsets = ArrayI(n + 1)
+        lengths = ArrayI(n)
+        for i in range(n):
+            self.lives[i] = reader.varint()
+            self.strengths[i] = reader.varint()
+            lengths[i] = reader.varint()
+        self.offsets[0] = reader.pos
+        for i in range(n):
+            self.offsets[i + 1] = self.offsets[i] + lengths[i]
+        self.data = data
+
+    @classmethod
+    def generate(cls, n: int) -> TowerTemplate:
+        """
+        Generates 'n' enemy teams and their lives, drawing the same random numbers as BattleTower.generate_teams,
+        so a tower using the template battles the same teams it would have generated.
+        :complexity: O(n*m*s), where 'm' is the number of monsters in a team, see replay.encode_team.
+        """
+        specs = ArrayR[bytes](n)
+        lives = ArrayI(n)
+        strengths = ArrayI(n)
+        for i in range(n):
+            team = MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.RANDOM)
+            specs[i] = encode_team(team)
+            strengths[i] = team.strength()
+            lives[i] = RandomGen.randint(BattleTower.MIN_LIVES, BattleTower.MAX_LIVES)
+        data = bytearray(TEMPLATE_MAGIC)
+        write_varint(data, n)
+        for i in range(n):
+            write_varint(data, lives[i])
+            write_varint(data, strengths[i])
+            write_varint(data, len(specs[i]))
+        for i in range(n):
+            data += specs[i]
+        return cls(bytes(data))
+
+    def __len__(self) -> int:
+        """:complexity: O(1)"""
+        return len(self.lives)
+
+    def team(self, index: int) -> MonsterTeam:
+        """
+        A new copy of the team at the given index.
+        :complexity: O(m), where 'm' is the number of monsters in the team.
+        """
+        return decode_team(self.data[self.offsets[index]:self.offsets[index + 1]])
+
+    def share(self) -> SharedMemory:
+        """
+        Copies the template into a new block of shared memory, for other processes to attach to by its name.
+        The caller owns the block: close it when done, and unlink it once no process needs it.
+        :complexity: O(b), where 'b' is the size of the template in bytes.
+        """
+        memory = SharedMemory(create=True, size=len(self.data))
+        memory.buf[:len(self.data)] = self.data
+        return memory
+
+    @classmethod
+    def attach(cls, name: str) -> tuple[TowerTemplate, SharedMemory]:
+        """
+        The template shared under a name by share, read in place from the shared memory.
+        The memory must be kept open for as long as the template is used.
+        :complexity: O(n), where 'n' is the number of teams.
+        """
+        memory = SharedMemory(name=name)
+        return cls(memory.buf), memory
+
+
+# A balanced tournament of this height would need 2 ** 62 teams, so the stack in tournament_balanced never fills up.
+MAX_TOURNAMENT_HEIGHT = 62
+
+
+def tournament_balanced(tournament: ArrayR[str] | Iterable[str]) -> bool:
+    """
+    Whether a tournament in postfix form is valid and balanced. Team names are leaves and each "+" is a match
+    between the two tournaments before it. Balanced means both sides of every match are equally tall.
+
+    The tokens are read one at a time, so any iterable of them can be given instead of an ArrayR,
+    such as tournament_tokens of a file. Only the heights of the unfinished subtournaments are kept.
+    In a balanced tournament these only go down from the bottom of the stack to the top, bar the top two
+    just before the match between them, so the stack never holds more than MAX_TOURNAMENT_HEIGHT + 2 heights.
+    :complexity: O(n), where 'n' is the number of tokens. Unbalanced tournaments are rejected as soon as
+                 they can no longer be balanced.
+    """
+    heights = ArrayStack[int](MAX_TOURNAMENT_HEIGHT + 2)
+    top_pair_equal = False  # Whether the top two heights are equal, waiting for the match between them
+    for token in tournament:
+        if token == "+":
+            if len(heights) < 2:
+                return False
+            right = heights.pop()
+            left = heights.pop()
+            if left != right:
+                return False
+            height = right + 1
+            # Only the top two heights can ever be equal, so the ones left now all go down.
+            top_pair_equal = False
+        else:
+            height = 0
+        if not heights.is_empty():
+            below = heights.peek()
+            # A subtournament can only play the one built on top of it, which is now too tall,
+            # or would be too tall by the time it gets played.
+            if below < height or (below == height and top_pair_equal):
+                return False
+            top_pair_equal = below == height
+        else:
+            top_pair_equal = False
+        if height > MAX_TOURNAMENT_HEIGHT:
+            return False
+        heights.push(height)
+    return len(heights) == 1
 
-    def sort_by_lives(self):
-        # 1054 ONLY
-        raise NotImplementedError
 
-def tournament_balanced(tournament_array: ArrayR[str]):
-    # 1054 ONLY
-    raise NotImplementedError
+def tournament_tokens(stream: TextIO) -> Iterator[str]:
+    """
+    The tokens of a tournament in a text file, separated by any whitespace, including new lines.
+    :complexity: O(c), where 'c' is the number of characters in the file, one line in memory at a time.
+    """
+    for line in stream:
+        yield from line.split()
 
 if __name__ == "__main__":
 